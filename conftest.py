@@ -0,0 +1 @@
+"""pytest가 저장소 루트를 sys.path에 넣도록 두는 파일입니다 (tests/에서 whr 패키지를 불러오기 위해)."""
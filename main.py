@@ -1,9 +1,26 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import altair as alt # Although imported, Altair is not explicitly used in chart generation in this specific code.
 import io
 
+from whr.artifacts import load_figure, read_source
+from whr.changes import ROLLING_WINDOW
+from whr.changes import load_results as load_change_results
+from whr.data import COUNTRY_TO_ISO, METRIC_COLUMNS, RAW_TO_DISPLAY
+from whr.figures import overview_bar, overview_histogram, overview_map
+from whr.forecast import FORECAST_MODELS
+from whr.forecast import load_results as load_forecast_results
+from whr.impute import IMPUTE_METHODS
+from whr.impute import load_results as load_imputed_results
+from whr.query import overview as query_overview
+from whr.similarity import build_profile_index, build_trajectory_index
+from whr.ui import (cache_data, cache_resource, dataset_version, finish_rerun, query_source, session_results,
+                    shared_selection, start_rerun, stored_frame)
+
+rerun_timer = start_rerun('main')
+
 # --------------------
 # 1. 페이지 설정
 # --------------------
@@ -16,15 +33,20 @@ st.set_page_config(
 # --------------------
 # 2. 데이터 로드
 # --------------------
-@st.cache_data
-def load_data():
+@cache_data
+def load_data(version):
     """
     CSV 파일을 로드하고 필요한 컬럼명을 통일합니다.
     세계 지도 시각화를 위해 국가명과 ISO-ALPHA-3 코드 매핑을 시도합니다.
+    version: 데이터셋 버전 ID. 본문에서는 쓰지 않고, 원본 CSV가 바뀌면 다시 읽도록 캐시 키로만 씁니다.
+    (DataFrame, 메시지 목록)을 반환합니다. 경고/오류는 여기서 그리지 않고 (종류, 내용)으로 돌려주며,
+    페이지가 세션 저장소의 결과와 함께 리런마다 보여 줍니다 (whr.ui.stored_frame). 읽기에 실패하면 빈 DataFrame입니다.
     """
+    messages = []
     try:
         # Streamlit Cloud에서는 파일을 앱과 같은 디렉토리에 두면 바로 접근 가능합니다.
-        df = pd.read_csv('processed_whr.csv')
+        # `python -m whr.precompute`로 만든 최신 산출물이 있으면 CSV 대신 스냅샷을 메모리 매핑합니다.
+        df = read_source('processed_whr.csv')
 
         # 컬럼명 통일 (실제 파일의 컬럼명에 따라 'Country'와 'Generosity'가 정확한지 확인 필요)
         df.rename(columns={
@@ -38,80 +60,104 @@ def load_data():
         if 'Year' in df.columns:
             required_columns.append('Year')
         else:
-            st.warning("경고: 'Year' 컬럼을 찾을 수 없습니다. 연도별 분석 기능이 비활성화됩니다.")
+            messages.append(('warning', "경고: 'Year' 컬럼을 찾을 수 없습니다. 연도별 분석 기능이 비활성화됩니다."))
 
         missing_columns = [col for col in required_columns if col not in df.columns]
         if missing_columns:
-            st.error(f"필수 컬럼이 누락되었습니다: {', '.join(missing_columns)}. 파일의 컬럼명을 확인해주세요.")
-            return pd.DataFrame() # 빈 DataFrame 반환하여 앱 실행 중단
+            messages.append(('error', f"필수 컬럼이 누락되었습니다: {', '.join(missing_columns)}. 파일의 컬럼명을 확인해주세요."))
+            return pd.DataFrame(), messages # 빈 DataFrame 반환하여 앱 실행 중단
 
-        df = df[required_columns].copy() # SettingWithCopyWarning 방지를 위해 .copy() 사용
+        # '비슷한 국가' 인덱스와 전년 대비 변화 표가 쓰는 나머지 지표도 화면 표시용 컬럼명으로 함께 둡니다.
+        df = df.rename(columns=RAW_TO_DISPLAY)
+        metric_columns = [col for col in METRIC_COLUMNS if col in df.columns and col not in required_columns]
+        df = df[required_columns + metric_columns].copy() # SettingWithCopyWarning 방지를 위해 .copy() 사용
 
         # --- 세계 지도 시각화를 위한 국가 코드 추가 ---
         # 더 포괄적인 매핑을 위해 pycountry 라이브러리 사용을 권장합니다.
-        # 여기서는 예시를 위해 일부 국가만 수동 매핑합니다.
-        country_to_iso = {
-            'South Korea': 'KOR', 'United States': 'USA', 'Canada': 'CAN',
-            'Germany': 'DEU', 'France': 'FRA', 'United Kingdom': 'GBR',
-            'Japan': 'JPN', 'China': 'CHN', 'India': 'IND',
-            'Australia': 'AUS', 'Brazil': 'BRA', 'Mexico': 'MEX',
-            'Russia': 'RUS', 'Spain': 'ESP', 'Italy': 'ITA',
-            'Sweden': 'SWE', 'Norway': 'NOR', 'Denmark': 'DNK',
-            'Finland': 'FIN', 'Switzerland': 'CHE', 'Netherlands': 'NLD',
-            'Belgium': 'BEL', 'Austria': 'AUT', 'New Zealand': 'NZL',
-            'Argentina': 'ARG', 'South Africa': 'ZAF', 'Egypt': 'EGY',
-            'Nigeria': 'NGA', 'Indonesia': 'IDN', 'Turkey': 'TUR',
-            'Ireland': 'IRL', 'Luxembourg': 'LUX', 'Iceland': 'ISL',
-            'Israel': 'ISR', 'Chile': 'CHL', 'Colombia': 'COL',
-            'Thailand': 'THA', 'Vietnam': 'VNM', 'Philippines': 'PHL',
-            'Greece': 'GRC', 'Portugal': 'PRT', 'Poland': 'POL',
-            'Hungary': 'HUN', 'Czech Republic': 'CZE', 'Slovakia': 'SVK',
-            'Romania': 'ROU', 'Bulgaria': 'BGR', 'Croatia': 'HRV',
-            'Estonia': 'EST', 'Latvia': 'LVA', 'Lithuania': 'LTU',
-            'Slovenia': 'SVN', 'Cyprus': 'CYP', 'Malta': 'MLT',
-            'Afghanistan': 'AFG', 'Albania': 'ALB', 'Algeria': 'DZA', 'Angola': 'AGO',
-            'Armenia': 'ARM', 'Azerbaijan': 'AZE', 'Bahrain': 'BHR', 'Bangladesh': 'BGD',
-            'Belarus': 'BLR', 'Benin': 'BEN', 'Bhutan': 'BTN', 'Bolivia': 'BOL',
-            'Bosnia and Herzegovina': 'BIH', 'Botswana': 'BWA', 'Burkina Faso': 'BFA',
-            'Burundi': 'BDI', 'Cambodia': 'KHM', 'Cameroon': 'CMR', 'Central African Republic': 'CAF',
-            'Chad': 'TCD', 'Comoros': 'COM', 'Congo (Brazzaville)': 'COG', 'Congo (Kinshasa)': 'COD',
-            'Costa Rica': 'CRI', 'Cote d\'Ivoire': 'CIV', 'Cuba': 'CUB', 'Djibouti': 'DJI',
-            'Dominican Republic': 'DOM', 'Ecuador': 'ECU', 'El Salvador': 'SLV', 'Equatorial Guinea': 'GNQ',
-            'Eritrea': 'ERI', 'Ethiopia': 'ETH', 'Fiji': 'FJI', 'Gabon': 'GAB', 'Gambia': 'GMB',
-            'Georgia': 'GEO', 'Ghana': 'GHA', 'Guatemala': 'GTM', 'Guinea': 'GIN', 'Guinea-Bissau': 'GNB',
-            'Guyana': 'GUY', 'Haiti': 'HTI', 'Honduras': 'HND', 'Hong Kong S.A.R., China': 'HKG',
-            'Iran': 'IRN', 'Iraq': 'IRQ', 'Jamaica': 'JAM', 'Jordan': 'JOR', 'Kazakhstan': 'KAZ',
-            'Kenya': 'KEN', 'Kosovo': 'XKX', 'Kuwait': 'KWT', 'Kyrgyzstan': 'KGZ', 'Laos': 'LAO',
-            'Lebanon': 'LBN', 'Lesotho': 'LSO', 'Liberia': 'LBR', 'Libya': 'LBY', 'Madagascar': 'MDG',
-            'Malawi': 'MWI', 'Malaysia': 'MYS', 'Maldives': 'MDV', 'Mali': 'MLI', 'Mauritania': 'MRT',
-            'Mauritius': 'MUS', 'Moldova': 'MDA', 'Mongolia': 'MNG', 'Montenegro': 'MNE',
-            'Morocco': 'MAR', 'Mozambique': 'MOZ', 'Myanmar': 'MMR', 'Namibia': 'NAM', 'Nepal': 'NPL',
-            'Nicaragua': 'NIC', 'Niger': 'NER', 'North Macedonia': 'MKD', 'Oman': 'OMN', 'Pakistan': 'PAK',
-            'Palestine': 'PSE', 'Panama': 'PAN', 'Papua New Guinea': 'PNG', 'Paraguay': 'PRY',
-            'Peru': 'PER', 'Qatar': 'QAT', 'Rwanda': 'RWA', 'Saudi Arabia': 'SAU', 'Senegal': 'SEN',
-            'Serbia': 'SRB', 'Sierra Leone': 'SLE', 'Singapore': 'SGP', 'Somalia': 'SOM',
-            'South Sudan': 'SSD', 'Sri Lanka': 'LKA', 'Sudan': 'SDN', 'Suriname': 'SUR',
-            'Syria': 'SYR', 'Taiwan Province of China': 'TWN', 'Tanzania': 'TZA', 'Togo': 'TGO',
-            'Trinidad and Tobago': 'TTO', 'Tunisia': 'TUN', 'Uganda': 'UGA', 'Ukraine': 'UKR',
-            'United Arab Emirates': 'ARE', 'Uruguay': 'URY', 'Uzbekistan': 'UZB', 'Venezuela': 'VEN',
-            'Yemen': 'YEM', 'Zambia': 'ZMB', 'Zimbabwe': 'ZWE'
-        }
-        df['iso_alpha'] = df['Country'].map(country_to_iso)
+        # 여기서는 예시를 위해 일부 국가만 수동 매핑합니다. (whr/data.py의 COUNTRY_TO_ISO)
+        df['iso_alpha'] = df['Country'].map(COUNTRY_TO_ISO)
 
         # ISO 코드를 찾지 못한 국가에 대한 경고
         unmapped_countries = df[df['iso_alpha'].isnull()]['Country'].unique().tolist()
         if unmapped_countries:
-            st.warning(f"경고: 다음 국가들은 ISO 코드를 찾을 수 없어 지도에 표시되지 않을 수 있습니다: {', '.join(unmapped_countries)}. 'processed_whr.csv' 파일의 국가명과 코드 매핑을 확인해주세요.")
+            messages.append(('warning', f"경고: 다음 국가들은 ISO 코드를 찾을 수 없어 지도에 표시되지 않을 수 있습니다: {', '.join(unmapped_countries)}. 'processed_whr.csv' 파일의 국가명과 코드 매핑을 확인해주세요."))
 
-        return df
+        return df, messages
     except FileNotFoundError:
-        st.error("`processed_whr.csv` 파일을 찾을 수 없습니다. 파일을 업로드하거나 경로를 확인해주세요.")
-        return pd.DataFrame() # 빈 DataFrame 반환
+        messages.append(('error', "`processed_whr.csv` 파일을 찾을 수 없습니다. 파일을 업로드하거나 경로를 확인해주세요."))
+        return pd.DataFrame(), messages # 빈 DataFrame 반환
     except Exception as e:
-        st.error(f"데이터 로드 중 오류가 발생했습니다: {e}")
-        return pd.DataFrame()
+        messages.append(('error', f"데이터 로드 중 오류가 발생했습니다: {e}"))
+        return pd.DataFrame(), messages
+
+@cache_data
+def load_overview_figure(name, year, version):
+    """사전 계산된 개요 탭 그림을 읽습니다. 산출물이 없거나 오래되었으면 None."""
+    return load_figure(name, year)
+
+@cache_data
+def load_overview_aggregates(_df, version, year, value_range=None):
+    """
+    연도 하나(와 관대함 지수 범위 필터)의 개요 탭 차트 입력 집계 (히스토그램 구간, 국가별 평균).
+    연도·필터 조합마다 한 번만 계산하며, 차트에는 원본 행 대신 이 집계만 넘깁니다.
+    _df는 이미 읽은 데이터로 해시하지 않고, version(데이터셋 버전)을 캐시 키로 씁니다.
+    집계는 쿼리 소스(whr.ui.query_source, WHR_SOURCE 데이터셋 또는 _df)에서 계산합니다.
+    """
+    overview = query_overview(query_source(_df, version), year, value_range)
+    overview.countries['iso_alpha'] = overview.countries['Country'].map(COUNTRY_TO_ISO)
+    return overview
 
-df = load_data()
+@cache_resource
+def load_similarity_index(_df, version, mode, year=None):
+    """
+    '비슷한 국가' 인덱스를 데이터셋마다 한 번만 만듭니다 (조회 전용 객체라 복사 없이 공유).
+    mode: 'profile'(year년 요인 프로필) 또는 'trajectory'(전체 연도 관대함 추이)
+    """
+    if mode == 'profile':
+        return build_profile_index(_df, year)
+    return build_trajectory_index(_df)
+
+@cache_data
+def load_change_table(_df, version):
+    """모든 지표의 전년 대비 변화/이상치 표 (사전 계산 산출물이 있으면 그대로 사용)."""
+    return load_change_results(_df)
+
+def similar_country_seed(key, options, mode, year=None, default_k=4):
+    """
+    기준 국가를 고르면 그 국가와 가장 비슷한 국가들을 포함한 목록을 반환합니다 (멀티셀렉트 기본값용).
+    기준 국가를 고르지 않았으면 None.
+    """
+    index = load_similarity_index(df, data_version, mode, year)
+    candidates = [country for country in options if country in index]
+    col_base, col_k = st.columns([3, 1])
+    with col_base:
+        base_country = st.selectbox("기준 국가:", ["(선택 안 함)"] + candidates, key=f"{key}_base")
+    with col_k:
+        k = st.number_input("비슷한 국가 수:", min_value=1, max_value=10, value=default_k, key=f"{key}_k")
+    if base_country == "(선택 안 함)":
+        return None
+    neighbors = index.neighbors(base_country, int(k), allowed=options)
+    if neighbors.empty:
+        st.info(f"{base_country}와(과) 비교할 수 있는 비슷한 국가가 없습니다.")
+        return [base_country]
+    st.caption("거리(표준화 점수 기준, 작을수록 비슷함): " + ", ".join(
+        f"{row.Country} ({row.Distance:.2f})" for row in neighbors.itertuples()))
+    return [base_country] + neighbors['Country'].tolist()
+
+@cache_data
+def load_forecasts(_df, version):
+    """모든 국가의 관대함 지수 예측 (사전 계산 산출물이 있으면 그대로 사용)."""
+    return load_forecast_results(_df)
+
+@cache_data
+def load_imputed_panel(_df, version):
+    """빈 연도를 방법별로 채운 패널 (사전 계산 산출물이 있으면 그대로 사용, 리런마다 다시 계산하지 않음)."""
+    return load_imputed_results(_df)
+
+# 데이터셋 버전 ID: 캐시 함수는 DataFrame 대신 이 ID와 파라미터로 결과를 찾습니다.
+data_version = dataset_version()
+# 같은 세션에서 이미 읽은 데이터가 있으면 다시 읽지 않습니다 (다른 페이지에 다녀와도 유지).
+df = stored_frame(session_results(data_version), 'overview_frame', lambda: load_data(data_version))
 
 # 데이터가 비어있으면 앱 실행 중단
 if df.empty:
@@ -144,7 +190,9 @@ with st.sidebar:
             "분석할 연도를 선택하세요:",
             int(df['Year'].min()),
             int(df['Year'].max()),
-            int(df['Year'].max()) # 기본값으로 최신 연도 설정
+            # 기본값은 최신 연도, 다른 페이지에서 고른 연도가 있으면 그 연도
+            **shared_selection('sidebar_year', 'year', int(df['Year'].max()),
+                               range(int(df['Year'].min()), int(df['Year'].max()) + 1))
         )
         df_display = df[df['Year'] == selected_year_sidebar].copy()
     else:
@@ -169,7 +217,7 @@ with st.sidebar:
 st.title("🌍 국가 관대함 지수 비교")
 
 # 탭 구현
-tab1, tab2, tab3, tab4 = st.tabs(["대시보드 개요", "국가 세부 정보", "국가 비교", "데이터 테이블"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["대시보드 개요", "국가 세부 정보", "국가 비교", "데이터 테이블", "변화 및 이상치"])
 
 with tab1: # Dashboard Overview
     # 대시보드 개요 탭은 항상 최신 연도 데이터를 사용
@@ -178,46 +226,35 @@ with tab1: # Dashboard Overview
     current_df_for_tab1 = df_latest_year 
 
     if not current_df_for_tab1.empty:
+        overview = load_overview_aggregates(df, data_version, latest_year)
         col1, col2 = st.columns(2)
 
         with col1:
-            avg_generosity = current_df_for_tab1['Generosity'].mean()
+            avg_generosity = overview.mean
             st.metric(label=f"{latest_year if latest_year else '전체'}년 평균 관대함 지수", value=f"{avg_generosity:.3f}")
             st.write("### 🥇 관대함 지수 상위 5개국")
-            top_5_generosity = current_df_for_tab1.nlargest(5, 'Generosity')
+            top_5_generosity = overview.countries.nlargest(5, 'Generosity')
             st.dataframe(top_5_generosity[['Country', 'Generosity']].reset_index(drop=True), use_container_width=True)
 
         with col2:
             st.write("### 🥉 관대함 지수 하위 5개국")
-            bottom_5_generosity = current_df_for_tab1.nsmallest(5, 'Generosity')
+            bottom_5_generosity = overview.countries.nsmallest(5, 'Generosity')
             st.dataframe(bottom_5_generosity[['Country', 'Generosity']].reset_index(drop=True), use_container_width=True)
 
         st.subheader(f"{latest_year if latest_year else '전체'} 국가별 관대함 분포")
-        fig_hist = px.histogram(current_df_for_tab1, x='Generosity', nbins=20,
-                                title='관대함 지수 분포',
-                                labels={'Generosity': '관대함 지수'},
-                                color_discrete_sequence=px.colors.qualitative.Pastel) # Improved color
-        fig_hist.update_layout(template="plotly_white", title_x=0.5, # Centered title, clean template
-                                margin=dict(t=50, b=50, l=50, r=50)) # Add margins
+        # 사전 계산된 그림이 있으면 그대로 사용하고, 없으면 직접 그립니다.
+        fig_hist = load_overview_figure('hist', latest_year, data_version)
+        if fig_hist is None:
+            fig_hist = overview_histogram(overview.bins)
         st.plotly_chart(fig_hist, use_container_width=True)
 
         # World Map Visualization ( Choropleth Map )
         st.subheader(f"🗺️ {latest_year if latest_year else '전체'} 관대함 지수 세계 지도")
-        # 지도 표시를 위해 ISO 코드가 있는 데이터만 필터링
-        df_map = current_df_for_tab1.dropna(subset=['iso_alpha']).copy()
-        if not df_map.empty:
-            fig_map = px.choropleth(df_map,
-                                    locations="iso_alpha",
-                                    color="Generosity",
-                                    hover_name="Country",
-                                    # 관대함 지수가 음수일 때 붉은색 계열, 양수일 때 푸른색 계열
-                                    # 0 근처가 흰색으로 표시되지 않도록 RdYlBu 스케일 사용
-                                    color_continuous_scale=px.colors.diverging.RdYlBu, # Red-Yellow-Blue diverging scale
-                                    color_continuous_midpoint=0, # Set midpoint at 0 for diverging colors
-                                    title='세계 관대함 지수 지도',
-                                    labels={'Generosity': '관대함 지수'})
-            fig_map.update_layout(template="plotly_white", title_x=0.5,
-                                  margin=dict(t=50, b=50, l=50, r=50))
+        # 지도 표시를 위해 ISO 코드가 있는 데이터만 사용
+        fig_map = load_overview_figure('map', latest_year, data_version)
+        if fig_map is None:
+            fig_map = overview_map(overview.countries)
+        if fig_map is not None:
             st.plotly_chart(fig_map, use_container_width=True)
         else:
             st.info("지도에 표시할 국가 데이터가 없습니다. ISO 코드가 매핑되지 않았거나 데이터가 필터링되었습니다.")
@@ -225,14 +262,9 @@ with tab1: # Dashboard Overview
 
         # 모든 국가에 대한 막대 차트
         st.subheader(f"{latest_year if latest_year else '전체'} 국가별 관대함 지수 (막대 차트)")
-        fig_bar_all = px.bar(current_df_for_tab1.sort_values('Generosity', ascending=False), x='Country', y='Generosity',
-                             title=f"{latest_year if latest_year else '전체'} 국가별 관대함 지수",
-                             labels={'Country': '국가', 'Generosity': '관대함 지수'},
-                             color_discrete_sequence=px.colors.qualitative.D3,
-                             hover_data=['iso_alpha']) # hover_data에 iso_alpha 추가
-        fig_bar_all.update_layout(template="plotly_white", title_x=0.5,
-                                  margin=dict(t=50, b=50, l=50, r=50),
-                                  bargap=0.2) # 막대 사이 간격 넓히기
+        fig_bar_all = load_overview_figure('bar', latest_year, data_version)
+        if fig_bar_all is None:
+            fig_bar_all = overview_bar(overview.countries, latest_year if latest_year else '전체')
         st.plotly_chart(fig_bar_all, use_container_width=True)
     else:
         st.warning("표시할 데이터가 없습니다. 필터를 조정하거나 원본 데이터를 확인하세요.")
@@ -241,15 +273,39 @@ with tab1: # Dashboard Overview
 with tab2: # Country Details - Modified for multi-country comparison
     st.header("🔍 국가 세부 정보 및 연도별 추세 분석")
     if not df.empty and 'Year' in df.columns: # df_display가 아닌 전체 df를 사용해 연도별 추세 분석
+        detail_options = df['Country'].sort_values().unique() # 전체 데이터셋에서 국가 선택
+        with st.expander("🧭 비슷한 국가로 선택 채우기"):
+            similarity_mode = st.radio(
+                "비슷함의 기준:",
+                ['trajectory', 'profile'],
+                format_func=lambda mode: "관대함 추이 (전체 연도)" if mode == 'trajectory' else f"요인 프로필 ({latest_year}년)",
+                horizontal=True,
+                key="detail_similarity_mode"
+            )
+            detail_seed = similar_country_seed("detail_similar", detail_options, similarity_mode,
+                                               latest_year if similarity_mode == 'profile' else None)
         selected_countries_detail = st.multiselect(
             "세부 정보를 볼 국가를 선택하세요:",
-            options=df['Country'].sort_values().unique(), # 전체 데이터셋에서 국가 선택
-            default=df['Country'].head(1).tolist() # 기본값으로 1개 국가 설정
+            options=detail_options,
+            # 기본값으로 1개 국가 설정 (다른 페이지에서 고른 국가가 있으면 그 국가들, 비슷한 국가 목록을 채우면 그 목록)
+            **shared_selection('detail_countries', 'countries', df['Country'].head(1).tolist(), detail_options,
+                               override=detail_seed)
         )
 
+        # 빈 연도 채우기: 채운 값은 속이 빈 마커로 구분합니다.
+        fill_col1, fill_col2 = st.columns([1, 3])
+        with fill_col1:
+            fill_gaps = st.checkbox("빈 연도 채우기", key="detail_fill_gaps")
+        if fill_gaps:
+            with fill_col2:
+                fill_method = st.radio("채우는 방법:", options=list(IMPUTE_METHODS),
+                                       format_func=lambda method: IMPUTE_METHODS[method], horizontal=True,
+                                       key="detail_fill_method")
+
         if selected_countries_detail:
             # 선택된 국가들의 전체 연도 데이터 필터링
-            countries_time_series_data = df[df['Country'].isin(selected_countries_detail)].sort_values(['Country', 'Year'])
+            detail_source = load_imputed_panel(df, data_version).frame(fill_method, ['Generosity']) if fill_gaps else df
+            countries_time_series_data = detail_source[detail_source['Country'].isin(selected_countries_detail)].sort_values(['Country', 'Year'])
 
             if not countries_time_series_data.empty:
                 st.subheader(f"선택된 국가들의 관대함 지수 추세")
@@ -263,6 +319,49 @@ with tab2: # Country Details - Modified for multi-country comparison
                                    color_discrete_sequence=px.colors.qualitative.Plotly) # Consistent color
                 fig_line.update_layout(template="plotly_white", title_x=0.5,
                                        margin=dict(t=50, b=50, l=50, r=50))
+                country_colors = {trace.name: trace.line.color for trace in fig_line.data}
+
+                if fill_gaps:
+                    imputed_points = countries_time_series_data[countries_time_series_data['Imputed']]
+                    for i, (country, country_imputed) in enumerate(imputed_points.groupby('Country', sort=False)):
+                        fig_line.add_trace(go.Scatter(
+                            x=country_imputed['Year'], y=country_imputed['Generosity'], mode='markers',
+                            marker=dict(symbol='circle-open', size=11, color=country_colors.get(country), line=dict(width=2)),
+                            name=f"채운 값 ({IMPUTE_METHODS[fill_method]})", legendgroup='imputed', showlegend=i == 0))
+                    st.caption(f"빈 연도 {len(imputed_points)}칸을 채웠습니다 (방법: {IMPUTE_METHODS[fill_method]}, 속이 빈 원으로 표시).")
+
+                # 예측: 마지막 관측값에서 이어지는 점선과 95% 예측 구간
+                forecast_col1, forecast_col2 = st.columns([1, 3])
+                with forecast_col1:
+                    show_forecast = st.checkbox("향후 관대함 지수 예측 보기")
+                if show_forecast:
+                    forecasts = load_forecasts(df, data_version)
+                    with forecast_col2:
+                        forecast_model = st.radio("예측 모형:", options=forecasts.models,
+                                                  format_func=lambda model: FORECAST_MODELS[model], horizontal=True)
+                    forecast_df = forecasts.frame(forecast_model, selected_countries_detail)
+                    for country, country_forecast in forecast_df.groupby('Country', sort=False):
+                        last_row = countries_time_series_data[countries_time_series_data['Country'] == country].dropna(subset=['Generosity']).iloc[-1]
+                        color = country_colors.get(country)
+                        fig_line.add_trace(go.Scatter(
+                            x=pd.concat([country_forecast['Year'], country_forecast['Year'][::-1]]),
+                            y=pd.concat([country_forecast['Upper'], country_forecast['Lower'][::-1]]),
+                            fill='toself', fillcolor=color, opacity=0.15, line=dict(width=0),
+                            hoverinfo='skip', showlegend=False, legendgroup=country))
+                        fig_line.add_trace(go.Scatter(
+                            x=[last_row['Year']] + country_forecast['Year'].tolist(),
+                            y=[last_row['Generosity']] + country_forecast['Forecast'].tolist(),
+                            mode='lines+markers', line=dict(color=color, dash='dash'),
+                            name=f"{country} (예측)", legendgroup=country))
+                    missing_forecast = sorted(set(selected_countries_detail) - set(forecast_df['Country']))
+                    if missing_forecast:
+                        st.caption(f"관측 연도가 부족해 예측하지 않은 국가: {', '.join(missing_forecast)}")
+                    with st.expander("예측 모형 정확도 (국가별 마지막 관측 연도 홀드아웃)"):
+                        accuracy = forecasts.accuracy()
+                        accuracy['Model'] = accuracy['Model'].map(FORECAST_MODELS)
+                        st.dataframe(accuracy.rename(columns={'Model': '모형', 'n': '국가 수', 'Coverage': '95% 구간 포함률'}).round(4),
+                                     use_container_width=True)
+
                 st.plotly_chart(fig_line, use_container_width=True)
 
                 st.subheader(f"선택된 국가들의 최신 ({latest_year if latest_year else '전체'}년) 관대함 지수")
@@ -285,14 +384,23 @@ with tab2: # Country Details - Modified for multi-country comparison
 with tab3: # Country Comparison
     st.header("🆚 국가 비교 분석")
     if not df_display.empty:
+        compare_options = df_display['Country'].sort_values().unique()
+        compare_seed = None
+        if 'Year' in df.columns:
+            with st.expander(f"🧭 비슷한 국가로 선택 채우기 ({selected_year_sidebar}년 요인 프로필 기준)"):
+                compare_seed = similar_country_seed("compare_similar", compare_options, 'profile', selected_year_sidebar)
         compare_countries = st.multiselect(
             "비교할 국가를 선택하세요 (5개 이하 권장):",
-            options=df_display['Country'].sort_values().unique(),
-            default=df_display['Country'].head(2).tolist() # 기본값으로 2개 국가 설정
+            options=compare_options,
+            default=compare_seed or df_display['Country'].head(2).tolist() # 기본값으로 2개 국가(또는 비슷한 국가 목록) 설정
         )
 
         if compare_countries:
-            compare_df = df_display[df_display['Country'].isin(compare_countries)].sort_values('Generosity', ascending=False).copy()
+            # 사이드바 연도·범위 필터별로 캐시된 국가별 집계에서 막대 값을 가져옵니다.
+            compare_overview = load_overview_aggregates(df, data_version, selected_year_sidebar if 'Year' in df.columns else None,
+                                                        (min_generosity, max_generosity))
+            compare_df = compare_overview.countries[compare_overview.countries['Country'].isin(compare_countries)] \
+                .sort_values('Generosity', ascending=False).copy()
             st.subheader("선택된 국가별 관대함 지수 비교")
             fig_compare = px.bar(compare_df, x='Country', y='Generosity',
                                  title='국가별 관대함 지수 비교',
@@ -344,3 +452,55 @@ with tab4: # Data Table
         """)
     else:
         st.warning("표시할 데이터가 없습니다. 필터를 조정하거나 원본 데이터를 확인하세요.")
+
+with tab5: # Biggest movers / anomalies
+    st.header("🚨 전년 대비 변화 및 이상치")
+    if 'Year' in df.columns:
+        st.markdown(f"""
+        국가-연도마다 미리 계산해 둔 **전년 대비 변화량**, **최근 {ROLLING_WINDOW}년 이동 평균**, **자기 이력 대비 z-점수**를 보여줍니다.
+        * z-점수는 해당 국가의 이전 연도 값들의 평균과 표준편차 기준으로, 그 해 값이 평소와 얼마나 다른지를 나타냅니다.
+        """)
+        change_table = load_change_table(df, data_version)
+        change_labels = {'Country': '국가', 'value': '값', 'delta': '전년 대비 변화', 'rolling_mean': f'{ROLLING_WINDOW}년 이동 평균', 'zscore': 'z-점수'}
+        change_col1, change_col2, change_col3 = st.columns(3)
+        with change_col1:
+            change_metric = st.selectbox("지표를 선택하세요:", options=[m for m in METRIC_COLUMNS if m in change_table.metrics], key="change_metric")
+        with change_col2:
+            change_years = sorted(int(y) for y in change_table.years)
+            change_year = st.selectbox("연도를 선택하세요:", options=change_years[::-1], key="change_year")
+        with change_col3:
+            change_n = st.number_input("표시할 국가 수:", min_value=3, max_value=30, value=10, key="change_n")
+
+        risers, fallers = change_table.movers(change_metric, change_year, int(change_n))
+        mover_col1, mover_col2 = st.columns(2)
+        with mover_col1:
+            st.write(f"### 📈 {change_year}년 가장 많이 오른 국가")
+            st.dataframe(risers.rename(columns=change_labels).round(3), use_container_width=True)
+        with mover_col2:
+            st.write(f"### 📉 {change_year}년 가장 많이 내린 국가")
+            st.dataframe(fallers.rename(columns=change_labels).round(3), use_container_width=True)
+
+        movers_df = pd.concat([risers, fallers]).drop_duplicates('Country').sort_values('delta')
+        if not movers_df.empty:
+            fig_movers = px.bar(movers_df, x='delta', y='Country', orientation='h',
+                                color='delta', color_continuous_scale=px.colors.diverging.RdBu,
+                                color_continuous_midpoint=0,
+                                title=f'{change_year}년 {change_metric} 전년 대비 변화 (상위/하위 {int(change_n)}개국)',
+                                labels={'delta': '전년 대비 변화', 'Country': '국가'})
+            fig_movers.update_layout(template="plotly_white", title_x=0.5, height=max(400, 25 * len(movers_df)),
+                                     margin=dict(t=50, b=50, l=50, r=50))
+            st.plotly_chart(fig_movers, use_container_width=True)
+        else:
+            st.info(f"{change_year}년에는 전년 데이터가 있는 국가가 없어 변화량을 계산할 수 없습니다.")
+
+        st.subheader("⚠️ 평소와 크게 다른 국가 (이상치)")
+        z_threshold = st.slider("|z-점수| 기준:", min_value=1.0, max_value=4.0, value=2.0, step=0.5, key="change_z")
+        anomalies = change_table.anomalies(change_metric, change_year, z_threshold)
+        if not anomalies.empty:
+            st.dataframe(anomalies.rename(columns=change_labels).round(3), use_container_width=True)
+        else:
+            st.info(f"{change_year}년 {change_metric}에서 |z-점수| {z_threshold} 이상인 국가가 없습니다.")
+    else:
+        st.warning("연도별 데이터가 없어 변화 및 이상치 분석을 할 수 없습니다.")
+
+finish_rerun(rerun_timer)
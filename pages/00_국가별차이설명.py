@@ -3,6 +3,17 @@ import pandas as pd
 import plotly.express as px
 import io
 
+from whr.artifacts import read_source
+from whr.data import COUNTRY_TO_ISO, numeric_frame
+from whr.payload import compact_figure
+from whr.ranks import CORRELATION_METHODS
+from whr.ui import (bootstrap_interval, cache_data, finish_rerun, method_country_correlations,
+                    factor_sections, render_country_tests, render_panel_section, render_pooled_section,
+                    render_timeline_section, dataset_version, session_results, shared_selection, start_rerun,
+                    stored_frame)
+
+rerun_timer = start_rerun('00_국가별차이설명')
+
 # --------------------
 # 1. 페이지 설정 (하위 페이지에도 설정 가능)
 # --------------------
@@ -15,14 +26,18 @@ st.set_page_config(
 # --------------------
 # 2. 데이터 로드 (메인 앱과 동일하게 캐시 사용)
 # --------------------
-@st.cache_data
-def load_data():
+@cache_data
+def load_data(version):
     """
     CSV 파일을 로드하고 필요한 컬럼명을 통일합니다.
     세계 지도 시각화를 위해 국가명과 ISO-ALPHA-3 코드 매핑을 시도합니다.
+    version: 데이터셋 버전 ID. 본문에서는 쓰지 않고, 원본 CSV가 바뀌면 다시 읽도록 캐시 키로만 씁니다.
+    (DataFrame, 메시지 목록)을 반환합니다. 경고/오류는 여기서 그리지 않고 (종류, 내용)으로 돌려주며,
+    페이지가 세션 저장소의 결과와 함께 리런마다 보여 줍니다 (whr.ui.stored_frame). 읽기에 실패하면 빈 DataFrame입니다.
     """
+    messages = []
     try:
-        df = pd.read_csv('processed_whr.csv')
+        df = read_source('processed_whr.csv')
 
         expected_raw_columns = [
             'Country', 'year', 'generosity', 'life_ladder', 'log_gdp_per_capita',
@@ -33,11 +48,12 @@ def load_data():
 
         missing_columns_in_csv = [col for col in expected_raw_columns if col not in df.columns]
         if missing_columns_in_csv:
-            st.error(f"필수 컬럼이 누락되었습니다: {', '.join(missing_columns_in_csv)}. 파일의 컬럼명을 확인해주세요.")
-            return pd.DataFrame()
+            messages.append(('error', f"필수 컬럼이 누락되었습니다: {', '.join(missing_columns_in_csv)}. 파일의 컬럼명을 확인해주세요."))
+            return pd.DataFrame(), messages
 
         df.rename(columns={
             'Country': 'Country',
+            'regional_indicator': 'Region',
             'year': 'Year',
             'generosity': 'Generosity',
             'life_ladder': 'Life Ladder',
@@ -52,75 +68,32 @@ def load_data():
         }, inplace=True)
 
         display_columns = [
-            'Country', 'Year', 'Generosity', 'Life Ladder', 'Log GDP per capita',
+            'Country', 'Region', 'Year', 'Generosity', 'Life Ladder', 'Log GDP per capita',
             'Social Support', 'Healthy Life Expectancy at Birth',
             'Freedom to Make Life Choices', 'Perceptions of Corruption',
             'Positive Affect', 'Negative Affect', 'Confidence in National Government'
         ]
         df = df[[col for col in display_columns if col in df.columns]].copy()
 
-        country_to_iso = {
-            'South Korea': 'KOR', 'United States': 'USA', 'Canada': 'CAN',
-            'Germany': 'DEU', 'France': 'FRA', 'United Kingdom': 'GBR',
-            'Japan': 'JPN', 'China': 'CHN', 'India': 'IND',
-            'Australia': 'AUS', 'Brazil': 'BRA', 'Mexico': 'MEX',
-            'Russia': 'RUS', 'Spain': 'ESP', 'Italy': 'ITA',
-            'Sweden': 'SWE', 'Norway': 'NOR', 'Denmark': 'DNK',
-            'Finland': 'FIN', 'Switzerland': 'CHE', 'Netherlands': 'NLD',
-            'Belgium': 'BEL', 'Austria': 'AUT', 'New Zealand': 'NZL',
-            'Argentina': 'ARG', 'South Africa': 'ZAF', 'Egypt': 'EGY',
-            'Nigeria': 'NGA', 'Indonesia': 'IDN', 'Turkey': 'TUR',
-            'Ireland': 'IRL', 'Luxembourg': 'LUX', 'Iceland': 'ISL',
-            'Israel': 'ISR', 'Chile': 'CHL', 'Colombia': 'COL',
-            'Thailand': 'THA', 'Vietnam': 'VNM', 'Philippines': 'PHL',
-            'Greece': 'GRC', 'Portugal': 'PRT', 'Poland': 'POL',
-            'Hungary': 'HUN', 'Czech Republic': 'CZE', 'Slovakia': 'SVK',
-            'Romania': 'ROU', 'Bulgaria': 'BGR', 'Croatia': 'HRV',
-            'Estonia': 'EST', 'Latvia': 'LVA', 'Lithuania': 'LTU',
-            'Slovenia': 'SVN', 'Cyprus': 'CYP', 'Malta': 'MLT',
-            'Afghanistan': 'AFG', 'Albania': 'ALB', 'Algeria': 'DZA', 'Angola': 'AGO',
-            'Armenia': 'ARM', 'Azerbaijan': 'AZE', 'Bahrain': 'BHR', 'Bangladesh': 'BGD',
-            'Belarus': 'BLR', 'Benin': 'BEN', 'Bhutan': 'BTN', 'Bolivia': 'BOL',
-            'Bosnia and Herzegovina': 'BIH', 'Botswana': 'BWA', 'Burkina Faso': 'BFA',
-            'Burundi': 'BDI', 'Cambodia': 'KHM', 'Cameroon': 'CMR', 'Central African Republic': 'CAF',
-            'Chad': 'TCD', 'Comoros': 'COM', 'Congo (Brazzaville)': 'COG', 'Congo (Kinshasa)': 'COD',
-            'Costa Rica': 'CRI', 'Cote d\'Ivoire': 'CIV', 'Cuba': 'CUB', 'Djibouti': 'DJI',
-            'Dominican Republic': 'DOM', 'Ecuador': 'ECU', 'El Salvador': 'SLV', 'Equatorial Guinea': 'GNQ',
-            'Eritrea': 'ERI', 'Ethiopia': 'ETH', 'Fiji': 'FJI', 'Gabon': 'GAB', 'Gambia': 'GMB',
-            'Georgia': 'GEO', 'Ghana': 'GHA', 'Guatemala': 'GTM', 'Guinea': 'GIN', 'Guinea-Bissau': 'GNB',
-            'Guyana': 'GUY', 'Haiti': 'HTI', 'Honduras': 'HND', 'Hong Kong S.A.R., China': 'HKG',
-            'Iran': 'IRN', 'Iraq': 'IRQ', 'Jamaica': 'JAM', 'Jordan': 'JOR', 'Kazakhstan': 'KAZ',
-            'Kenya': 'KEN', 'Kosovo': 'XKX', 'Kuwait': 'KWT', 'Kyrgyzstan': 'KGZ', 'Laos': 'LAO',
-            'Lebanon': 'LBN', 'Lesotho': 'LSO', 'Liberia': 'LBR', 'Libya': 'LBY', 'Madagascar': 'MDG',
-            'Malawi': 'MWI', 'Malaysia': 'MYS', 'Maldives': 'MDV', 'Mali': 'MLI', 'Mauritania': 'MRT',
-            'Mauritius': 'MUS', 'Moldova': 'MDA', 'Mongolia': 'MNG', 'Montenegro': 'MNE',
-            'Morocco': 'MAR', 'Mozambique': 'MOZ', 'Myanmar': 'MMR', 'Namibia': 'NAM', 'Nepal': 'NPL',
-            'Nicaragua': 'NIC', 'Niger': 'NER', 'North Macedonia': 'MKD', 'Oman': 'OMN', 'Pakistan': 'PAK',
-            'Palestine': 'PSE', 'Panama': 'PAN', 'Papua New Guinea': 'PNG', 'Paraguay': 'PRY',
-            'Peru': 'PER', 'Qatar': 'QAT', 'Rwanda': 'RWA', 'Saudi Arabia': 'SAU', 'Senegal': 'SEN',
-            'Serbia': 'SRB', 'Sierra Leone': 'SLE', 'Singapore': 'SGP', 'Somalia': 'SOM',
-            'South Sudan': 'SSD', 'Sri Lanka': 'LKA', 'Sudan': 'SDN', 'Suriname': 'SUR',
-            'Syria': 'SYR', 'Taiwan Province of China': 'TWN', 'Tanzania': 'TZA', 'Togo': 'TGO',
-            'Trinidad and Tobago': 'TTO', 'Tunisia': 'TUN', 'Uganda': 'UGA', 'Ukraine': 'UKR',
-            'United Arab Emirates': 'ARE', 'Uruguay': 'URY', 'Uzbekistan': 'UZB', 'Venezuela': 'VEN',
-            'Yemen': 'YEM', 'Zambia': 'ZMB', 'Zimbabwe': 'ZWE'
-        }
-        df['iso_alpha'] = df['Country'].map(country_to_iso)
+        df['iso_alpha'] = df['Country'].map(COUNTRY_TO_ISO)
 
         unmapped_countries = df[df['iso_alpha'].isnull()]['Country'].unique().tolist()
         if unmapped_countries:
-            st.warning(f"경고: 다음 국가들은 ISO 코드를 찾을 수 없어 지도에 표시되지 않을 수 있습니다: {', '.join(unmapped_countries)}. 'processed_whr.csv' 파일의 국가명과 코드 매핑을 확인해주세요.")
+            messages.append(('warning', f"경고: 다음 국가들은 ISO 코드를 찾을 수 없어 지도에 표시되지 않을 수 있습니다: {', '.join(unmapped_countries)}. 'processed_whr.csv' 파일의 국가명과 코드 매핑을 확인해주세요."))
 
-        return df
+        return df, messages
     except FileNotFoundError:
-        st.error("`processed_whr.csv` 파일을 찾을 수 없습니다. 파일을 업로드하거나 경로를 확인해주세요.")
-        return pd.DataFrame()
+        messages.append(('error', "`processed_whr.csv` 파일을 찾을 수 없습니다. 파일을 업로드하거나 경로를 확인해주세요."))
+        return pd.DataFrame(), messages
     except Exception as e:
-        st.error(f"데이터 로드 중 오류가 발생했습니다: {e}")
-        return pd.DataFrame()
+        messages.append(('error', f"데이터 로드 중 오류가 발생했습니다: {e}"))
+        return pd.DataFrame(), messages
 
-# 데이터 로드
-df = load_data()
+# 데이터 로드 (같은 세션에서 다른 상관성 페이지가 이미 읽었으면 그 결과를 그대로 사용)
+# 데이터셋 버전 ID: 아래 캐시 함수는 DataFrame 대신 이 ID와 파라미터로 결과를 찾습니다.
+data_version = dataset_version()
+results = session_results(data_version)
+df = stored_frame(results, 'analysis_frame', lambda: load_data(data_version))
 
 if df.empty:
     st.stop()
@@ -154,7 +127,9 @@ else:
     selected_factors = st.multiselect(
         "관대함 지수와의 상관성을 분석할 요인을 선택하세요:",
         options=available_factors,
-        default=['Log GDP per capita'] if 'Log GDP per capita' in available_factors else (available_factors[0] if available_factors else [])
+        **shared_selection('selected_factors_00', 'factors',
+                           ['Log GDP per capita'] if 'Log GDP per capita' in available_factors else available_factors[:1],
+                           available_factors)
     )
 
     if selected_factors:
@@ -164,98 +139,61 @@ else:
             * `+1`에 가까울수록 양의 선형 관계 (요인 값이 높을수록 관대함도 높음)
             * `-1`에 가까울수록 음의 선형 관계 (요인 값이 높을수록 관대함은 낮음)
             * `0`에 가까울수록 선형 관계가 약함
+        * **스피어만/켄달:** 값 대신 순위로 계산하므로 치우친 분포나 이상치에 덜 민감한 단조 관계를 측정합니다.
         """)
-        
-        for factor in selected_factors:
-            st.subheader(f"📈 {factor}와 관대함 지수")
-            
-            correlation_data = df[['Country', 'Year', 'Generosity', factor]].copy()
-            
-            correlation_data['Generosity'] = pd.to_numeric(correlation_data['Generosity'], errors='coerce')
-            correlation_data[factor] = pd.to_numeric(correlation_data[factor], errors='coerce')
 
-            correlation_data.dropna(inplace=True)
+        correlation_method = st.radio(
+            "상관계수 계산 방법을 선택하세요:",
+            options=list(CORRELATION_METHODS),
+            format_func=lambda method: CORRELATION_METHODS[method],
+            horizontal=True,
+            **shared_selection('correlation_method_00', 'correlation_method', next(iter(CORRELATION_METHODS)),
+                               CORRELATION_METHODS)
+        )
+        method_label = CORRELATION_METHODS[correlation_method]
+        
+        # 요인별 숫자 변환 결과는 두 상관성 페이지가 세션 저장소에서 함께 씁니다.
+        factor_frames = {factor: results.get('factor_frame', (factor,),
+                                             lambda factor=factor: numeric_frame(df, ['Generosity', factor]))
+                         for factor in selected_factors}
 
-            if not correlation_data.empty:
-                st.markdown("#### 🌍 전체 데이터 상관계수 (Pooled Correlation)")
-                
-                # OLS 추세선 관련 에러 처리를 위한 try-except 블록 추가
-                try:
-                    if (correlation_data[factor].std() > 1e-9 and 
-                        correlation_data['Generosity'].std() > 1e-9 and 
-                        len(correlation_data) >= 2):
-                        
-                        pooled_correlation = correlation_data['Generosity'].corr(correlation_data[factor])
-                        st.metric(label=f"전체 데이터 '{factor}'와 관대함 지수 간 피어슨 상관계수", value=f"{pooled_correlation:.3f}")
-
-                        fig_scatter = px.scatter(correlation_data, x=factor, y='Generosity',
-                                                 hover_name='Country',
-                                                 color='Country',
-                                                 title=f'전체 데이터: {factor} vs. 관대함 지수',
-                                                 labels={factor: factor, 'Generosity': '관대함 지수'},
-                                                 trendline='ols', # 선형 회귀 추세선 추가
-                                                 color_discrete_sequence=px.colors.qualitative.Plotly)
-                        fig_scatter.update_layout(template="plotly_white", title_x=0.5,
-                                                  margin=dict(t=50, b=50, l=50, r=50))
-                        st.plotly_chart(fig_scatter, use_container_width=True)
-                    else:
-                        st.info(f"전체 데이터에서 '{factor}' 또는 '관대함 지수' 데이터에 충분한 변화가 없거나 데이터 포인트가 부족하여 산점도 및 상관관계를 그릴 수 없습니다. (OLS 추세선 제외)")
-                        if len(correlation_data) > 0:
-                            fig_scatter = px.scatter(correlation_data, x=factor, y='Generosity',
-                                                     hover_name='Country',
-                                                     color='Country',
-                                                     title=f'전체 데이터: {factor} vs. 관대함 지수 (추세선 없음 - 데이터 부족)',
-                                                     labels={factor: factor, 'Generosity': '관대함 지수'},
-                                                     color_discrete_sequence=px.colors.qualitative.Plotly)
-                            fig_scatter.update_layout(template="plotly_white", title_x=0.5,
-                                                      margin=dict(t=50, b=50, l=50, r=50))
-                            st.plotly_chart(fig_scatter, use_container_width=True)
-                except ModuleNotFoundError:
-                    st.error("오류: 'statsmodels' 라이브러리가 설치되어 있지 않아 OLS 추세선을 그릴 수 없습니다.")
-                    st.info("터미널에서 `pip install statsmodels`를 실행하여 설치해 주세요. 추세선 없이 산점도를 표시합니다.")
-                    if len(correlation_data) > 0:
-                        fig_scatter = px.scatter(correlation_data, x=factor, y='Generosity',
-                                                 hover_name='Country',
-                                                 color='Country',
-                                                 title=f'전체 데이터: {factor} vs. 관대함 지수 (추세선 없음)',
-                                                 labels={factor: factor, 'Generosity': '관대함 지수'},
-                                                 color_discrete_sequence=px.colors.qualitative.Plotly)
-                        fig_scatter.update_layout(template="plotly_white", title_x=0.5,
-                                                  margin=dict(t=50, b=50, l=50, r=50))
-                        st.plotly_chart(fig_scatter, use_container_width=True)
-                except Exception as e:
-                    st.error(f"산점도 생성 중 알 수 없는 오류가 발생했습니다: {e}. 추세선 없이 산점도를 표시합니다.")
-                    if len(correlation_data) > 0:
-                        fig_scatter = px.scatter(correlation_data, x=factor, y='Generosity',
-                                                 hover_name='Country',
-                                                 color='Country',
-                                                 title=f'전체 데이터: {factor} vs. 관대함 지수 (추세선 없음 - 오류 발생)',
-                                                 labels={factor: factor, 'Generosity': '관대함 지수'},
-                                                 color_discrete_sequence=px.colors.qualitative.Plotly)
-                        fig_scatter.update_layout(template="plotly_white", title_x=0.5,
-                                                  margin=dict(t=50, b=50, l=50, r=50))
-                        st.plotly_chart(fig_scatter, use_container_width=True)
-                
+        # 섹션 자리를 선택 순서대로 먼저 잡아 두고, 요인별로 산점도와 상관계수를 그려 차례로 채웁니다 (whr/sections.py).
+        section_slots = {factor: st.empty() for factor in selected_factors}
+        for factor in selected_factors:
+            if factor_frames[factor].empty:
+                with section_slots[factor].container():
+                    st.subheader(f"📈 {factor}와 관대함 지수")
+                    st.info(f"{factor}와 관대함 지수 상관관계를 분석할 데이터가 부족합니다. 해당 요인에 결측치가 많을 수 있습니다.")
+                    st.markdown("---")
+            else:
+                section_slots[factor].caption(f"⏳ '{factor}' 분석 중...")
+
+        ready_frames = {factor: data for factor, data in factor_frames.items() if not data.empty}
+        for scatter in factor_sections(results, ready_frames):
+            factor = scatter.factor
+            with section_slots[factor].container():
+                st.subheader(f"📈 {factor}와 관대함 지수")
+                render_pooled_section(df, data_version, factor, correlation_method, scatter)
                 st.markdown("---")
 
                 st.markdown("#### 🏘️ 국가 내 상관계수 평균 (Average Within-Country Correlation)")
-                country_correlations = []
-                for country in correlation_data['Country'].unique():
-                    country_df = correlation_data[correlation_data['Country'] == country]
-                    if len(country_df) >= 2 and country_df[factor].std() > 1e-9 and country_df['Generosity'].std() > 1e-9:
-                        corr = country_df['Generosity'].corr(country_df[factor])
-                        country_correlations.append(corr)
+                # 관측치 2개 이상, 값이 변하는 국가들의 상관계수를 한 번에 계산
+                country_correlations = method_country_correlations(df, data_version, factor, correlation_method)['Correlation'].tolist()
                 
                 if country_correlations:
                     avg_within_country_corr = pd.Series(country_correlations).mean()
-                    st.metric(label=f"국가 내 '{factor}'와 관대함 지수 간 평균 피어슨 상관계수", value=f"{avg_within_country_corr:.3f}")
+                    st.metric(label=f"국가 내 '{factor}'와 관대함 지수 간 평균 {method_label} 상관계수", value=f"{avg_within_country_corr:.3f}")
+                    if correlation_method == 'pearson':
+                        bootstrap_ci, n_bootstrap = bootstrap_interval(df, data_version, factor)
+                        st.caption(f"95% 신뢰구간: [{bootstrap_ci[1, 0]:.3f}, {bootstrap_ci[1, 1]:.3f}] (국가 단위 군집 부트스트랩 {n_bootstrap:,}회)")
                     st.info(f"({len(country_correlations)}개 국가의 상관계수 평균)")
+                    render_country_tests(df, data_version, factor)
                 else:
                     st.info("각 국가 내에서 상관계수를 계산하기에 충분한 데이터가 없습니다.")
+                st.markdown("---")
 
-            else:
-                st.info(f"{factor}와 관대함 지수 상관관계를 분석할 데이터가 부족합니다. 해당 요인에 결측치가 많을 수 있습니다.")
-            st.markdown("---")
+        # 요인별 상관계수의 연도별 / 이동 구간 추이 (데이터셋 버전별 누적 통계량 캐시)
+        render_timeline_section(df, data_version, selected_factors)
     else:
         st.info("분석할 요인을 하나 이상 선택해주세요.")
 
@@ -267,18 +205,17 @@ st.markdown("""
 전체 국가의 평균 추이와 특정 국가의 추이를 비교할 수 있습니다.
 """)
 
-# Prepare data for trend analysis
-trend_data_cols = ['Year', 'Country', 'Generosity'] + available_factors 
-trend_data_numeric = df[trend_data_cols].copy()
+def trend_inputs():
+    """추이 분석용 숫자 변환 데이터와 연도별 전체 평균 (세션 저장소에 보관되어 페이지를 다시 열어도 재계산하지 않음)."""
+    numeric = numeric_frame(df, available_factors, keys=('Year', 'Country', 'Generosity'))
+    overall = numeric.groupby('Year')[available_factors].mean().reset_index()
+    overall['Country'] = '전체 평균'
+    return numeric, overall
 
-for col in available_factors: 
-    trend_data_numeric[col] = pd.to_numeric(trend_data_numeric[col], errors='coerce')
-trend_data_numeric.dropna(subset=available_factors, inplace=True) 
+# Prepare data for trend analysis
+trend_data_numeric, yearly_overall_average = results.get('00_trend_inputs', (tuple(available_factors),), trend_inputs)
 
 if not trend_data_numeric.empty:
-    # Calculate overall yearly average for Generosity and selected factors
-    yearly_overall_average = trend_data_numeric.groupby('Year')[available_factors].mean().reset_index()
-    yearly_overall_average['Country'] = '전체 평균'
 
     # Get South Korea data
     korea_data = trend_data_numeric[trend_data_numeric['Country'] == 'South Korea'].copy()
@@ -306,7 +243,7 @@ if not trend_data_numeric.empty:
     selected_countries_for_plot = st.multiselect(
         "추이를 비교할 국가를 선택하세요:",
         options=all_plot_countries_options,
-        default=default_countries_selection
+        **shared_selection('trend_countries_00', 'countries', default_countries_selection, all_plot_countries_options)
     )
 
     # Filter data based on selected countries
@@ -369,7 +306,7 @@ if not trend_data_numeric.empty:
             fig_trend.update_layout(template="plotly_white", title_x=0.5,
                                     margin=dict(t=50, b=50, l=50, r=50),
                                     hovermode="x unified")
-            st.plotly_chart(fig_trend, use_container_width=True)
+            st.plotly_chart(compact_figure(fig_trend), use_container_width=True)
         else:
             st.info("추이를 볼 변수를 하나 이상 선택해주세요. '관대함' 지수는 기본으로 표시됩니다.")
 else:
@@ -385,4 +322,11 @@ st.markdown("""
 * **개별 국가:** 특정 국가의 연도별 변화를 보여줍니다.
 
 이러한 시각화는 데이터의 복잡성을 이해하는 데 유용하지만, 더 깊이 있는 통계적 추론을 위해서는 위에서 언급된 **혼합 효과 모델**이나 **패널 데이터 분석**과 같은 고급 방법론을 고려해야 합니다.
+아래 **패널 회귀 분석** 섹션에서 선택된 요인에 대해 이러한 모형을 직접 추정해 볼 수 있습니다.
 """)
+
+# --- 패널 회귀 분석 섹션 ---
+st.markdown("---")
+render_panel_section(df, data_version, selected_factors if available_factors else [])
+
+finish_rerun(rerun_timer)
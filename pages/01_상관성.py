@@ -1,10 +1,25 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go # plotly.graph_objects 임포트
-from plotly.subplots import make_subplots # make_subplots 임포트
 import io
 
+from whr.artifacts import read_source
+from whr.clustering import CLUSTER_COUNTS, DEFAULT_CLUSTERS
+from whr.data import COUNTRY_TO_ISO, numeric_frame
+from whr.figures import trend_figure
+from whr.impute import IMPUTE_METHODS
+from whr.impute import load_results as load_imputed_results
+from whr.payload import compact_figure
+from whr.ranks import CORRELATION_METHODS
+from whr.rollup import ALL_REGIONS, CUBE_STATS, load_cube
+from whr.traces import TraceBuilder
+from whr.ui import (bootstrap_interval, cache_data, cache_resource, finish_rerun, method_country_correlations,
+                    factor_sections, render_country_tests, render_panel_section, render_pooled_section,
+                    render_timeline_section, dataset_version, session_results, shared_selection, start_rerun,
+                    stored_frame, trajectory_clusters)
+
+rerun_timer = start_rerun('01_상관성')
+
 # --------------------
 # 1. 페이지 설정 (하위 페이지에도 설정 가능)
 # --------------------
@@ -17,14 +32,18 @@ st.set_page_config(
 # --------------------
 # 2. 데이터 로드 (메인 앱과 동일하게 캐시 사용)
 # --------------------
-@st.cache_data
-def load_data():
+@cache_data
+def load_data(version):
     """
     CSV 파일을 로드하고 필요한 컬럼명을 통일합니다.
     세계 지도 시각화를 위해 국가명과 ISO-ALPHA-3 코드 매핑을 시도합니다.
+    version: 데이터셋 버전 ID. 본문에서는 쓰지 않고, 원본 CSV가 바뀌면 다시 읽도록 캐시 키로만 씁니다.
+    (DataFrame, 메시지 목록)을 반환합니다. 경고/오류는 여기서 그리지 않고 (종류, 내용)으로 돌려주며,
+    페이지가 세션 저장소의 결과와 함께 리런마다 보여 줍니다 (whr.ui.stored_frame). 읽기에 실패하면 빈 DataFrame입니다.
     """
+    messages = []
     try:
-        df = pd.read_csv('processed_whr.csv')
+        df = read_source('processed_whr.csv')
 
         expected_raw_columns = [
             'Country', 'year', 'generosity', 'life_ladder', 'log_gdp_per_capita',
@@ -35,11 +54,12 @@ def load_data():
 
         missing_columns_in_csv = [col for col in expected_raw_columns if col not in df.columns]
         if missing_columns_in_csv:
-            st.error(f"필수 컬럼이 누락되었습니다: {', '.join(missing_columns_in_csv)}. 파일의 컬럼명을 확인해주세요.")
-            return pd.DataFrame()
+            messages.append(('error', f"필수 컬럼이 누락되었습니다: {', '.join(missing_columns_in_csv)}. 파일의 컬럼명을 확인해주세요."))
+            return pd.DataFrame(), messages
 
         df.rename(columns={
             'Country': 'Country',
+            'regional_indicator': 'Region',
             'year': 'Year',
             'generosity': 'Generosity',
             'life_ladder': 'Life Ladder',
@@ -54,79 +74,59 @@ def load_data():
         }, inplace=True)
 
         display_columns = [
-            'Country', 'Year', 'Generosity', 'Life Ladder', 'Log GDP per capita',
+            'Country', 'Region', 'Year', 'Generosity', 'Life Ladder', 'Log GDP per capita',
             'Social Support', 'Healthy Life Expectancy at Birth',
             'Freedom to Make Life Choices', 'Perceptions of Corruption',
             'Positive Affect', 'Negative Affect', 'Confidence in National Government'
         ]
         df = df[[col for col in display_columns if col in df.columns]].copy()
 
-        country_to_iso = {
-            'South Korea': 'KOR', 'United States': 'USA', 'Canada': 'CAN',
-            'Germany': 'DEU', 'France': 'FRA', 'United Kingdom': 'GBR',
-            'Japan': 'JPN', 'China': 'CHN', 'India': 'IND',
-            'Australia': 'AUS', 'Brazil': 'BRA', 'Mexico': 'MEX',
-            'Russia': 'RUS', 'Spain': 'ESP', 'Italy': 'ITA',
-            'Sweden': 'SWE', 'Norway': 'NOR', 'Denmark': 'DNK',
-            'Finland': 'FIN', 'Switzerland': 'CHE', 'Netherlands': 'NLD',
-            'Belgium': 'BEL', 'Austria': 'AUT', 'New Zealand': 'NZL',
-            'Argentina': 'ARG', 'South Africa': 'ZAF', 'Egypt': 'EGY',
-            'Nigeria': 'NGA', 'Indonesia': 'IDN', 'Turkey': 'TUR',
-            'Ireland': 'IRL', 'Luxembourg': 'LUX', 'Iceland': 'ISL',
-            'Israel': 'ISR', 'Chile': 'CHL', 'Colombia': 'COL',
-            'Thailand': 'THA', 'Vietnam': 'VNM', 'Philippines': 'PHL',
-            'Greece': 'GRC', 'Portugal': 'PRT', 'Poland': 'POL',
-            'Hungary': 'HUN', 'Czech Republic': 'CZE', 'Slovakia': 'SVK',
-            'Romania': 'ROU', 'Bulgaria': 'BGR', 'Croatia': 'HRV',
-            'Estonia': 'EST', 'Latvia': 'LVA', 'Lithuania': 'LTU',
-            'Slovenia': 'SVN', 'Cyprus': 'CYP', 'Malta': 'MLT',
-            'Afghanistan': 'AFG', 'Albania': 'ALB', 'Algeria': 'DZA', 'Angola': 'AGO',
-            'Armenia': 'ARM', 'Azerbaijan': 'AZE', 'Bahrain': 'BHR', 'Bangladesh': 'BGD',
-            'Belarus': 'BLR', 'Benin': 'BEN', 'Bhutan': 'BTN', 'Bolivia': 'BOL',
-            'Bosnia and Herzegovina': 'BIH', 'Botswana': 'BWA', 'Burkina Faso': 'BFA',
-            'Burundi': 'BDI', 'Cambodia': 'KHM', 'Cameroon': 'CMR', 'Central African Republic': 'CAF',
-            'Chad': 'TCD', 'Comoros': 'COM', 'Congo (Brazzaville)': 'COG', 'Congo (Kinshasa)': 'COD',
-            'Costa Rica': 'CRI', 'Cote d\'Ivoire': 'CIV', 'Cuba': 'CUB', 'Djibouti': 'DJI',
-            'Dominican Republic': 'DOM', 'Ecuador': 'ECU', 'El Salvador': 'SLV', 'Equatorial Guinea': 'GNQ',
-            'Eritrea': 'ERI', 'Ethiopia': 'ETH', 'Fiji': 'FJI', 'Gabon': 'GAB', 'Gambia': 'GMB',
-            'Georgia': 'GEO', 'Ghana': 'GHA', 'Guatemala': 'GTM', 'Guinea': 'GIN', 'Guinea-Bissau': 'GNB',
-            'Guyana': 'GUY', 'Haiti': 'HTI', 'Honduras': 'HND', 'Hong Kong S.A.R., China': 'HKG',
-            'Iran': 'IRN', 'Iraq': 'IRQ', 'Jamaica': 'JAM', 'Jordan': 'JOR', 'Kazakhstan': 'KAZ',
-            'Kenya': 'KEN', 'Kosovo': 'XKX', 'Kuwait': 'KWT', 'Kyrgyzstan': 'KGZ', 'Laos': 'LAO',
-            'Lebanon': 'LBN', 'Lesotho': 'LSO', 'Liberia': 'LBR', 'Libya': 'LBY', 'Madagascar': 'MDG',
-            'Malawi': 'MWI', 'Malaysia': 'MYS', 'Maldives': 'MDV', 'Mali': 'MLI', 'Mauritania': 'MRT',
-            'Mauritius': 'MUS', 'Moldova': 'MDA', 'Mongolia': 'MNG', 'Montenegro': 'MNE',
-            'Morocco': 'MAR', 'Mozambique': 'MOZ', 'Myanmar': 'MMR', 'Namibia': 'NAM', 'Nepal': 'NPL',
-            'Nicaragua': 'NIC', 'Niger': 'NER', 'North Macedonia': 'MKD', 'Oman': 'OMN', 'Pakistan': 'PAK',
-            'Palestine': 'PSE', 'Panama': 'PAN', 'Papua New Guinea': 'PNG', 'Paraguay': 'PRY',
-            'Peru': 'PER', 'Qatar': 'QAT', 'Rwanda': 'RWA', 'Saudi Arabia': 'SAU', 'Senegal': 'SEN',
-            'Serbia': 'SRB', 'Sierra Leone': 'SLE', 'Singapore': 'SGP', 'Somalia': 'SOM',
-            'South Sudan': 'SSD', 'Sri Lanka': 'LKA', 'Sudan': 'SDN', 'Suriname': 'SUR',
-            'Syria': 'SYR', 'Taiwan Province of China': 'TWN', 'Tanzania': 'TZA', 'Togo': 'TGO',
-            'Trinidad and Tobago': 'TTO', 'Tunisia': 'TUN', 'Uganda': 'UGA', 'Ukraine': 'UKR',
-            'United Arab Emirates': 'ARE', 'Uruguay': 'URY', 'Uzbekistan': 'UZB', 'Venezuela': 'VEN',
-            'Yemen': 'YEM', 'Zambia': 'ZMB', 'Zimbabwe': 'ZWE'
-        }
-        df['iso_alpha'] = df['Country'].map(country_to_iso)
+        df['iso_alpha'] = df['Country'].map(COUNTRY_TO_ISO)
 
         unmapped_countries = df[df['iso_alpha'].isnull()]['Country'].unique().tolist()
         if unmapped_countries:
-            st.warning(f"경고: 다음 국가들은 ISO 코드를 찾을 수 없어 지도에 표시되지 않을 수 있습니다: {', '.join(unmapped_countries)}. 'processed_whr.csv' 파일의 국가명과 코드 매핑을 확인해주세요.")
+            messages.append(('warning', f"경고: 다음 국가들은 ISO 코드를 찾을 수 없어 지도에 표시되지 않을 수 있습니다: {', '.join(unmapped_countries)}. 'processed_whr.csv' 파일의 국가명과 코드 매핑을 확인해주세요."))
 
-        return df
+        return df, messages
     except FileNotFoundError:
-        st.error("`processed_whr.csv` 파일을 찾을 수 없습니다. 파일을 업로드하거나 경로를 확인해주세요.")
-        return pd.DataFrame()
+        messages.append(('error', "`processed_whr.csv` 파일을 찾을 수 없습니다. 파일을 업로드하거나 경로를 확인해주세요."))
+        return pd.DataFrame(), messages
     except Exception as e:
-        st.error(f"데이터 로드 중 오류가 발생했습니다: {e}")
-        return pd.DataFrame()
-
-# 데이터 로드
-df = load_data()
+        messages.append(('error', f"데이터 로드 중 오류가 발생했습니다: {e}"))
+        return pd.DataFrame(), messages
+
+@cache_data
+def load_rollup_cube(_df, version):
+    """지역 × 연도 × 지표 집계 큐브 (사전 계산 산출물이 있으면 그대로 사용)."""
+    return load_cube(_df)
+
+@cache_data
+def load_imputed_panel(_df, version):
+    """빈 연도를 방법별로 채운 패널 (사전 계산 산출물이 있으면 그대로 사용, 리런마다 다시 계산하지 않음)."""
+    return load_imputed_results(_df)
+
+@cache_resource
+def trend_trace_builder():
+    """추이 그래프의 (국가, 지표) 트레이스 캐시. 모든 세션과 리런이 공유합니다."""
+    return TraceBuilder()
+
+# 데이터 로드 (같은 세션에서 다른 상관성 페이지가 이미 읽었으면 그 결과를 그대로 사용)
+# 데이터셋 버전 ID: 아래 캐시 함수는 DataFrame 대신 이 ID와 파라미터로 결과를 찾습니다.
+data_version = dataset_version()
+results = session_results(data_version)
+df = stored_frame(results, 'analysis_frame', lambda: load_data(data_version))
 
 if df.empty:
     st.stop()
 
+# 지역 정보(regional_indicator)가 있으면 집계 큐브 준비
+rollup_cube = load_rollup_cube(df, data_version) if 'Region' in df.columns else None
+region_label_format = '{region} (지역 평균)'
+region_labels = {}
+if rollup_cube is not None:
+    region_labels = {region_label_format.format(region=region): region
+                     for region in rollup_cube.regions if region != ALL_REGIONS}
+
 # 최신 연도 계산 (필요한 경우)
 latest_year = df['Year'].max() if 'Year' in df.columns else None
 
@@ -156,7 +156,9 @@ else:
     selected_factors = st.multiselect(
         "관대함 지수와의 상관성을 분석할 요인을 선택하세요:",
         options=available_factors,
-        default=['Log GDP per capita'] if 'Log GDP per capita' in available_factors else (available_factors[0] if available_factors else [])
+        **shared_selection('selected_factors_01', 'factors',
+                           ['Log GDP per capita'] if 'Log GDP per capita' in available_factors else available_factors[:1],
+                           available_factors)
     )
 
     if selected_factors:
@@ -166,95 +168,62 @@ else:
             * `+1`에 가까울수록 양의 선형 관계 (요인 값이 높을수록 관대함도 높음)
             * `-1`에 가까울수록 음의 선형 관계 (요인 값이 높을수록 관대함은 낮음)
             * `0`에 가까울수록 선형 관계가 약함
+        * **스피어만/켄달:** 값 대신 순위로 계산하므로 치우친 분포나 이상치에 덜 민감한 단조 관계를 측정합니다.
         """)
-        
-        for factor in selected_factors:
-            st.subheader(f"📈 {factor}와 관대함 지수")
-            
-            correlation_data = df[['Country', 'Year', 'Generosity', factor]].copy()
-            
-            correlation_data['Generosity'] = pd.to_numeric(correlation_data['Generosity'], errors='coerce')
-            correlation_data[factor] = pd.to_numeric(correlation_data[factor], errors='coerce')
 
-            correlation_data.dropna(inplace=True)
+        correlation_method = st.radio(
+            "상관계수 계산 방법을 선택하세요:",
+            options=list(CORRELATION_METHODS),
+            format_func=lambda method: CORRELATION_METHODS[method],
+            horizontal=True,
+            **shared_selection('correlation_method_01', 'correlation_method', next(iter(CORRELATION_METHODS)),
+                               CORRELATION_METHODS)
+        )
+        method_label = CORRELATION_METHODS[correlation_method]
+        
+        # 요인별 숫자 변환 결과는 두 상관성 페이지가 세션 저장소에서 함께 씁니다.
+        factor_frames = {factor: results.get('factor_frame', (factor,),
+                                             lambda factor=factor: numeric_frame(df, ['Generosity', factor]))
+                         for factor in selected_factors}
 
-            if not correlation_data.empty:
-                st.markdown("#### 🌍 전체 데이터 상관계수 (Pooled Correlation)")
-                
-                # OLS 추세선 관련 에러 처리를 위한 try-except 블록 추가
-                try:
-                    if (correlation_data[factor].std() > 1e-9 and 
-                        correlation_data['Generosity'].std() > 1e-9 and 
-                        len(correlation_data) >= 2):
-                        
-                        pooled_correlation = correlation_data['Generosity'].corr(correlation_data[factor])
-                        st.metric(label=f"전체 데이터 '{factor}'와 관대함 지수 간 피어슨 상관계수", value=f"{pooled_correlation:.3f}")
-
-                        fig_scatter = px.scatter(correlation_data, x=factor, y='Generosity',
-                                                 hover_name='Country',
-                                                 color='Country',
-                                                 title=f'전체 데이터: {factor} vs. 관대함 지수',
-                                                 labels={factor: factor, 'Generosity': '관대함 지수'},
-                                                 trendline='ols', # 선형 회귀 추세선 추가
-                                                 color_discrete_sequence=px.colors.qualitative.Plotly)
-                        fig_scatter.update_layout(template="plotly_white", title_x=0.5,
-                                                  margin=dict(t=50, b=50, l=50, r=50))
-                        st.plotly_chart(fig_scatter, use_container_width=True)
-                    else:
-                        st.info(f"전체 데이터에서 '{factor}' 또는 '관대함 지수' 데이터에 충분한 변화가 없거나 데이터 포인트가 부족하여 산점도 및 상관관계를 그릴 수 없습니다. (OLS 추세선 제외)")
-                        if len(correlation_data) > 0:
-                            fig_scatter = px.scatter(correlation_data, x=factor, y='Generosity',
-                                                     hover_name='Country',
-                                                     color='Country',
-                                                     title=f'전체 데이터: {factor} vs. 관대함 지수 (추세선 없음 - 데이터 부족)',
-                                                     labels={factor: factor, 'Generosity': '관대함 지수'},
-                                                     color_discrete_sequence=px.colors.qualitative.Plotly)
-                            fig_scatter.update_layout(template="plotly_white", title_x=0.5,
-                                                      margin=dict(t=50, b=50, l=50, r=50))
-                            st.plotly_chart(fig_scatter, use_container_width=True)
-                except ModuleNotFoundError:
-                    st.error("오류: 'statsmodels' 라이브러리가 설치되어 있지 않아 OLS 추세선을 그릴 수 없습니다.")
-                    st.info("터미널에서 `pip install statsmodels`를 실행하여 설치해 주세요. 추세선 없이 산점도를 표시합니다.")
-                    if len(correlation_data) > 0:
-                        fig_scatter = px.scatter(correlation_data, x=factor, y='Generosity',
-                                                 hover_name='Country',
-                                                 color='Country',
-                                                 title=f'전체 데이터: {factor} vs. 관대함 지수 (추세선 없음)',
-                                                 labels={factor: factor, 'Generosity': '관대함 지수'},
-                                                 color_discrete_sequence=px.colors.qualitative.Plotly)
-                        fig_scatter.update_layout(template="plotly_white", title_x=0.5,
-                                                  margin=dict(t=50, b=50, l=50, r=50))
-                        st.plotly_chart(fig_scatter, use_container_width=True)
-                except Exception as e:
-                    st.error(f"산점도 생성 중 알 수 없는 오류가 발생했습니다: {e}. 추세선 없이 산점도를 표시합니다.")
-                    if len(correlation_data) > 0:
-                        fig_scatter = px.scatter(correlation_data, x=factor, y='Generosity',
-                                                 hover_name='Country',
-                                                 color='Country',
-                                                 title=f'전체 데이터: {factor} vs. 관대함 지수 (추세선 없음 - 오류 발생)',
-                                                 labels={factor: factor, 'Generosity': '관대함 지수'},
-                                                 color_discrete_sequence=px.colors.qualitative.Plotly)
-                        fig_scatter.update_layout(template="plotly_white", title_x=0.5,
-                                                  margin=dict(t=50, b=50, l=50, r=50))
-                        st.plotly_chart(fig_scatter, use_container_width=True)
-                
+        # 섹션 자리를 선택 순서대로 먼저 잡아 두고, 요인별로 산점도와 상관계수를 그려 차례로 채웁니다 (whr/sections.py).
+        section_slots = {factor: st.empty() for factor in selected_factors}
+        for factor in selected_factors:
+            if factor_frames[factor].empty:
+                with section_slots[factor].container():
+                    st.subheader(f"📈 {factor}와 관대함 지수")
+                    st.info(f"{factor}와 관대함 지수 상관관계를 분석할 데이터가 부족합니다. 해당 요인에 결측치가 많을 수 있습니다.")
+                    st.markdown("---")
+            else:
+                section_slots[factor].caption(f"⏳ '{factor}' 분석 중...")
+
+        ready_frames = {factor: data for factor, data in factor_frames.items() if not data.empty}
+        for scatter in factor_sections(results, ready_frames):
+            factor = scatter.factor
+            with section_slots[factor].container():
+                st.subheader(f"📈 {factor}와 관대함 지수")
+                render_pooled_section(df, data_version, factor, correlation_method, scatter)
                 st.markdown("---")
 
                 st.markdown("#### 🏘️ 국가 내 상관계수 평균 (Average Within-Country Correlation)")
-                country_correlations = []
-                for country in correlation_data['Country'].unique():
-                    country_df = correlation_data[correlation_data['Country'] == country]
-                    if len(country_df) >= 2 and country_df[factor].std() > 1e-9 and country_df['Generosity'].std() > 1e-9:
-                        corr = country_df['Generosity'].corr(country_df[factor])
-                        country_correlations.append({'Country': country, 'Correlation': corr})
+                # 관측치 2개 이상, 값이 변하는 국가들의 상관계수를 한 번에 계산
+                country_correlations = method_country_correlations(df, data_version, factor, correlation_method).to_dict('records')
                 
                 if country_correlations:
                     country_corr_df = pd.DataFrame(country_correlations)
                     avg_within_country_corr = country_corr_df['Correlation'].mean()
-                    st.metric(label=f"국가 내 '{factor}'와 관대함 지수 간 평균 피어슨 상관계수", value=f"{avg_within_country_corr:.3f}")
+                    st.metric(label=f"국가 내 '{factor}'와 관대함 지수 간 평균 {method_label} 상관계수", value=f"{avg_within_country_corr:.3f}")
+                    if correlation_method == 'pearson':
+                        bootstrap_ci, n_bootstrap = bootstrap_interval(df, data_version, factor)
+                        st.caption(f"95% 신뢰구간: [{bootstrap_ci[1, 0]:.3f}, {bootstrap_ci[1, 1]:.3f}] (국가 단위 군집 부트스트랩 {n_bootstrap:,}회)")
                     st.info(f"({len(country_correlations)}개 국가의 상관계수 평균)")
+                    significant_countries = render_country_tests(df, data_version, factor)
 
-                    # 상관관계 상위 3개국, 하위 3개국 추출
+                    # 상관관계 상위 3개국, 하위 3개국 추출 ('유의한 국가만 보기'가 켜져 있으면 유의한 국가 중에서)
+                    if significant_countries is not None:
+                        country_corr_df = country_corr_df[country_corr_df['Country'].isin(significant_countries)]
+                        if country_corr_df.empty:
+                            st.info("FDR 보정 후 유의한 국가가 없습니다.")
                     top_3_countries = country_corr_df.nlargest(3, 'Correlation')['Country'].tolist()
                     bottom_3_countries = country_corr_df.nsmallest(3, 'Correlation')['Country'].tolist()
 
@@ -289,16 +258,16 @@ else:
                         
                         fig_specific_scatter.update_layout(template="plotly_white", title_x=0.5,
                                                             margin=dict(t=50, b=50, l=50, r=50))
-                        st.plotly_chart(fig_specific_scatter, use_container_width=True)
+                        st.plotly_chart(compact_figure(fig_specific_scatter), use_container_width=True)
                     else:
                         st.info("선택된 주요 국가에 대한 데이터가 부족하여 산점도를 그릴 수 없습니다.")
 
                 else:
                     st.info("각 국가 내에서 상관계수를 계산하기에 충분한 데이터가 없습니다.")
+                st.markdown("---")
 
-            else:
-                st.info(f"{factor}와 관대함 지수 상관관계를 분석할 데이터가 부족합니다. 해당 요인에 결측치가 많을 수 있습니다.")
-            st.markdown("---")
+        # 요인별 상관계수의 연도별 / 이동 구간 추이 (데이터셋 버전별 누적 통계량 캐시)
+        render_timeline_section(df, data_version, selected_factors)
     else:
         st.info("분석할 요인을 하나 이상 선택해주세요.")
 
@@ -310,18 +279,35 @@ st.markdown("""
 전체 국가의 평균 추이와 특정 국가의 추이를 비교할 수 있습니다.
 """)
 
-# Prepare data for trend analysis
-trend_data_cols = ['Year', 'Country'] + available_factors 
-trend_data_numeric = df[trend_data_cols].copy()
+# 빈 연도 채우기: 채우지 않으면 요인 중 하나라도 빠진 행은 추이에서 제외됩니다.
+trend_fill_col1, trend_fill_col2 = st.columns([1, 3])
+with trend_fill_col1:
+    trend_fill_gaps = st.checkbox("빈 연도 채우기", key="trend_fill_gaps")
+if trend_fill_gaps:
+    with trend_fill_col2:
+        trend_fill_method = st.radio("채우는 방법:", options=list(IMPUTE_METHODS),
+                                     format_func=lambda method: IMPUTE_METHODS[method], horizontal=True,
+                                     key="trend_fill_method")
+
+trend_fill = trend_fill_method if trend_fill_gaps and available_factors else None
+
+def trend_inputs():
+    """추이 분석용 데이터(빈 연도를 채운 패널 또는 숫자 변환 데이터)와 연도별 전체 평균 (세션 저장소에 보관)."""
+    if trend_fill is not None:
+        numeric = load_imputed_panel(df, data_version).frame(trend_fill, available_factors)
+    else:
+        numeric = numeric_frame(df, available_factors, keys=('Year', 'Country'))
+    overall = numeric.groupby('Year')[available_factors].mean().reset_index()
+    overall['Country'] = '전체 평균'
+    return numeric, overall
 
-for col in available_factors: 
-    trend_data_numeric[col] = pd.to_numeric(trend_data_numeric[col], errors='coerce')
-trend_data_numeric.dropna(subset=available_factors, inplace=True) 
+# Prepare data for trend analysis
+trend_data_numeric, yearly_overall_average = results.get('01_trend_inputs', (trend_fill, tuple(available_factors)),
+                                                         trend_inputs)
+if trend_fill is not None:
+    st.caption(f"빈 연도를 채운 행 {int(trend_data_numeric['Imputed'].sum())}개를 포함합니다 (속이 빈 원으로 표시).")
 
 if not trend_data_numeric.empty:
-    # Calculate overall yearly average for Generosity and selected factors
-    yearly_overall_average = trend_data_numeric.groupby('Year')[available_factors].mean().reset_index()
-    yearly_overall_average['Country'] = '전체 평균'
 
     # Get South Korea data
     korea_data = trend_data_numeric[trend_data_numeric['Country'] == 'South Korea'].copy()
@@ -330,6 +316,8 @@ if not trend_data_numeric.empty:
     all_plot_countries_options = sorted(trend_data_numeric['Country'].unique().tolist())
     if '전체 평균' not in all_plot_countries_options:
         all_plot_countries_options.insert(0, '전체 평균')
+    # 지역 평균은 '전체 평균' 바로 뒤에 배치 (집계 큐브에서 바로 조회)
+    all_plot_countries_options[1:1] = list(region_labels)
     
     # Define default selected countries for the multiselect
     robust_default_countries_selection = []
@@ -345,16 +333,43 @@ if not trend_data_numeric.empty:
     selected_countries_for_plot = st.multiselect(
         "추이를 비교할 국가를 선택하세요:",
         options=all_plot_countries_options,
-        default=robust_default_countries_selection
+        **shared_selection('trend_countries_01', 'countries', robust_default_countries_selection,
+                           all_plot_countries_options)
     )
 
+    # 추이가 비슷한 국가끼리 묶은 군집의 평균선 (사전 계산된 k-평균 군집 사용)
+    show_cluster_means = st.checkbox("추이가 비슷한 국가 군집의 평균선 보기 ('전체 평균' 대신 표시)")
+    cluster_trend_df = pd.DataFrame()
+    if show_cluster_means:
+        cluster_col1, cluster_col2 = st.columns(2)
+        with cluster_col1:
+            n_clusters = st.select_slider("군집 수:", options=CLUSTER_COUNTS, value=DEFAULT_CLUSTERS)
+        with cluster_col2:
+            cluster_metrics = st.multiselect("군집 기준 지표:", options=available_factors,
+                                             default=['Generosity'] if 'Generosity' in available_factors else available_factors[:1])
+        if cluster_metrics:
+            clusters = trajectory_clusters(df, data_version, tuple(cluster_metrics))
+            cluster_trend_df = clusters.trend_frame(trend_data_numeric, n_clusters, available_factors)
+            with st.expander("군집별 소속 국가"):
+                members = clusters.assignments(n_clusters).rename_axis('Country').reset_index()
+                st.dataframe(members.groupby('Cluster')['Country'].agg(lambda c: ', '.join(sorted(c))).reset_index(),
+                             use_container_width=True)
+        else:
+            st.info("군집 기준 지표를 하나 이상 선택해주세요.")
+
     # Filter data based on selected countries
     plot_df_final = pd.DataFrame()
     
-    if '전체 평균' in selected_countries_for_plot:
+    if '전체 평균' in selected_countries_for_plot and cluster_trend_df.empty:
         plot_df_final = pd.concat([plot_df_final, yearly_overall_average])
+    plot_df_final = pd.concat([plot_df_final, cluster_trend_df])
     
-    actual_countries_selected = [c for c in selected_countries_for_plot if c != '전체 평균']
+    selected_regions = [region_labels[c] for c in selected_countries_for_plot if c in region_labels]
+    if selected_regions:
+        plot_df_final = pd.concat([plot_df_final, rollup_cube.trend_frame(selected_regions, available_factors,
+                                                                          label=region_label_format)])
+
+    actual_countries_selected = [c for c in selected_countries_for_plot if c != '전체 평균' and c not in region_labels]
     if actual_countries_selected:
         other_selected_countries_data = trend_data_numeric[trend_data_numeric['Country'].isin(actual_countries_selected)].copy()
         plot_df_final = pd.concat([plot_df_final, other_selected_countries_data])
@@ -373,82 +388,67 @@ if not trend_data_numeric.empty:
         )
 
         if final_selected_variables_for_plot:
-            # Create a subplot with secondary y-axis
-            fig_trend = make_subplots(specs=[[{"secondary_y": True}]])
-
-            # Define which variables go on which axis
-            primary_y_variables = ['Generosity'] if 'Generosity' in final_selected_variables_for_plot else []
-            secondary_y_variables = [var for var in final_selected_variables_for_plot if var != 'Generosity']
-
-            # Define a color palette for metrics
-            # Using Plotly's qualitative colors for distinctness
-            colors = px.colors.qualitative.Bold
-            metric_color_map = {metric: colors[i % len(colors)] for i, metric in enumerate(available_factors)}
-
-            # Define dash styles for countries
-            dash_styles = ['solid', 'dash', 'dot', 'longdash', 'dashdot', 'longdashdot']
-            country_dash_map = {country: dash_styles[i % len(dash_styles)] for i, country in enumerate(plot_df_final['Country'].unique())}
-
-            # Add traces for primary Y-axis (Generosity)
-            if primary_y_variables:
-                for country in plot_df_final['Country'].unique():
-                    country_data = plot_df_final[plot_df_final['Country'] == country]
-                    for metric in primary_y_variables:
-                        if metric in country_data.columns:
-                            fig_trend.add_trace(
-                                go.Scatter(
-                                    x=country_data['Year'],
-                                    y=country_data[metric],
-                                    mode='lines+markers',
-                                    name=f"{country} ({metric})",
-                                    legendgroup=metric, # Group by metric for consistent color
-                                    showlegend=True,
-                                    line=dict(
-                                        color=metric_color_map.get(metric, 'black'), # Color by metric
-                                        dash=country_dash_map.get(country, 'solid') # Dash by country
-                                    )
-                                ),
-                                secondary_y=False, # Primary Y-axis
-                            )
-            
-            # Add traces for secondary Y-axis (other selected factors)
-            if secondary_y_variables:
-                for country in plot_df_final['Country'].unique():
-                    country_data = plot_df_final[plot_df_final['Country'] == country]
-                    for metric in secondary_y_variables:
-                        if metric in country_data.columns:
-                            fig_trend.add_trace(
-                                go.Scatter(
-                                    x=country_data['Year'],
-                                    y=country_data[metric],
-                                    mode='lines+markers',
-                                    name=f"{country} ({metric})",
-                                    legendgroup=metric, # Group by metric for consistent color
-                                    showlegend=True,
-                                    line=dict(
-                                        color=metric_color_map.get(metric, 'black'), # Color by metric
-                                        dash=country_dash_map.get(country, 'solid') # Dash by country
-                                    )
-                                ),
-                                secondary_y=True, # Secondary Y-axis
-                            )
-
-            # Update layout for dual axes
-            fig_trend.update_layout(
-                title_text=f'선택된 변수들의 연도별 추이 (전체 평균 및 선택 국가)',
-                template="plotly_white",
-                title_x=0.5,
-                margin=dict(t=50, b=50, l=50, r=50),
-                hovermode="x unified",
-                yaxis=dict(title='관대함 지수 (좌측 축)'),
-                yaxis2=dict(title='다른 요인 값 (우측 축)', overlaying='y', side='right')
-            )
+            # 관대함 지수는 왼쪽 축, 다른 요인은 오른쪽 축. (국가, 지표) 트레이스는 국가별로 한 번 묶어서 만들고,
+            # 데이터와 스타일이 그대로인 트레이스는 이전 리런에서 만든 것을 재사용합니다.
+            fig_trend = trend_figure(plot_df_final, final_selected_variables_for_plot, available_factors,
+                                     trend_trace_builder())
             st.plotly_chart(fig_trend, use_container_width=True)
         else:
             st.info("추이를 볼 변수를 하나 이상 선택해주세요. '관대함' 지수는 기본으로 표시됩니다.")
 else:
     st.warning("연도별 추이 분석을 위한 데이터가 부족합니다. 원본 데이터를 확인해주세요.")
 
+# --- 지역별 분석 섹션 ---
+st.markdown("---")
+st.header("🗺️ 지역별 관대함 지수 및 요인 분석")
+st.markdown("""
+이 섹션에서는 `regional_indicator`(지역) 기준으로 미리 집계한 **지역 × 연도 × 지표** 통계를 보여줍니다.
+지역을 선택하면 해당 지역의 연도별 통계와 소속 국가 목록으로 드릴다운할 수 있습니다.
+""")
+
+if rollup_cube is not None and region_labels:
+    stat_labels = {'mean': '평균', 'median': '중앙값', 'count': '국가 수', 'var': '분산'}
+    region_col1, region_col2 = st.columns(2)
+    with region_col1:
+        region_metric = st.selectbox("지표를 선택하세요:", options=rollup_cube.metrics,
+                                     index=rollup_cube.metrics.index('Generosity') if 'Generosity' in rollup_cube.metrics else 0)
+    with region_col2:
+        region_stat = st.selectbox("통계량을 선택하세요:", options=CUBE_STATS, format_func=lambda stat: stat_labels[stat])
+
+    region_frame = rollup_cube.frame(region_metric, region_stat)
+    region_long = region_frame.reset_index().melt(id_vars='Region', var_name='Year', value_name='Value').dropna(subset=['Value'])
+    fig_region = px.line(region_long, x='Year', y='Value', color='Region',
+                         title=f"지역별 {region_metric} {stat_labels[region_stat]} 추이",
+                         labels={'Year': '연도', 'Value': stat_labels[region_stat], 'Region': '지역'},
+                         markers=True,
+                         color_discrete_sequence=px.colors.qualitative.Bold)
+    fig_region.update_layout(template="plotly_white", title_x=0.5,
+                             margin=dict(t=50, b=50, l=50, r=50),
+                             hovermode="x unified")
+    st.plotly_chart(compact_figure(fig_region), use_container_width=True)
+
+    st.subheader("🔎 지역 드릴다운")
+    drill_col1, drill_col2 = st.columns(2)
+    with drill_col1:
+        drill_region = st.selectbox("지역을 선택하세요:", options=list(region_labels.values()))
+    with drill_col2:
+        drill_year = st.selectbox("연도를 선택하세요:", options=rollup_cube.years[::-1],
+                                  **shared_selection('drill_year', 'year', rollup_cube.years[-1], rollup_cube.years))
+
+    st.write(f"**{drill_region} ({drill_year}년) 지표별 통계**")
+    st.dataframe(rollup_cube.year_table(drill_region, drill_year).rename(columns=stat_labels), use_container_width=True)
+
+    # 드릴다운의 최하위 단계: 소속 국가별 값
+    region_countries_df = df[df['Country'].isin(rollup_cube.region_countries[drill_region]) & (df['Year'] == drill_year)]
+    if not region_countries_df.empty:
+        st.write(f"**{drill_region} 소속 국가의 {drill_year}년 {region_metric}**")
+        st.dataframe(region_countries_df[['Country', region_metric]].sort_values(region_metric, ascending=False).reset_index(drop=True),
+                     use_container_width=True)
+    else:
+        st.info(f"{drill_region}의 {drill_year}년 국가별 데이터가 없습니다.")
+else:
+    st.info("데이터에 'regional_indicator' 컬럼이 없어 지역별 분석을 할 수 없습니다.")
+
 st.markdown("""
 ### 💡 고급 분석 고려사항: 반복 측정 데이터의 특성 (추가 설명)
 
@@ -459,4 +459,11 @@ st.markdown("""
 * **개별 국가:** 특정 국가의 연도별 변화를 보여줍니다.
 
 이러한 시각화는 데이터의 복잡성을 이해하는 데 유용하지만, 더 깊이 있는 통계적 추론을 위해서는 위에서 언급된 **혼합 효과 모델**이나 **패널 데이터 분석**과 같은 고급 방법론을 고려해야 합니다.
+아래 **패널 회귀 분석** 섹션에서 선택된 요인에 대해 이러한 모형을 직접 추정해 볼 수 있습니다.
 """)
+
+# --- 패널 회귀 분석 섹션 ---
+st.markdown("---")
+render_panel_section(df, data_version, selected_factors if available_factors else [])
+
+finish_rerun(rerun_timer)
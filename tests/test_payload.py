@@ -0,0 +1,70 @@
+"""
+개요 탭과 상관성 페이지 그림의 페이로드가 whr/payload.py의 FIGURE_BUDGETS 안에 들어가는지 확인합니다.
+
+processed_whr.csv의 모든 연도(와 전체 기간)에 대해 사전 계산 CLI와 같은 방식으로 히스토그램/지도/막대 그림을 만들고,
+요인마다 '전체 데이터' 산점도를, pages/01 연도별 추이는 전체 평균과 5개국의 모든 지표로 그려
+st.plotly_chart가 보내는 것과 같은 JSON 직렬화 크기를 잽니다.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from whr.aggregate import overview_aggregates
+from whr.data import FACTOR_COLUMNS, METRIC_COLUMNS, numeric_frame, read_source_csv, to_display
+from whr.figures import factor_scatter, overview_bar, overview_histogram, overview_map, trend_figure
+from whr.payload import FIGURE_BUDGETS, payload_bytes
+from whr.traces import TraceBuilder
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processed_whr.csv')
+TREND_COUNTRIES = ['South Korea', 'Japan', 'Germany', 'Brazil', 'Kenya']
+
+
+@pytest.fixture(scope='module')
+def source():
+    return to_display(read_source_csv(SOURCE))
+
+
+def overview_figures(df, year):
+    """main.py 개요 탭(과 whr/precompute.py)과 같은 컬럼 구성으로 그린 {이름: 그림}."""
+    data = df if year is None else df[df['Year'] == year]
+    overview = overview_aggregates(data[['Country', 'Generosity', 'Year', 'iso_alpha']])
+    label = '전체 기간' if year is None else str(year)
+    return {
+        'hist': overview_histogram(overview.bins),
+        'map': overview_map(overview.countries),
+        'bar': overview_bar(overview.countries, label),
+    }
+
+
+def test_every_overview_figure_has_a_budget():
+    assert set(FIGURE_BUDGETS) == {'hist', 'map', 'bar', 'scatter', 'trend'}
+
+
+@pytest.mark.parametrize('year', [None] + list(range(2005, 2023)))
+def test_overview_figures_within_budget(source, year):
+    if year is not None and not (source['Year'] == year).any():
+        pytest.skip(f'{year}년 데이터 없음')
+    for name, fig in overview_figures(source, year).items():
+        if fig is None:
+            continue
+        size = payload_bytes(fig)
+        assert size <= FIGURE_BUDGETS[name], f"{year} '{name}': {size:,}바이트 > 예산 {FIGURE_BUDGETS[name]:,}바이트"
+
+
+@pytest.mark.parametrize('factor', FACTOR_COLUMNS)
+def test_factor_scatter_within_budget(source, factor):
+    size = payload_bytes(factor_scatter(numeric_frame(source, ['Generosity', factor]), factor))
+    assert size <= FIGURE_BUDGETS['scatter'], f"'{factor}' 산점도: {size:,}바이트 > 예산 {FIGURE_BUDGETS['scatter']:,}바이트"
+
+
+def test_trend_figure_within_budget(source):
+    """pages/01과 같은 방식으로 '전체 평균' 행을 붙여 모든 지표의 추이를 그립니다."""
+    metrics = [col for col in METRIC_COLUMNS if col in source.columns]
+    numeric = numeric_frame(source, metrics, keys=('Year', 'Country'))
+    overall = numeric.groupby('Year')[metrics].mean().reset_index()
+    overall['Country'] = '전체 평균'
+    frame = pd.concat([overall, numeric[numeric['Country'].isin(TREND_COUNTRIES)]])
+    frame['Country'] = frame['Country'].astype('category')
+    size = payload_bytes(trend_figure(frame, metrics, metrics, TraceBuilder()))
+    assert size <= FIGURE_BUDGETS['trend'], f"추이 그림: {size:,}바이트 > 예산 {FIGURE_BUDGETS['trend']:,}바이트"
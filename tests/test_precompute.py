@@ -0,0 +1,45 @@
+"""
+사전 계산 CLI(whr/precompute.py)의 순위 산출물과 실패 처리를 확인합니다.
+
+산출물은 임시 디렉터리에 processed_whr.csv 일부 국가로 빌드합니다.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from whr.artifacts import metric_slug, open_snapshot
+from whr.data import METRIC_COLUMNS, to_display
+from whr.precompute import build
+from whr.ranks import RANK_SCOPES, rank_table
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processed_whr.csv')
+COUNTRIES = ['South Korea', 'Japan', 'Germany', 'Brazil', 'Kenya', 'India']
+
+
+@pytest.fixture(scope='module')
+def small_source(tmp_path_factory):
+    df = pd.read_csv(SOURCE)
+    path = tmp_path_factory.mktemp('source') / 'small.csv'
+    df[df['Country'].isin(COUNTRIES)].to_csv(path, index=False)
+    return path
+
+
+def test_rank_artifacts_match_rank_table(small_source, tmp_path):
+    version_dir = build(str(small_source), str(tmp_path), jobs=1, log=lambda message: None)
+    df = to_display(open_snapshot(version_dir))
+    expected = rank_table(df, METRIC_COLUMNS)
+    for column in METRIC_COLUMNS:
+        saved = np.load(os.path.join(version_dir, 'ranks', f'{metric_slug(column)}.npy'))
+        for i, scope in enumerate(RANK_SCOPES):
+            np.testing.assert_array_equal(saved[i], expected[scope][column].to_numpy())
+
+
+def test_failed_build_removes_tmp_dir(small_source, tmp_path):
+    broken = tmp_path / 'broken.csv'
+    pd.read_csv(small_source).drop(columns=['life_ladder']).to_csv(broken, index=False)
+    out = tmp_path / 'artifacts'
+    with pytest.raises(KeyError):
+        build(str(broken), str(out), jobs=1, log=lambda message: None)
+    assert os.listdir(out) == []
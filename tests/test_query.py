@@ -0,0 +1,51 @@
+"""
+whr/query.py의 앱 쿼리(개요 탭 집계, 국가별 충분통계량)가 pandas 경로와 같은 값을 내는지 확인합니다.
+
+processed_whr.csv를 FrameSource(앱의 기본 경로)와, convert_csv로 만든 데이터셋 디렉터리(WHR_SOURCE 경로, 원본 컬럼명)로
+각각 열어 whr/aggregate.py의 overview_aggregates, whr/corr.py의 country_moments와 비교합니다.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from whr.aggregate import overview_aggregates
+from whr.corr import country_moments
+from whr.data import FACTOR_COLUMNS, read_source_csv, to_display
+from whr.query import app_source, convert_csv, overview, pair_moments
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processed_whr.csv')
+
+
+@pytest.fixture(scope='module')
+def source():
+    return to_display(read_source_csv(SOURCE))
+
+
+@pytest.fixture(scope='module', params=['frame', 'dataset'])
+def query_source(request, source, tmp_path_factory):
+    if request.param == 'frame':
+        return app_source(source, '')
+    out_dir = tmp_path_factory.mktemp('dataset')
+    convert_csv(SOURCE, str(out_dir), chunk_rows=500)
+    return app_source(source, str(out_dir))
+
+
+@pytest.mark.parametrize('year, value_range', [(None, None), (2019, None), (2015, (-0.1, 0.1))])
+def test_overview_matches_pandas(source, query_source, year, value_range):
+    data = source if year is None else source[source['Year'] == year]
+    expected = overview_aggregates(data, value_range=value_range)
+    actual = overview(query_source, year, value_range)
+    pd.testing.assert_frame_equal(actual.countries, expected.countries.drop(columns='iso_alpha'), check_dtype=False)
+    np.testing.assert_allclose(actual.mean, expected.mean)
+    np.testing.assert_allclose(actual.bins.edges, expected.bins.edges)
+    np.testing.assert_array_equal(actual.bins.counts, expected.bins.counts)
+
+
+@pytest.mark.parametrize('factor', FACTOR_COLUMNS)
+def test_pair_moments_match_country_moments(source, query_source, factor):
+    expected_countries, expected = country_moments(source, factor)
+    countries, moments = pair_moments(query_source, factor)
+    np.testing.assert_array_equal(countries, expected_countries)
+    np.testing.assert_allclose(moments, expected, rtol=1e-9)
@@ -0,0 +1,66 @@
+"""
+whr/timecorr.py의 누적 통계량으로 구한 구간 상관계수가 구간마다 원본 행으로 직접 계산한 값과 같은지 확인합니다.
+
+직접 계산은 페이지와 같은 pandas 규칙을 씁니다: 관측치 수 조건과 `Series.std() > 1e-9` (값이 변하지 않는 국가 제외).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from whr.data import FACTOR_COLUMNS, read_source_csv, to_display
+from whr.timecorr import MIN_WINDOW_OBS, build_timeline
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processed_whr.csv')
+
+
+@pytest.fixture(scope='module')
+def source():
+    return to_display(read_source_csv(SOURCE))
+
+
+@pytest.fixture(scope='module')
+def timeline(source):
+    return build_timeline(source)
+
+
+def varies(data, factor):
+    return data[factor].std() > 1e-9 and data['Generosity'].std() > 1e-9
+
+
+def direct_window(df, factor, start, end, min_obs=MIN_WINDOW_OBS):
+    """[start, end] 구간의 (전체 상관계수, 국가 내 상관계수 평균, 국가 수)를 원본 행으로 직접 계산합니다."""
+    data = df[(df['Year'] >= start) & (df['Year'] <= end)][['Country', factor, 'Generosity']].dropna()
+    pooled = data[factor].corr(data['Generosity']) if len(data) >= 2 and varies(data, factor) else np.nan
+    within = [group[factor].corr(group['Generosity']) for _, group in data.groupby('Country')
+              if len(group) >= min_obs and varies(group, factor)]
+    return pooled, (np.mean(within) if within else np.nan), len(within)
+
+
+@pytest.mark.parametrize('factor', FACTOR_COLUMNS)
+@pytest.mark.parametrize('width', [3, 5])
+def test_rolling_matches_direct_windows(source, timeline, factor, width):
+    table = timeline.rolling(width, [factor])
+    assert len(table) == len(timeline.years) - width + 1
+    for row in table.itertuples():
+        pooled, within, countries = direct_window(source, factor, row.Start, row.Year)
+        assert row.Countries == countries
+        np.testing.assert_allclose([row.Pooled, row.Within], [pooled, within], atol=1e-9)
+
+
+def test_yearly_matches_cross_sections(source, timeline):
+    table = timeline.yearly(['Log GDP per capita'])
+    for row in table.itertuples():
+        data = source[source['Year'] == row.Year][['Log GDP per capita', 'Generosity']].dropna()
+        assert row.Observations == len(data)
+        np.testing.assert_allclose(row.Correlation, data['Log GDP per capita'].corr(data['Generosity']), atol=1e-9)
+
+
+def test_constant_country_is_excluded():
+    rows = [('A', year, float(year), 0.1 * year) for year in range(2010, 2016)]
+    rows += [('B', year, 5.0, 0.3 * (year % 2)) for year in range(2010, 2016)]
+    df = pd.DataFrame(rows, columns=['Country', 'Year', 'Life Ladder', 'Generosity'])
+    mean, countries = build_timeline(df, ['Life Ladder']).within('Life Ladder', 2010, 2015)
+    assert countries == 1
+    assert mean == pytest.approx(1.0)
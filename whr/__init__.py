@@ -0,0 +1,5 @@
+"""
+관대함 대시보드(main.py 및 pages/)가 공유하는 데이터/분석 모듈 모음입니다.
+
+whr/ui.py를 제외한 모듈은 Streamlit에 의존하지 않으므로 CLI나 프로세스 풀 워커에서도 그대로 import 할 수 있습니다.
+"""
@@ -0,0 +1,106 @@
+"""
+차트 입력 집계 (서버 쪽 NumPy 계산).
+
+히스토그램 구간별 개수, 그룹(국가)별 평균 같은 차트 입력을 서버에서 미리 계산하므로,
+브라우저로는 원본 행 대신 집계값만 보냅니다. 그림 페이로드 크기는 행 수와 무관하고
+구간 수·그룹 수에만 비례합니다 (국가 평균 대신 응답자 단위 데이터를 넣어도 같음).
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BINS = 20
+# 구간 폭은 (1, 2, 2.5, 5) × 10^k 중에서 고릅니다 (Plotly 자동 구간과 비슷한 '보기 좋은' 폭).
+NICE_STEPS = (1.0, 2.0, 2.5, 5.0, 10.0)
+
+
+def nice_bin_width(lo, hi, nbins=DEFAULT_BINS):
+    """[lo, hi] 범위를 대략 nbins개로 나누는 보기 좋은 구간 폭."""
+    raw = (hi - lo) / max(nbins, 1)
+    if not np.isfinite(raw) or raw <= 0:
+        return 1.0
+    magnitude = 10 ** math.floor(math.log10(raw))
+    return next(step * magnitude for step in NICE_STEPS if step * magnitude >= raw)
+
+
+class HistogramBins:
+    """edges는 구간 경계(len(counts) + 1개, 왼쪽 닫힘), counts는 구간별 관측 수입니다."""
+
+    def __init__(self, edges, counts):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.asarray(counts, dtype=np.int64)
+
+    @property
+    def centers(self):
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    @property
+    def widths(self):
+        return np.diff(self.edges)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+
+def histogram_bins(values, nbins=DEFAULT_BINS):
+    """
+    값 배열의 히스토그램. NaN은 건너뛰며, 구간 시작점은 구간 폭의 배수에 맞춥니다.
+    np.bincount 한 번으로 세므로 행 수에 대해 선형 시간입니다.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return HistogramBins([0.0, 1.0], [0])
+    lo, hi = float(values.min()), float(values.max())
+    width = nice_bin_width(lo, hi, nbins)
+    start = math.floor(lo / width) * width
+    index = np.floor((values - start) / width).astype(np.int64)
+    counts = np.bincount(index)
+    edges = start + width * np.arange(len(counts) + 1)
+    return HistogramBins(edges, counts)
+
+
+def group_means(keys, values):
+    """
+    그룹별 평균과 관측 수 (Group, Mean, Count). 값이 NaN인 행은 건너뜁니다.
+    pd.factorize(해시) + np.bincount로 계산하므로 그룹 수만큼의 표만 남습니다.
+    """
+    keys = np.asarray(keys)
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    codes, groups = pd.factorize(keys[finite], sort=True)
+    counts = np.bincount(codes, minlength=len(groups))
+    sums = np.bincount(codes, weights=values[finite], minlength=len(groups))
+    return pd.DataFrame({'Group': groups, 'Mean': sums / np.maximum(counts, 1), 'Count': counts})
+
+
+class OverviewAggregates:
+    """
+    대시보드 개요 탭 그림의 입력 집계.
+    countries는 국가별 평균 표(Country, Generosity, Count, iso_alpha), bins는 관대함 지수 히스토그램입니다.
+    """
+
+    def __init__(self, countries, bins, mean):
+        self.countries = countries
+        self.bins = bins
+        self.mean = mean
+
+
+def overview_aggregates(df, value='Generosity', value_range=None, nbins=DEFAULT_BINS):
+    """
+    연도 하나로 거른 DataFrame(Country, Generosity, iso_alpha)의 개요 탭 집계를 계산합니다.
+    value_range=(하한, 상한)을 주면 그 범위(양 끝 포함)의 행만 씁니다.
+    """
+    values = pd.to_numeric(df[value], errors='coerce').to_numpy(dtype=float)
+    keep = np.isfinite(values)
+    if value_range is not None:
+        keep &= (values >= value_range[0]) & (values <= value_range[1])
+    countries = df['Country'].to_numpy()[keep]
+    means = group_means(countries, values[keep]).rename(columns={'Group': 'Country', 'Mean': value})
+    if 'iso_alpha' in df.columns:
+        iso = df.loc[keep, ['Country', 'iso_alpha']].dropna().drop_duplicates('Country').set_index('Country')['iso_alpha']
+        means['iso_alpha'] = means['Country'].map(iso)
+    mean = float(values[keep].mean()) if keep.any() else float('nan')
+    return OverviewAggregates(means, histogram_bins(values[keep], nbins), mean)
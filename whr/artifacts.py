@@ -0,0 +1,213 @@
+"""
+사전 계산 산출물(artifact) 디렉터리 읽기/쓰기.
+
+디렉터리 구조 (``artifacts/<version>/``):
+
+* ``manifest.json``    - 버전, 원본 CSV 정보, 컬럼 스펙, 국가/연도 목록, 생성된 파일 목록
+* ``snapshot/*.npy``   - 원본 컬럼별 배열 (문자열 컬럼은 정수 코드 + manifest의 categories)
+* ``ranks/``           - 지표별 국가 내/전체 순위 (스냅샷 행 순서, 스피어만 상관계수용, whr/ranks.py)
+* ``bootstrap/``       - 요인별 국가 단위 군집 부트스트랩 분포 (전체 상관계수, 국가 내 평균)
+* ``figures/<연도>/``  - 대시보드 개요 탭의 직렬화된 Plotly 그림
+* ``rollup/``          - 지역 × 연도 × 지표 집계 큐브 (whr/rollup.py)
+* ``permutation/``     - 요인별 국가별/전체 순열 검정 p 값과 FDR q 값 (whr/permutation.py)
+* ``clusters/``        - 관대함 지수 궤적의 군집 수별 k-평균 군집 레이블 (whr/clustering.py)
+* ``forecast/``        - 모형별 국가별 관대함 지수 예측과 홀드아웃 오차 (whr/forecast.py)
+* ``impute/``          - 방법별로 빈 국가-연도 칸을 채운 (지표, 국가, 연도) 패널과 관측 마스크 (whr/impute.py)
+* ``changes/``         - 지표별 국가-연도 전년 대비 변화, 이동 평균, 자기 이력 대비 z-점수 (whr/changes.py)
+
+``artifacts/LATEST`` 파일에 가장 최근에 빌드된 버전 이름이 기록됩니다.
+배열은 ``np.load(..., mmap_mode='r')``로 메모리 매핑하여 읽습니다.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from whr.data import RAW_STRING_COLUMNS, SOURCE_CSV, read_source_csv
+
+ARTIFACT_ROOT = os.environ.get('WHR_ARTIFACT_DIR', 'artifacts')
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+
+
+def file_sha256(path):
+    """파일 내용의 SHA-256 해시 (16진 문자열)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def metric_slug(metric):
+    """지표 표시 이름을 파일명으로 쓸 수 있는 형태로 바꿉니다. (예: 'Log GDP per capita' -> 'log_gdp_per_capita')"""
+    return metric.lower().replace(' ', '_')
+
+
+def write_json(path, obj):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1)
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_snapshot(df, version_dir):
+    """
+    원본 DataFrame을 컬럼별 .npy 파일로 저장하고 manifest에 넣을 컬럼 스펙을 반환합니다.
+    문자열 컬럼은 정수 코드(int32)로 저장하고 코드 -> 문자열 목록(categories)은 스펙에 기록합니다.
+    """
+    snapshot_dir = os.path.join(version_dir, 'snapshot')
+    os.makedirs(snapshot_dir, exist_ok=True)
+    columns = {}
+    for i, col in enumerate(df.columns):
+        file_name = f'{i:02d}.npy'
+        if col in RAW_STRING_COLUMNS:
+            codes, categories = pd.factorize(df[col], sort=True)
+            np.save(os.path.join(snapshot_dir, file_name), codes.astype(np.int32))
+            columns[col] = {'file': file_name, 'kind': 'category', 'categories': [str(c) for c in categories]}
+        else:
+            values = df[col].to_numpy()
+            np.save(os.path.join(snapshot_dir, file_name), values)
+            columns[col] = {'file': file_name, 'kind': 'numeric', 'dtype': str(values.dtype)}
+    return columns
+
+
+def open_snapshot(version_dir, manifest=None):
+    """스냅샷을 메모리 매핑으로 열어 원본 컬럼명을 가진 DataFrame으로 반환합니다."""
+    if manifest is None:
+        manifest = load_manifest(version_dir)
+    data = {}
+    for col, spec in manifest['columns'].items():
+        values = np.load(os.path.join(version_dir, 'snapshot', spec['file']), mmap_mode='r')
+        if spec['kind'] == 'category':
+            # 결측(-1) 코드는 None으로 복원합니다.
+            categories = np.asarray(spec['categories'] + [None], dtype=object)
+            data[col] = categories[np.asarray(values)]
+        else:
+            data[col] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def load_manifest(version_dir):
+    return read_json(os.path.join(version_dir, MANIFEST_FILE))
+
+
+def latest_version_dir(root=ARTIFACT_ROOT):
+    """``LATEST``가 가리키는 버전 디렉터리 경로. 빌드된 산출물이 없으면 None."""
+    try:
+        with open(os.path.join(root, LATEST_FILE), encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    version_dir = os.path.join(root, version)
+    return version_dir if os.path.isfile(os.path.join(version_dir, MANIFEST_FILE)) else None
+
+
+def is_fresh(manifest, source_path=SOURCE_CSV):
+    """
+    산출물이 현재 원본 CSV로부터 만들어졌는지 확인합니다.
+    크기와 수정 시각이 같으면 바로 통과하고, 수정 시각만 다르면(복사/체크아웃 등) 내용 해시로 비교합니다.
+    """
+    source = manifest['source']
+    try:
+        stat = os.stat(source_path)
+    except FileNotFoundError:
+        return False
+    if stat.st_size != source['size']:
+        return False
+    if stat.st_mtime_ns == source['mtime_ns']:
+        return True
+    return file_sha256(source_path) == source['sha256']
+
+
+def current_version_dir(source_path=SOURCE_CSV, root=ARTIFACT_ROOT):
+    """원본 CSV와 일치하는 최신 산출물 디렉터리. 없거나 오래된 경우 None."""
+    version_dir = latest_version_dir(root)
+    if version_dir is None or not is_fresh(load_manifest(version_dir), source_path):
+        return None
+    return version_dir
+
+
+_source_versions = {}
+
+
+def source_version(source_path=SOURCE_CSV):
+    """
+    원본 CSV 내용으로 정한 데이터셋 버전 (SHA-256 앞 12자리, 산출물 버전 이름과 같은 규칙).
+    파일 크기와 수정 시각이 그대로면 이전에 구한 해시를 다시 쓰므로 리런마다 부르는 비용은 stat 한 번입니다.
+    """
+    stat = os.stat(source_path)
+    key = (os.path.abspath(source_path), stat.st_size, stat.st_mtime_ns)
+    version = _source_versions.get(key)
+    if version is None:
+        version = _source_versions[key] = file_sha256(source_path)[:12]
+    return version
+
+
+def read_source(source_path=SOURCE_CSV, root=ARTIFACT_ROOT):
+    """
+    원본 데이터를 읽습니다. 최신 산출물이 있으면 스냅샷을 메모리 매핑하고,
+    없으면 CSV를 직접 읽습니다. 두 경우 모두 컬럼명과 dtype이 같습니다.
+    """
+    version_dir = current_version_dir(source_path, root)
+    if version_dir is None:
+        return read_source_csv(source_path)
+    return open_snapshot(version_dir)
+
+
+def load_array(name, source_path=SOURCE_CSV, root=ARTIFACT_ROOT):
+    """산출물 디렉터리 기준 상대 경로(name)의 .npy 배열을 메모리 매핑으로 엽니다. 없으면 None."""
+    version_dir = current_version_dir(source_path, root)
+    if version_dir is None:
+        return None
+    path = os.path.join(version_dir, name)
+    return np.load(path, mmap_mode='r') if os.path.isfile(path) else None
+
+
+def load_figure(name, year, source_path=SOURCE_CSV, root=ARTIFACT_ROOT):
+    """미리 직렬화된 연도별 그림(figures/<year>/<name>.json)을 읽습니다. 없으면 None."""
+    version_dir = current_version_dir(source_path, root)
+    if version_dir is None or year is None:
+        return None
+    path = os.path.join(version_dir, 'figures', str(int(year)), f'{name}.json')
+    if not os.path.isfile(path):
+        return None
+    import plotly.io as pio
+    return pio.read_json(path)
+
+
+def save_arrays(out_dir, arrays, meta_file, meta):
+    """
+    arrays(이름 -> 배열)를 out_dir/<이름>.npy로, meta(JSON으로 바꿀 수 있는 dict)를 out_dir/<meta_file>로 저장합니다.
+    만든 파일 목록(out_dir 기준 상대 경로)을 반환합니다. 결과 모듈의 save_results가 자기 배열 이름으로 호출합니다.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(out_dir, f'{name}.npy'), values)
+    write_json(os.path.join(out_dir, meta_file), meta)
+    return [f'{name}.npy' for name in arrays] + [meta_file]
+
+
+def open_arrays(out_dir, names, meta_file):
+    """save_arrays로 저장한 결과를 (meta, {이름: 메모리 매핑 배열})로 엽니다."""
+    meta = read_json(os.path.join(out_dir, meta_file))
+    return meta, {name: np.load(os.path.join(out_dir, f'{name}.npy'), mmap_mode='r') for name in names}
+
+
+def load_or_build(subdir, meta_file, open_fn, build_fn, accept=None):
+    """
+    최신 사전 계산 산출물에 subdir/meta_file이 있으면 open_fn(subdir 경로)로 열고, 없으면 build_fn()으로 직접 계산합니다.
+    accept(meta)를 주면 그 값이 참일 때만 산출물을 씁니다 (예: 같은 파라미터로 만든 산출물인지 확인).
+    """
+    version_dir = current_version_dir()
+    if version_dir is not None:
+        result_dir = os.path.join(version_dir, subdir)
+        meta_path = os.path.join(result_dir, meta_file)
+        if os.path.isfile(meta_path) and (accept is None or accept(read_json(meta_path))):
+            return open_fn(result_dir)
+    return build_fn()
@@ -0,0 +1,111 @@
+"""
+국가-연도별 전년 대비 변화, 이동 평균, 자기 이력 대비 z-점수 표.
+
+(지표 수, 국가 수, 연도 수) 밀집 패널에서 누적합 몇 번으로 모든 칸의 값을 한꺼번에 계산합니다.
+
+* delta: 바로 전 해 대비 변화량 (전 해가 결측이면 NaN)
+* rolling_mean: 최근 ROLLING_WINDOW년(해당 연도 포함) 관측값의 평균
+* zscore: 그 국가의 이전 연도 관측값들(해당 연도 제외)의 평균과 표준편차로 표준화한 값.
+  이전 관측이 MIN_HISTORY개 미만이면 NaN입니다.
+
+데이터셋 버전마다 사전 계산되어 스냅샷 옆 ``changes/``에 저장됩니다.
+"""
+import numpy as np
+import pandas as pd
+
+from whr.artifacts import load_or_build, open_arrays, save_arrays
+from whr.data import METRIC_COLUMNS, dense_panel
+
+CHANGE_FIELDS = ['value', 'delta', 'rolling_mean', 'zscore']
+ROLLING_WINDOW = 3
+MIN_HISTORY = 3
+# 표준편차가 이보다 작으면 z-점수를 계산하지 않습니다.
+MIN_STD = 1e-9
+
+
+def _trailing_sum(values, window):
+    """마지막 축을 따라 (해당 칸 포함) 최근 window칸의 합."""
+    cumulative = np.cumsum(values, axis=-1)
+    shifted = np.zeros_like(cumulative)
+    shifted[..., window:] = cumulative[..., :-window]
+    return cumulative - shifted
+
+
+def change_panel(values, window=ROLLING_WINDOW, min_history=MIN_HISTORY):
+    """(..., 연도 수) 패널로부터 (..., 연도 수, len(CHANGE_FIELDS)) 배열을 계산합니다."""
+    observed = np.isfinite(values)
+    mask = observed.astype(float)
+    y = np.nan_to_num(values)
+
+    delta = np.full(values.shape, np.nan)
+    delta[..., 1:] = values[..., 1:] - values[..., :-1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rolling_mean = _trailing_sum(y, window) / _trailing_sum(mask, window)
+    rolling_mean[~observed] = np.nan
+
+    # 해당 연도를 제외한 이전 관측값의 개수, 합, 제곱합
+    count = np.cumsum(mask, axis=-1) - mask
+    total = np.cumsum(y, axis=-1) - y
+    squares = np.cumsum(y * y, axis=-1) - y * y
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        std = np.sqrt(np.clip((squares - count * mean * mean) / (count - 1), 0, None))
+        zscore = np.where(observed & (count >= min_history) & (std > MIN_STD), (values - mean) / std, np.nan)
+    return np.stack([values, delta, rolling_mean, zscore], axis=-1)
+
+
+class ChangeTable:
+    """table은 (지표 수, 국가 수, 연도 수, len(CHANGE_FIELDS)) 배열입니다."""
+
+    def __init__(self, metrics, countries, years, table):
+        self.metrics = list(metrics)
+        self.countries = np.asarray(countries)
+        self.years = np.asarray(years)
+        self.table = table
+
+    def year_frame(self, metric, year):
+        """지표 하나, 연도 하나의 국가별 표 (Country, value, delta, rolling_mean, zscore). 값이 없는 국가는 빠집니다."""
+        m = self.metrics.index(metric)
+        t = int(np.searchsorted(self.years, year))
+        if t >= len(self.years) or self.years[t] != year:
+            return pd.DataFrame(columns=['Country'] + CHANGE_FIELDS)
+        frame = pd.DataFrame(np.asarray(self.table[m, :, t]), columns=CHANGE_FIELDS)
+        frame.insert(0, 'Country', self.countries)
+        return frame.dropna(subset=['value']).reset_index(drop=True)
+
+    def movers(self, metric, year, n=10):
+        """전년 대비 가장 많이 오른 n개국과 가장 많이 내린 n개국 표."""
+        frame = self.year_frame(metric, year).dropna(subset=['delta'])
+        return frame.nlargest(n, 'delta').reset_index(drop=True), frame.nsmallest(n, 'delta').reset_index(drop=True)
+
+    def anomalies(self, metric, year, threshold=2.0):
+        """자기 이력 대비 |z-점수|가 threshold 이상인 국가 표 (|z| 내림차순)."""
+        frame = self.year_frame(metric, year).dropna(subset=['zscore'])
+        frame = frame[frame['zscore'].abs() >= threshold]
+        return frame.iloc[np.argsort(-frame['zscore'].abs().to_numpy(), kind='stable')].reset_index(drop=True)
+
+
+def build_changes(df, metrics=METRIC_COLUMNS):
+    """화면 표시용 컬럼명을 가진 DataFrame으로 모든 지표의 변화 표를 계산합니다."""
+    metrics = [m for m in metrics if m in df.columns]
+    countries, years, values = dense_panel(df, metrics)
+    return ChangeTable(metrics, countries, years, change_panel(values))
+
+
+def save_results(changes, out_dir):
+    """변화 표 배열(table)과 changes.json(지표, 국가, 연도, 필드, 창 길이)을 저장합니다 (whr.artifacts.save_arrays)."""
+    return save_arrays(out_dir, {'table': changes.table}, 'changes.json', {
+        'metrics': changes.metrics, 'countries': changes.countries.tolist(), 'years': changes.years.tolist(),
+        'fields': CHANGE_FIELDS, 'rolling_window': ROLLING_WINDOW, 'min_history': MIN_HISTORY,
+    })
+
+
+def open_results(changes_dir):
+    meta, arrays = open_arrays(changes_dir, ['table'], 'changes.json')
+    return ChangeTable(meta['metrics'], meta['countries'], meta['years'], arrays['table'])
+
+
+def load_results(df):
+    """사전 계산된 changes/ 표, 없으면 df로 직접 계산한 표."""
+    return load_or_build('changes', 'changes.json', open_results, lambda: build_changes(df))
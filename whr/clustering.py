@@ -0,0 +1,156 @@
+"""
+국가별 연도 궤적(관대함 지수 및 선택 요인)의 k-평균 군집화.
+
+* 궤적은 whr/data.py의 standardized_trajectories로 (국가 수, 지표 수 × 연도 수) 배열로 만듭니다.
+* 연도 결측은 마스크로 처리합니다. 국가-중심 거리는 그 국가가 관측된 칸만의 평균 제곱 거리이고,
+  중심은 소속 국가들의 관측값만으로 칸별 평균을 냅니다. 모든 거리 계산은 (국가, 군집, 칸) 배열 한 번입니다.
+* k-means++ 초기화와 여러 번의 재시작 중 관성(inertia)이 가장 작은 결과를 씁니다.
+* 군집 번호는 첫 번째 지표(관대함) 중심의 평균이 높은 순으로 1부터 붙이므로 재실행해도 같은 의미를 갖습니다.
+
+군집 수 CLUSTER_COUNTS 전체에 대한 결과를 한 번에 계산해 데이터셋 버전마다 ``clusters/``에 저장합니다.
+"""
+import numpy as np
+import pandas as pd
+
+from whr.artifacts import load_or_build, open_arrays, save_arrays
+from whr.data import standardized_trajectories
+
+CLUSTER_COUNTS = list(range(2, 9))
+DEFAULT_CLUSTERS = 4
+DEFAULT_RESTARTS = 10
+MAX_ITERATIONS = 100
+# 관측 칸이 이보다 적은 국가는 군집에서 제외합니다 (레이블 0).
+MIN_OBSERVED = 3
+
+
+class ClusterResult:
+    """labels는 (len(counts), 국가 수) 정수 배열이며 0은 '군집에서 제외'를 뜻합니다."""
+
+    def __init__(self, countries, counts, labels, inertia, metrics):
+        self.countries = np.asarray(countries)
+        self.counts = list(counts)
+        self.labels = labels
+        self.inertia = inertia
+        self.metrics = list(metrics)
+
+    def assignments(self, k):
+        """군집 수 k일 때 국가별 군집 번호 Series (제외된 국가는 빠집니다)."""
+        labels = np.asarray(self.labels[self.counts.index(k)])
+        keep = labels > 0
+        return pd.Series(labels[keep], index=self.countries[keep], name='Cluster')
+
+    def trend_frame(self, df, k, metrics, label='군집 {cluster} 평균 ({size}개국)'):
+        """
+        군집별 소속 국가 평균을 추이 그래프용 (Year, Country, 지표...) 형식으로 반환합니다.
+        'Country' 컬럼에는 label 형식의 군집 이름이 들어갑니다.
+        """
+        assignments = self.assignments(k)
+        data = df[df['Country'].isin(assignments.index)][['Year', 'Country'] + list(metrics)].copy()
+        for metric in metrics:
+            data[metric] = pd.to_numeric(data[metric], errors='coerce')
+        data['Cluster'] = data['Country'].map(assignments)
+        sizes = assignments.value_counts()
+        means = data.groupby(['Cluster', 'Year'])[list(metrics)].mean().reset_index()
+        means['Country'] = [label.format(cluster=c, size=sizes[c]) for c in means['Cluster']]
+        return means[['Year', 'Country'] + list(metrics)]
+
+
+def _masked_distances(x, mask, centers, center_mask):
+    """(국가 수, 군집 수) 평균 제곱 거리. 국가와 중심이 함께 관측된 칸만 씁니다."""
+    both = mask[:, None, :] * center_mask[None, :, :]
+    sq = both * (x[:, None, :] - centers[None, :, :]) ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(both.sum(axis=-1) > 0, sq.sum(axis=-1) / both.sum(axis=-1), np.inf)
+
+
+def _masked_centers(x, mask, labels, k):
+    """군집별 칸 평균과 관측 여부 마스크."""
+    onehot = (labels[None, :] == np.arange(k)[:, None]).astype(float)
+    counts = onehot @ mask
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centers = np.where(counts > 0, (onehot @ (mask * x)) / counts, 0.0)
+    return centers, (counts > 0).astype(float)
+
+
+def _kmeans_once(x, mask, k, rng):
+    """k-means++ 초기화 후 레이블이 바뀌지 않을 때까지 반복합니다. (레이블, 관성)을 반환합니다."""
+    n = len(x)
+    chosen = [rng.integers(n)]
+    for _ in range(1, k):
+        d = _masked_distances(x, mask, x[chosen], mask[chosen]).min(axis=1)
+        d = np.where(np.isfinite(d), d, 0.0)
+        chosen.append(rng.choice(n, p=d / d.sum()) if d.sum() > 0 else rng.integers(n))
+    centers, center_mask = x[chosen].copy(), mask[chosen].copy()
+    labels = np.full(n, -1)
+    for _ in range(MAX_ITERATIONS):
+        distances = _masked_distances(x, mask, centers, center_mask)
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        centers, center_mask = _masked_centers(x, mask, labels, k)
+        # 빈 군집은 현재 중심에서 가장 먼 국가로 다시 시작합니다.
+        for empty in np.flatnonzero(np.bincount(labels, minlength=k) == 0):
+            far = distances[np.arange(n), labels].argmax()
+            centers[empty], center_mask[empty] = x[far], mask[far]
+            labels[far] = empty
+    inertia = distances[np.arange(n), labels]
+    return labels, float(inertia[np.isfinite(inertia)].sum())
+
+
+def kmeans(x, k, n_restarts=DEFAULT_RESTARTS, seed=0):
+    """
+    NaN을 결측으로 보는 k-평균. x: (표본 수, 칸 수).
+    반환값: (0부터 시작하는 레이블 배열, 관성). 레이블 번호 자체에는 의미가 없습니다.
+    """
+    mask = np.isfinite(x).astype(float)
+    values = np.nan_to_num(x)
+    rng = np.random.default_rng(seed)
+    best = None
+    for _ in range(n_restarts):
+        labels, inertia = _kmeans_once(values, mask, k, rng)
+        if best is None or inertia < best[1]:
+            best = (labels, inertia)
+    return best
+
+
+def cluster_trajectories(df, metrics=('Generosity',), counts=CLUSTER_COUNTS, n_restarts=DEFAULT_RESTARTS, seed=0):
+    """화면 표시용 컬럼명을 가진 DataFrame으로 counts의 각 군집 수에 대해 궤적 군집화를 수행합니다."""
+    metrics = [m for m in metrics if m in df.columns]
+    countries, years, x = standardized_trajectories(df, metrics)
+    observed = np.isfinite(x).sum(axis=1) >= MIN_OBSERVED
+    # 첫 번째 지표 칸들의 관측 평균 (군집 번호 정렬용)
+    first = x[observed][:, :len(years)]
+    labels = np.zeros((len(counts), len(countries)), dtype=np.int32)
+    inertia = np.full(len(counts), np.nan)
+    for i, k in enumerate(counts):
+        if observed.sum() < k:
+            continue
+        raw, inertia[i] = kmeans(x[observed], k, n_restarts, seed)
+        with np.errstate(invalid='ignore'):
+            level = np.array([np.nanmean(first[raw == c]) if (raw == c).any() else -np.inf for c in range(k)])
+        rank = np.empty(k, dtype=np.int32)
+        rank[np.argsort(-np.nan_to_num(level, nan=-np.inf), kind='stable')] = np.arange(1, k + 1)
+        labels[i, observed] = rank[raw]
+    return ClusterResult(countries, counts, labels, inertia, metrics)
+
+
+CLUSTER_ARRAYS = ['labels', 'inertia']
+
+
+def save_results(result, out_dir):
+    """군집 수별 레이블·관성 배열과 clusters.json(국가, 군집 수, 기준 지표)을 저장합니다 (whr.artifacts.save_arrays)."""
+    return save_arrays(out_dir, {'labels': result.labels, 'inertia': result.inertia}, 'clusters.json', {
+        'countries': result.countries.tolist(), 'counts': result.counts, 'metrics': result.metrics,
+    })
+
+
+def open_results(clusters_dir):
+    meta, arrays = open_arrays(clusters_dir, CLUSTER_ARRAYS, 'clusters.json')
+    return ClusterResult(meta['countries'], meta['counts'], arrays['labels'], arrays['inertia'], meta['metrics'])
+
+
+def load_results(df, metrics=('Generosity',)):
+    """사전 계산된 clusters/ 결과는 기준 지표(metrics)가 같을 때만 쓰고, 아니면 df로 직접 군집화합니다."""
+    return load_or_build('clusters', 'clusters.json', open_results, lambda: cluster_trajectories(df, metrics),
+                         accept=lambda meta: meta['metrics'] == list(metrics))
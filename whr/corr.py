@@ -0,0 +1,81 @@
+"""
+상관계수 계산용 충분통계량(sufficient statistics) 도구.
+
+국가별 (n, Σx, Σy, Σx², Σy², Σxy)만 있으면 국가 내 상관계수, 여러 국가를 합친(pooled) 상관계수,
+단순회귀 계수를 모두 행렬 연산으로 얻을 수 있습니다. 부트스트랩/순열 검정처럼 같은 계산을 수천 번
+반복하는 경우 원본 행 대신 이 통계량에 가중치 행렬을 곱해 한 번에 처리합니다.
+"""
+import numpy as np
+import pandas as pd
+
+# moments 배열의 마지막 축 순서
+MOMENT_FIELDS = ['n', 'sx', 'sy', 'sxx', 'syy', 'sxy']
+
+# 페이지의 `Series.std() > 1e-9` 조건과 같은 기준
+MIN_STD = 1e-9
+
+# 편차제곱합을 원점 기준 합(sxx - sx²/n)으로 구하면 값이 모두 같은 계열도 소거 오차 때문에 0이 아닌 값(≈ sxx × 1e-16)이
+# 남습니다. 편차제곱합이 원점 기준 제곱합의 이 비율 이하이면 값이 변하지 않는 것으로 봅니다.
+REL_TOL = 1e-12
+
+
+def pair_data(df, factor, y='Generosity'):
+    """Country, y, factor 컬럼을 숫자로 변환하고 결측 행을 제거한 (국가명 배열, x, y) 튜플."""
+    data = df[['Country', y, factor]].copy()
+    data[y] = pd.to_numeric(data[y], errors='coerce')
+    data[factor] = pd.to_numeric(data[factor], errors='coerce')
+    data = data.dropna()
+    return data['Country'].to_numpy(), data[factor].to_numpy(dtype=float), data[y].to_numpy(dtype=float)
+
+
+def group_moments(x, y, codes, n_groups):
+    """그룹 코드별 충분통계량을 (n_groups, 6) 배열로 반환합니다."""
+    return np.column_stack([
+        np.bincount(codes, minlength=n_groups).astype(float),
+        np.bincount(codes, weights=x, minlength=n_groups),
+        np.bincount(codes, weights=y, minlength=n_groups),
+        np.bincount(codes, weights=x * x, minlength=n_groups),
+        np.bincount(codes, weights=y * y, minlength=n_groups),
+        np.bincount(codes, weights=x * y, minlength=n_groups),
+    ])
+
+
+def country_moments(df, factor, y='Generosity'):
+    """국가별 충분통계량. (정렬된 국가명 배열, (국가 수, 6) 배열)을 반환합니다."""
+    countries, x, y_values = pair_data(df, factor, y)
+    codes, uniques = pd.factorize(countries, sort=True)
+    return np.asarray(uniques), group_moments(x, y_values, codes, len(uniques))
+
+
+def centered(moments):
+    """충분통계량으로부터 (n, 편차제곱합 xx, yy, 교차곱 xy)를 계산합니다. 마지막 축이 MOMENT_FIELDS입니다."""
+    n, sx, sy, sxx, syy, sxy = np.moveaxis(np.asarray(moments, dtype=float), -1, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cxx = sxx - sx * sx / n
+        cyy = syy - sy * sy / n
+        cxy = sxy - sx * sy / n
+    return n, cxx, cyy, cxy
+
+
+def has_spread(moments):
+    """
+    x, y 모두 값이 변하는지 (관측치 2개 이상, 표준편차 MIN_STD 초과, 소거 오차 이상의 편차제곱합).
+    두 번 훑어 계산한 pandas `Series.std() > 1e-9` 판정과 같은 그룹을 남깁니다.
+    """
+    moments = np.asarray(moments, dtype=float)
+    n, cxx, cyy, _ = centered(moments)
+    sxx, syy = moments[..., 3], moments[..., 4]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return ((n >= 2) & (cxx / (n - 1) > MIN_STD ** 2) & (cyy / (n - 1) > MIN_STD ** 2)
+                & (cxx > REL_TOL * sxx) & (cyy > REL_TOL * syy))
+
+
+def corr_from_moments(moments):
+    """
+    충분통계량으로부터 피어슨 상관계수를 계산합니다 (앞쪽 축에 대해 벡터화).
+    관측치가 2개 미만이거나 어느 한 쪽 값이 변하지 않으면 (has_spread) NaN입니다.
+    """
+    n, cxx, cyy, cxy = centered(moments)
+    valid = has_spread(moments)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(valid, cxy / np.sqrt(cxx * cyy), np.nan)
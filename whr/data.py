@@ -0,0 +1,151 @@
+"""
+processed_whr.csv 공통 스키마(컬럼명, 요인 목록, 국가 코드 매핑)와 CSV 로더입니다.
+"""
+import numpy as np
+import pandas as pd
+
+SOURCE_CSV = 'processed_whr.csv'
+
+# 원본 CSV 컬럼명 -> 화면 표시용 컬럼명
+RAW_TO_DISPLAY = {
+    'Country': 'Country',
+    'regional_indicator': 'Region',
+    'year': 'Year',
+    'generosity': 'Generosity',
+    'life_ladder': 'Life Ladder',
+    'log_gdp_per_capita': 'Log GDP per capita',
+    'social_support': 'Social Support',
+    'healthy_life_expectancy_at_birth': 'Healthy Life Expectancy at Birth',
+    'freedom_to_make_life_choices': 'Freedom to Make Life Choices',
+    'perceptions_of_corruption': 'Perceptions of Corruption',
+    'positive_affect': 'Positive Affect',
+    'negative_affect': 'Negative Affect',
+    'confidence_in_national_government': 'Confidence in National Government'
+}
+
+# 관대함 지수와의 관계를 분석하는 요인 (표시 이름)
+FACTOR_COLUMNS = [
+    'Life Ladder', 'Log GDP per capita', 'Social Support',
+    'Healthy Life Expectancy at Birth', 'Freedom to Make Life Choices',
+    'Perceptions of Corruption', 'Positive Affect', 'Negative Affect',
+    'Confidence in National Government'
+]
+
+# 관대함 지수 + 요인 (수치형 지표 전체)
+METRIC_COLUMNS = ['Generosity'] + FACTOR_COLUMNS
+
+# 문자열 컬럼 (원본 CSV 기준). 나머지는 모두 수치형으로 취급합니다.
+RAW_STRING_COLUMNS = ['Country', 'regional_indicator']
+
+# 세계 지도 시각화를 위한 국가명 -> ISO-ALPHA-3 코드 매핑
+# 더 포괄적인 매핑을 위해 pycountry 라이브러리 사용을 권장합니다.
+COUNTRY_TO_ISO = {
+    'South Korea': 'KOR', 'United States': 'USA', 'Canada': 'CAN',
+    'Germany': 'DEU', 'France': 'FRA', 'United Kingdom': 'GBR',
+    'Japan': 'JPN', 'China': 'CHN', 'India': 'IND',
+    'Australia': 'AUS', 'Brazil': 'BRA', 'Mexico': 'MEX',
+    'Russia': 'RUS', 'Spain': 'ESP', 'Italy': 'ITA',
+    'Sweden': 'SWE', 'Norway': 'NOR', 'Denmark': 'DNK',
+    'Finland': 'FIN', 'Switzerland': 'CHE', 'Netherlands': 'NLD',
+    'Belgium': 'BEL', 'Austria': 'AUT', 'New Zealand': 'NZL',
+    'Argentina': 'ARG', 'South Africa': 'ZAF', 'Egypt': 'EGY',
+    'Nigeria': 'NGA', 'Indonesia': 'IDN', 'Turkey': 'TUR',
+    'Ireland': 'IRL', 'Luxembourg': 'LUX', 'Iceland': 'ISL',
+    'Israel': 'ISR', 'Chile': 'CHL', 'Colombia': 'COL',
+    'Thailand': 'THA', 'Vietnam': 'VNM', 'Philippines': 'PHL',
+    'Greece': 'GRC', 'Portugal': 'PRT', 'Poland': 'POL',
+    'Hungary': 'HUN', 'Czech Republic': 'CZE', 'Slovakia': 'SVK',
+    'Romania': 'ROU', 'Bulgaria': 'BGR', 'Croatia': 'HRV',
+    'Estonia': 'EST', 'Latvia': 'LVA', 'Lithuania': 'LTU',
+    'Slovenia': 'SVN', 'Cyprus': 'CYP', 'Malta': 'MLT',
+    'Afghanistan': 'AFG', 'Albania': 'ALB', 'Algeria': 'DZA', 'Angola': 'AGO',
+    'Armenia': 'ARM', 'Azerbaijan': 'AZE', 'Bahrain': 'BHR', 'Bangladesh': 'BGD',
+    'Belarus': 'BLR', 'Benin': 'BEN', 'Bhutan': 'BTN', 'Bolivia': 'BOL',
+    'Bosnia and Herzegovina': 'BIH', 'Botswana': 'BWA', 'Burkina Faso': 'BFA',
+    'Burundi': 'BDI', 'Cambodia': 'KHM', 'Cameroon': 'CMR', 'Central African Republic': 'CAF',
+    'Chad': 'TCD', 'Comoros': 'COM', 'Congo (Brazzaville)': 'COG', 'Congo (Kinshasa)': 'COD',
+    'Costa Rica': 'CRI', 'Cote d\'Ivoire': 'CIV', 'Cuba': 'CUB', 'Djibouti': 'DJI',
+    'Dominican Republic': 'DOM', 'Ecuador': 'ECU', 'El Salvador': 'SLV', 'Equatorial Guinea': 'GNQ',
+    'Eritrea': 'ERI', 'Ethiopia': 'ETH', 'Fiji': 'FJI', 'Gabon': 'GAB', 'Gambia': 'GMB',
+    'Georgia': 'GEO', 'Ghana': 'GHA', 'Guatemala': 'GTM', 'Guinea': 'GIN', 'Guinea-Bissau': 'GNB',
+    'Guyana': 'GUY', 'Haiti': 'HTI', 'Honduras': 'HND', 'Hong Kong S.A.R., China': 'HKG',
+    'Iran': 'IRN', 'Iraq': 'IRQ', 'Jamaica': 'JAM', 'Jordan': 'JOR', 'Kazakhstan': 'KAZ',
+    'Kenya': 'KEN', 'Kosovo': 'XKX', 'Kuwait': 'KWT', 'Kyrgyzstan': 'KGZ', 'Laos': 'LAO',
+    'Lebanon': 'LBN', 'Lesotho': 'LSO', 'Liberia': 'LBR', 'Libya': 'LBY', 'Madagascar': 'MDG',
+    'Malawi': 'MWI', 'Malaysia': 'MYS', 'Maldives': 'MDV', 'Mali': 'MLI', 'Mauritania': 'MRT',
+    'Mauritius': 'MUS', 'Moldova': 'MDA', 'Mongolia': 'MNG', 'Montenegro': 'MNE',
+    'Morocco': 'MAR', 'Mozambique': 'MOZ', 'Myanmar': 'MMR', 'Namibia': 'NAM', 'Nepal': 'NPL',
+    'Nicaragua': 'NIC', 'Niger': 'NER', 'North Macedonia': 'MKD', 'Oman': 'OMN', 'Pakistan': 'PAK',
+    'Palestine': 'PSE', 'Panama': 'PAN', 'Papua New Guinea': 'PNG', 'Paraguay': 'PRY',
+    'Peru': 'PER', 'Qatar': 'QAT', 'Rwanda': 'RWA', 'Saudi Arabia': 'SAU', 'Senegal': 'SEN',
+    'Serbia': 'SRB', 'Sierra Leone': 'SLE', 'Singapore': 'SGP', 'Somalia': 'SOM',
+    'South Sudan': 'SSD', 'Sri Lanka': 'LKA', 'Sudan': 'SDN', 'Suriname': 'SUR',
+    'Syria': 'SYR', 'Taiwan Province of China': 'TWN', 'Tanzania': 'TZA', 'Togo': 'TGO',
+    'Trinidad and Tobago': 'TTO', 'Tunisia': 'TUN', 'Uganda': 'UGA', 'Ukraine': 'UKR',
+    'United Arab Emirates': 'ARE', 'Uruguay': 'URY', 'Uzbekistan': 'UZB', 'Venezuela': 'VEN',
+    'Yemen': 'YEM', 'Zambia': 'ZMB', 'Zimbabwe': 'ZWE'
+}
+
+def read_source_csv(path=SOURCE_CSV):
+    """
+    원본 CSV를 읽고 수치형 컬럼의 dtype을 고정합니다 (컬럼명은 원본 그대로 유지).
+    숫자로 변환할 수 없는 값은 NaN으로 바뀝니다.
+    """
+    df = pd.read_csv(path)
+    for col in df.columns:
+        if col in RAW_STRING_COLUMNS:
+            continue
+        # 'year'는 결측이 없으면 int64, 그 밖의 수치형 컬럼은 float64가 됩니다.
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def to_display(df):
+    """원본 컬럼명을 화면 표시용 컬럼명으로 바꾸고 ISO 코드 컬럼(iso_alpha)을 추가한 복사본을 반환합니다."""
+    out = df.rename(columns=RAW_TO_DISPLAY)
+    out['iso_alpha'] = out['Country'].map(COUNTRY_TO_ISO)
+    return out
+
+
+def numeric_frame(df, columns, keys=('Country', 'Year')):
+    """
+    keys와 columns만 복사해 columns를 숫자로 바꾸고, columns 중 하나라도 결측인 행을 뺀 DataFrame을 반환합니다.
+    같은 컬럼이 여러 번 주어져도 (예: 요인으로 'Generosity'를 고른 경우) 한 번만 넣습니다.
+    """
+    columns = list(dict.fromkeys(columns))
+    out = df[list(keys) + [col for col in columns if col not in keys]].copy()
+    for col in columns:
+        out[col] = pd.to_numeric(out[col], errors='coerce')
+    return out.dropna(subset=columns)
+
+
+def dense_panel(df, columns, countries=None, years=None):
+    """
+    (Country, Year) 행들을 (지표 수, 국가 수, 연도 수) 밀집 배열로 펼칩니다. 관측이 없는 칸은 NaN입니다.
+    countries/years를 주지 않으면 정렬된 고유값을 사용합니다.
+    반환값: (국가 배열, 연도 배열, 값 배열)
+    """
+    data = df.dropna(subset=['Country', 'Year'])
+    countries = np.sort(data['Country'].unique()) if countries is None else np.asarray(countries)
+    years = np.sort(data['Year'].unique()).astype(int) if years is None else np.asarray(years, dtype=int)
+    g = np.searchsorted(countries, data['Country'].to_numpy())
+    t = np.searchsorted(years, data['Year'].to_numpy())
+    keep = (g < len(countries)) & (t < len(years))
+    keep[keep] &= (countries[g[keep]] == data['Country'].to_numpy()[keep]) & (years[t[keep]] == data['Year'].to_numpy()[keep])
+    values = np.full((len(columns), len(countries), len(years)), np.nan)
+    for i, col in enumerate(columns):
+        values[i, g[keep], t[keep]] = pd.to_numeric(data[col], errors='coerce').to_numpy(dtype=float)[keep]
+    return countries, years, values
+
+
+def standardized_trajectories(df, metrics):
+    """
+    국가별 연도 궤적을 지표마다 전체 기간 z-점수로 표준화한 뒤 (국가 수, 지표 수 × 연도 수) 배열로 펼칩니다.
+    관측이 없는 칸은 NaN입니다. 반환값: (국가 배열, 연도 배열, 궤적 배열)
+    """
+    countries, years, panel = dense_panel(df, metrics)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nanmean(panel, axis=(1, 2), keepdims=True)
+        std = np.nanstd(panel, axis=(1, 2), keepdims=True)
+        z = np.where(std > 0, (panel - mean) / std, np.where(np.isfinite(panel), 0.0, np.nan))
+    return countries, years, np.concatenate(list(z), axis=1)
@@ -0,0 +1,281 @@
+"""
+대시보드 기본 화면의 정적 스냅샷 내보내기 CLI.
+
+방문 대부분은 기본 화면을 읽기만 하므로, 그 화면을 미리 그려 일반 파일 서버로 그대로 내보낼 수 있는
+HTML/JSON 묶음으로 씁니다. 직접 탐색(필터, 국가 선택 등)이 필요할 때만 Streamlit 앱을 쓰면 됩니다.
+
+* ``overview/<연도>.html|json``  - main.py '대시보드 개요' 탭 (평균, 상위/하위 5개국, 분포, 지도, 막대 차트)
+* ``factors/<지표>.html|json``   - 상관성 페이지의 요인별 기본 화면 (피어슨 전체/국가 내 상관계수, 부트스트랩
+  신뢰구간, 국가 내 상관계수 상위/하위 3개국, 산점도)
+* ``trend/default.html|json``   - pages/01 추이 그래프 기본 화면 ('전체 평균'과 South Korea의 관대함 지수)
+* ``index.html``, ``manifest.json`` - 목차와 데이터셋 버전, 파일 목록
+* ``plotly.min.js``             - 모든 HTML이 함께 쓰는 Plotly 라이브러리 (CDN 없이 오프라인으로 열림)
+
+그림은 앱과 같은 함수(whr/figures.py)로 그리므로 화면과 같습니다. JSON에는 같은 수치와 Plotly 그림 사양이 들어갑니다.
+결과는 ``<out>/<데이터셋 버전>/``에 쓰고 ``<out>/LATEST``가 최신 버전을 가리킵니다 (버전은 원본 CSV 내용 해시).
+사전 계산 산출물이 있으면 원본 스냅샷과 부트스트랩 분포는 산출물에서 읽습니다.
+화면별 작업은 서로 독립적이므로 프로세스 풀에 나누어 실행합니다.
+
+사용법:
+    python -m whr.export [--source processed_whr.csv] [--out exports] [--jobs N] [--force]
+"""
+import argparse
+import html
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import plotly.io as pio
+
+from whr.aggregate import overview_aggregates
+from whr.artifacts import LATEST_FILE, MANIFEST_FILE, load_array, metric_slug, read_source, source_version, write_json
+from whr.bootstrap import bootstrap_correlations, percentile_interval
+from whr.data import FACTOR_COLUMNS, METRIC_COLUMNS, SOURCE_CSV, numeric_frame, to_display
+from whr.figures import factor_scatter, overview_bar, overview_histogram, overview_map, trend_figure
+from whr.ranks import pooled_correlation, within_country_correlations
+from whr.traces import TraceBuilder
+
+EXPORT_ROOT = 'exports'
+PLOTLY_JS = 'plotly.min.js'
+# pages/01 추이 그래프의 기본 선택
+DEFAULT_TREND_COUNTRIES = ['전체 평균', 'South Korea']
+DEFAULT_TREND_VARIABLES = ['Generosity']
+# 목차(index.html)의 구역 순서
+SECTIONS = ['대시보드 개요', '요인별 상관성', '연도별 추이']
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ko">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{root}{plotly_js}"></script>
+<style>
+body {{ font-family: sans-serif; margin: 2rem auto; max-width: 1100px; padding: 0 1rem; color: #262730; }}
+table {{ border-collapse: collapse; margin: 0.5rem 0 1.5rem; }}
+th, td {{ border: 1px solid #ddd; padding: 0.3rem 0.7rem; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+.metrics {{ display: flex; flex-wrap: wrap; gap: 2rem; margin-bottom: 1rem; }}
+.metric .label {{ color: #666; font-size: 0.9rem; }}
+.metric .value {{ font-size: 1.8rem; }}
+footer {{ color: #888; font-size: 0.8rem; margin-top: 2rem; }}
+</style>
+</head>
+<body>
+<nav><a href="{root}index.html">목차</a></nav>
+<h1>{title}</h1>
+{body}
+<footer>데이터셋 버전 {version} · 생성 시각 {generated}</footer>
+</body>
+</html>
+"""
+
+
+class View:
+    """
+    내보낼 화면 하나. metrics는 표시 이름 -> 값, tables는 제목 -> DataFrame, figures는 제목 -> 그림입니다.
+    path는 버전 디렉터리 기준 상대 경로(확장자 제외), section은 목차의 구역 이름입니다.
+    """
+
+    def __init__(self, path, section, title, metrics, tables, figures):
+        self.path = path
+        self.section = section
+        self.title = title
+        self.metrics = metrics
+        self.tables = tables
+        self.figures = figures
+
+    def to_json(self, version):
+        """JSON으로 바꿀 수 있는 dict (수치, 표 레코드, Plotly 그림 사양)."""
+        return {
+            'version': version,
+            'title': self.title,
+            'metrics': self.metrics,
+            'tables': {name: json.loads(table.to_json(orient='records', force_ascii=False))
+                       for name, table in self.tables.items()},
+            'figures': {name: json.loads(pio.to_json(fig, validate=False)) for name, fig in self.figures.items()},
+        }
+
+    def to_html(self, version, generated):
+        """plotly.min.js를 상대 경로로 불러오는 HTML 문서."""
+        root = '../' * self.path.count('/')
+        parts = []
+        if self.metrics:
+            parts.append('<div class="metrics">' + ''.join(
+                f'<div class="metric"><div class="label">{html.escape(label)}</div>'
+                f'<div class="value">{html.escape(_format_metric(value))}</div></div>'
+                for label, value in self.metrics.items()) + '</div>')
+        for name, table in self.tables.items():
+            parts.append(f'<h3>{html.escape(name)}</h3>')
+            parts.append(table.to_html(index=False, float_format=lambda v: f'{v:.3f}', border=0))
+        for i, (name, fig) in enumerate(self.figures.items()):
+            parts.append(f'<h2>{html.escape(name)}</h2>')
+            parts.append(pio.to_html(fig, full_html=False, include_plotlyjs=False, div_id=f'figure-{i}',
+                                     validate=False, config={'responsive': True}))
+        return PAGE_TEMPLATE.format(title=html.escape(self.title), root=root, plotly_js=PLOTLY_JS,
+                                    body='\n'.join(parts), version=version, generated=generated)
+
+
+def _format_metric(value):
+    if isinstance(value, float):
+        return f'{value:.3f}'
+    return str(value)
+
+
+def _open_display(source):
+    return to_display(read_source(source))
+
+
+def overview_view(df, year):
+    """main.py 대시보드 개요 탭의 연도 하나 화면."""
+    overview = overview_aggregates(df.loc[df['Year'] == year, ['Country', 'Generosity', 'Year', 'iso_alpha']])
+    figures = {f'{year} 국가별 관대함 분포': overview_histogram(overview.bins)}
+    fig_map = overview_map(overview.countries)
+    if fig_map is not None:
+        figures[f'🗺️ {year} 관대함 지수 세계 지도'] = fig_map
+    figures[f'{year} 국가별 관대함 지수 (막대 차트)'] = overview_bar(overview.countries, year)
+    columns = ['Country', 'Generosity']
+    return View(f'overview/{year}', SECTIONS[0], f'📊 대시보드 개요 ({year}년 데이터)',
+                {f'{year}년 평균 관대함 지수': float(overview.mean)},
+                {'🥇 관대함 지수 상위 5개국': overview.countries.nlargest(5, 'Generosity')[columns],
+                 '🥉 관대함 지수 하위 5개국': overview.countries.nsmallest(5, 'Generosity')[columns]},
+                figures)
+
+
+def factor_view(df, factor, source=SOURCE_CSV):
+    """상관성 페이지의 요인 하나 기본 화면 (피어슨 상관계수)."""
+    correlation_data = numeric_frame(df, ['Generosity', factor])
+    country_corr_df = within_country_correlations(df, factor)
+    distribution = load_array(f'bootstrap/{metric_slug(factor)}.npy', source)
+    if distribution is None:
+        distribution = bootstrap_correlations(df, factor)
+    interval = percentile_interval(distribution)
+    metrics = {
+        f"전체 데이터 '{factor}'와 관대함 지수 간 피어슨 상관계수": pooled_correlation(df, factor),
+        '전체 상관계수 95% 신뢰구간': f'[{interval[0, 0]:.3f}, {interval[0, 1]:.3f}]',
+        f"국가 내 '{factor}'와 관대함 지수 간 평균 피어슨 상관계수": float(country_corr_df['Correlation'].mean()),
+        '국가 내 평균 95% 신뢰구간': f'[{interval[1, 0]:.3f}, {interval[1, 1]:.3f}]',
+        '국가 수': len(country_corr_df),
+    }
+    tables = {
+        '국가 내 상관계수 상위 3개국': country_corr_df.nlargest(3, 'Correlation'),
+        '국가 내 상관계수 하위 3개국': country_corr_df.nsmallest(3, 'Correlation'),
+    }
+    figures = {f'📈 {factor}와 관대함 지수': factor_scatter(correlation_data, factor)}
+    return View(f'factors/{metric_slug(factor)}', SECTIONS[1], f'📈 {factor}와 관대함 지수', metrics, tables, figures)
+
+
+def trend_view(df):
+    """pages/01 연도별 추이 그래프의 기본 화면 ('전체 평균'과 South Korea의 관대함 지수)."""
+    factors = [col for col in METRIC_COLUMNS if col in df.columns]
+    numeric = numeric_frame(df, factors, keys=('Year', 'Country'))
+    overall = numeric.groupby('Year')[factors].mean().reset_index()
+    overall['Country'] = '전체 평균'
+    countries = [country for country in DEFAULT_TREND_COUNTRIES if country != '전체 평균']
+    plot_df = pd.concat([overall, numeric[numeric['Country'].isin(countries)]])
+    plot_df['Country'] = plot_df['Country'].astype('category')
+    fig = trend_figure(plot_df, DEFAULT_TREND_VARIABLES, factors, TraceBuilder())
+    return View('trend/default', SECTIONS[2], '📈 관대함 지수 연도별 추이 (전체 평균, South Korea)', {}, {},
+                {'선택된 변수들의 연도별 추이': fig})
+
+
+def _write_view(out_dir, view, version, generated):
+    os.makedirs(os.path.join(out_dir, os.path.dirname(view.path)), exist_ok=True)
+    with open(os.path.join(out_dir, f'{view.path}.html'), 'w', encoding='utf-8') as f:
+        f.write(view.to_html(version, generated))
+    write_json(os.path.join(out_dir, f'{view.path}.json'), view.to_json(version))
+    return view.section, view.title, view.path
+
+
+def _export(kind, source, out_dir, version, generated, arg=None):
+    """워커 작업: 화면 하나를 그려 HTML/JSON으로 쓰고 (구역, 제목, 경로)를 반환합니다."""
+    df = _open_display(source)
+    if kind == 'overview':
+        view = overview_view(df, arg)
+    elif kind == 'factor':
+        view = factor_view(df, arg, source)
+    else:
+        view = trend_view(df)
+    return _write_view(out_dir, view, version, generated)
+
+
+def _write_index(out_dir, entries, version, generated):
+    sections = {}
+    for section, title, path in sorted(entries, key=lambda entry: (SECTIONS.index(entry[0]), entry[2])):
+        sections.setdefault(section, []).append(f'<li><a href="{path}.html">{html.escape(title)}</a> '
+                                                f'(<a href="{path}.json">JSON</a>)</li>')
+    body = '\n'.join(f'<h2>{html.escape(section)}</h2>\n<ul>\n' + '\n'.join(items) + '\n</ul>'
+                     for section, items in sections.items())
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(PAGE_TEMPLATE.format(title='🌍 국가 관대함 지수 비교 (정적 스냅샷)', root='', plotly_js=PLOTLY_JS,
+                                     body=body, version=version, generated=generated))
+
+
+def export(source=SOURCE_CSV, out_root=EXPORT_ROOT, jobs=None, force=False, log=print):
+    """정적 스냅샷 묶음을 쓰고 ``LATEST``를 갱신합니다. 버전 디렉터리 경로를 반환합니다."""
+    from plotly.offline import get_plotlyjs
+
+    started = time.perf_counter()
+    version = source_version(source)
+    version_dir = os.path.join(out_root, version)
+    os.makedirs(out_root, exist_ok=True)
+
+    if os.path.isfile(os.path.join(version_dir, MANIFEST_FILE)) and not force:
+        log(f"버전 {version} 스냅샷이 이미 있습니다. (--force로 다시 내보내기)")
+    else:
+        tmp_dir = os.path.join(out_root, f'.{version}.tmp-{os.getpid()}')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        generated = time.strftime('%Y-%m-%d %H:%M:%S')
+        df = _open_display(source)
+        years = sorted(int(y) for y in df['Year'].dropna().unique())
+        factors = [factor for factor in FACTOR_COLUMNS if factor in df.columns]
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_export, 'overview', source, tmp_dir, version, generated, year) for year in years]
+            futures += [pool.submit(_export, 'factor', source, tmp_dir, version, generated, factor)
+                        for factor in factors]
+            futures.append(pool.submit(_export, 'trend', source, tmp_dir, version, generated))
+            entries = [future.result() for future in as_completed(futures)]
+
+        with open(os.path.join(tmp_dir, PLOTLY_JS), 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        _write_index(tmp_dir, entries, version, generated)
+        files = sorted([PLOTLY_JS, 'index.html'] + [f'{path}.{ext}' for _, _, path in entries for ext in ('html', 'json')])
+        write_json(os.path.join(tmp_dir, MANIFEST_FILE), {
+            'version': version,
+            'source': os.path.basename(source),
+            'generated': generated,
+            'years': years,
+            'factors': factors,
+            'files': files,
+        })
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(tmp_dir, version_dir)
+        log(f"버전 {version} 스냅샷 화면 {len(entries)}개, 파일 {len(files)}개 생성 "
+            f"({time.perf_counter() - started:.1f}초)")
+
+    latest_tmp = os.path.join(out_root, f'.{LATEST_FILE}.tmp-{os.getpid()}')
+    with open(latest_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(out_root, LATEST_FILE))
+    return version_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="대시보드 기본 화면을 정적 HTML/JSON 묶음으로 내보냅니다.")
+    parser.add_argument('--source', default=SOURCE_CSV, help="원본 CSV 경로 (기본값: %(default)s)")
+    parser.add_argument('--out', default=EXPORT_ROOT, help="내보내기 루트 디렉터리 (기본값: %(default)s)")
+    parser.add_argument('--jobs', type=int, default=None, help="프로세스 풀 워커 수 (기본값: CPU 코어 수)")
+    parser.add_argument('--force', action='store_true', help="같은 버전이 있어도 다시 내보냅니다.")
+    args = parser.parse_args(argv)
+    version_dir = export(args.source, args.out, args.jobs, args.force)
+    print(f"{version_dir}: {os.path.join(version_dir, 'index.html')}를 파일 서버로 제공하세요.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+대시보드 개요 탭(main.py)과 상관성 페이지(pages/00, pages/01)의 Plotly 그림 생성 함수입니다.
+
+사전 계산 CLI(whr/precompute.py)와 정적 스냅샷 내보내기(whr/export.py)도 같은 함수를 사용하므로,
+앱에서 그린 그림과 미리 만든 그림이 항상 동일합니다. 모든 그림은 whr/payload.py의 compact_figure로 줄여서 반환합니다.
+개요 탭 그림의 입력은 원본 행이 아니라 whr/aggregate.py의 집계(히스토그램 구간, 국가별 평균)입니다.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from whr.corr import REL_TOL, centered, group_moments
+from whr.payload import compact_figure
+
+# 상관성 페이지 산점도의 국가 색 (국가가 처음 나오는 순서대로 순환)
+FACTOR_COLORS = px.colors.qualitative.Plotly
+
+
+def overview_histogram(bins):
+    """관대함 지수 분포 히스토그램. bins는 서버에서 미리 센 HistogramBins이며, 구간마다 막대 하나를 그립니다."""
+    fig_hist = go.Figure(go.Bar(x=bins.centers, y=bins.counts, width=bins.widths,
+                                customdata=np.column_stack([bins.edges[:-1], bins.edges[1:]]),
+                                hovertemplate='관대함 지수=%{customdata[0]:.3f}~%{customdata[1]:.3f}'
+                                              '<br>count=%{y}<extra></extra>',
+                                marker_color=px.colors.qualitative.Pastel[0]))
+    fig_hist.update_layout(template="plotly_white", title='관대함 지수 분포', title_x=0.5,
+                           xaxis_title='관대함 지수', yaxis_title='count', bargap=0,
+                           margin=dict(t=50, b=50, l=50, r=50))
+    return compact_figure(fig_hist)
+
+
+def overview_map(countries):
+    """관대함 지수 세계 지도 (countries: 국가별 평균 표). ISO 코드가 있는 국가만 그리며, 그릴 국가가 없으면 None을 반환합니다."""
+    df_map = countries.dropna(subset=['iso_alpha'])
+    if df_map.empty:
+        return None
+    fig_map = px.choropleth(df_map,
+                            locations="iso_alpha",
+                            color="Generosity",
+                            hover_name="Country",
+                            # 관대함 지수가 음수일 때 붉은색 계열, 양수일 때 푸른색 계열
+                            # 0 근처가 흰색으로 표시되지 않도록 RdYlBu 스케일 사용
+                            color_continuous_scale=px.colors.diverging.RdYlBu,
+                            color_continuous_midpoint=0,
+                            title='세계 관대함 지수 지도',
+                            labels={'Generosity': '관대함 지수'})
+    fig_map.update_layout(template="plotly_white", title_x=0.5,
+                          margin=dict(t=50, b=50, l=50, r=50))
+    return compact_figure(fig_map)
+
+
+def overview_bar(countries, year_label):
+    """모든 국가의 관대함 지수 막대 차트 (countries: 국가별 평균 표, 내림차순)."""
+    fig_bar_all = px.bar(countries.sort_values('Generosity', ascending=False), x='Country', y='Generosity',
+                         title=f"{year_label} 국가별 관대함 지수",
+                         labels={'Country': '국가', 'Generosity': '관대함 지수'},
+                         color_discrete_sequence=px.colors.qualitative.D3)
+    fig_bar_all.update_layout(template="plotly_white", title_x=0.5,
+                              margin=dict(t=50, b=50, l=50, r=50),
+                              bargap=0.2) # 막대 사이 간격 넓히기
+    return compact_figure(fig_bar_all)
+
+
+def factor_scatter(data, factor, title=None, trendline=True):
+    """
+    상관성 페이지의 '전체 데이터' 산점도 (x: 요인, y: 관대함 지수, 국가별 색).
+    data: numeric_frame(df, ['Generosity', factor]) 결과.
+    모든 점을 트레이스 하나에 담고, 국가 색은 점마다 색 번호(FACTOR_COLORS 순환)로 줍니다. 국가가 160여 개라 범례 대신
+    마우스를 올리면 국가명이 보입니다. trendline이면 국가별 OLS 추세선을 선 트레이스 하나에 국가마다 x 범위의 선분으로
+    이어 그립니다 (선분 사이는 NaN으로 끊음). 기울기와 절편은 whr/corr.py의 충분통계량으로 구하며, x 값이 변하지 않는 국가는 뺍니다.
+    """
+    codes, _ = pd.factorize(data['Country'])
+    x = data[factor].to_numpy(dtype=float)
+    y = data['Generosity'].to_numpy(dtype=float)
+    n_colors = len(FACTOR_COLORS)
+    # 색 번호 k를 [k - 0.5, k + 0.5] 구간의 한 가지 색으로 칠하는 계단형 색 척도
+    colorscale = [[(k + edge) / n_colors, color] for k, color in enumerate(FACTOR_COLORS) for edge in (0, 1)]
+    fig_scatter = go.Figure(go.Scattergl(
+        x=x, y=y, mode='markers', hovertext=data['Country'].to_numpy(), showlegend=False,
+        marker=dict(color=codes % n_colors, colorscale=colorscale, cmin=-0.5, cmax=n_colors - 0.5),
+        hovertemplate=f'<b>%{{hovertext}}</b><br>{factor}=%{{x}}<br>관대함 지수=%{{y}}<extra></extra>'))
+    if trendline and len(x):
+        n_countries = codes.max() + 1
+        moments = group_moments(x, y, codes, n_countries)
+        n, cxx, _, cxy = centered(moments)
+        fitted = (n >= 2) & (cxx > REL_TOL * moments[:, 3])
+        slope = cxy[fitted] / cxx[fitted]
+        intercept = (moments[fitted, 2] - slope * moments[fitted, 1]) / n[fitted]
+        x_min, x_max = np.full(n_countries, np.inf), np.full(n_countries, -np.inf)
+        np.minimum.at(x_min, codes, x)
+        np.maximum.at(x_max, codes, x)
+        line_x = np.column_stack([x_min[fitted], x_max[fitted], np.full(len(slope), np.nan)])
+        line_y = intercept[:, None] + slope[:, None] * line_x
+        fig_scatter.add_trace(go.Scatter(x=line_x.ravel(), y=line_y.ravel(), mode='lines', name='국가별 OLS 추세선',
+                                         line=dict(color='rgba(90, 90, 90, 0.6)', width=1), hoverinfo='skip'))
+    fig_scatter.update_layout(template="plotly_white", title=title or f'전체 데이터: {factor} vs. 관대함 지수', title_x=0.5,
+                              xaxis_title=factor, yaxis_title='관대함 지수',
+                              margin=dict(t=50, b=50, l=50, r=50))
+    return compact_figure(fig_scatter)
+
+
+def correlation_timeline_figure(table, column, title):
+    """
+    상관계수 추이 선 그래프 (x: 연도 또는 이동 구간의 끝 연도, 요인별 색, y 범위 -1~1).
+    table: whr/timecorr.py의 yearly/rolling 표, column: 그릴 상관계수 컬럼 (Correlation/Pooled/Within)
+    """
+    hover_columns = [col for col in ('Start', 'Countries', 'Observations') if col in table.columns]
+    fig_timeline = px.line(table, x='Year', y=column, color='Factor', markers=True,
+                           hover_data=hover_columns,
+                           title=title,
+                           labels={'Year': '연도', column: '상관계수', 'Factor': '요인', 'Start': '시작 연도',
+                                   'Countries': '국가 수', 'Observations': '관측치 수'},
+                           color_discrete_sequence=px.colors.qualitative.Bold)
+    fig_timeline.add_hline(y=0, line_dash='dash', line_color='gray')
+    fig_timeline.update_layout(template="plotly_white", title_x=0.5, yaxis_range=[-1, 1],
+                               margin=dict(t=50, b=50, l=50, r=50))
+    return compact_figure(fig_timeline)
+
+
+TREND_DASHES = ['solid', 'dash', 'dot', 'longdash', 'dashdot', 'longdashdot']
+
+
+def trend_figure(frame, variables, metrics, builder):
+    """
+    pages/01 연도별 추이 이중 축 그림. 관대함 지수는 왼쪽 축, 나머지 variables는 오른쪽 축에 그립니다.
+    frame: (Year, Country, 지표...) 행, metrics: 지표별 색을 정하는 순서 (페이지의 요인 목록),
+    builder: (국가, 지표) 트레이스를 만드는 whr.traces.TraceBuilder
+    """
+    primary_y_variables = ['Generosity'] if 'Generosity' in variables else []
+    secondary_y_variables = [var for var in variables if var != 'Generosity']
+
+    colors = px.colors.qualitative.Bold
+    metric_color_map = {metric: colors[i % len(colors)] for i, metric in enumerate(metrics)}
+    country_dash_map = {country: TREND_DASHES[i % len(TREND_DASHES)] for i, country in enumerate(frame['Country'].unique())}
+
+    fig_trend = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_trend.update_layout(
+        title_text='선택된 변수들의 연도별 추이 (전체 평균 및 선택 국가)',
+        template="plotly_white",
+        title_x=0.5,
+        margin=dict(t=50, b=50, l=50, r=50),
+        hovermode="x unified",
+        yaxis=dict(title='관대함 지수 (좌측 축)'),
+        yaxis2=dict(title='다른 요인 값 (우측 축)', overlaying='y', side='right')
+    )
+    trend_spec = fig_trend.to_plotly_json()
+    trend_spec['data'] = builder.build(frame, primary_y_variables, secondary_y_variables,
+                                       metric_color_map, country_dash_map)
+    return compact_figure(trend_spec)
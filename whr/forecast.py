@@ -0,0 +1,207 @@
+"""
+국가별 관대함 지수의 다음 연도 예측 (모든 국가를 한 번에 배열 연산으로 적합).
+
+(국가 수, 연도 수) 패널과 관측 마스크로 세 가지 모형을 적합합니다.
+
+* 선형 추세 (linear): 국가마다 y = a + b·연도 최소제곱. 마스크를 곱한 합계만으로 계수와 예측 표준오차를 구합니다.
+* AR(1) (ar1): 연속으로 관측된 두 해의 쌍으로 y_t = c + φ·y_{t-1}을 적합하고 마지막 관측값에서 반복 예측합니다.
+* 지수평활 (ses): 평활계수 후보(SES_ALPHAS) 전체 × 전체 국가를 연도 순으로 한 번 훑어
+  국가마다 1단계 예측 오차 제곱합이 가장 작은 평활계수를 고릅니다. 결측 연도에서는 수준을 유지합니다.
+
+예측 구간은 정규 근사(평균 ± z·표준오차)입니다. 홀드아웃 정확도는 국가마다 마지막 관측값을 빼고
+같은 모형을 적합해 그 해를 예측한 오차로 계산합니다.
+"""
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from whr.artifacts import load_or_build, open_arrays, save_arrays
+from whr.data import dense_panel
+
+FORECAST_MODELS = {'linear': '선형 추세', 'ar1': 'AR(1)', 'ses': '지수평활'}
+DEFAULT_HORIZON = 3
+# 예측에 필요한 최소 관측 연도 수
+MIN_HISTORY = 4
+SES_ALPHAS = np.linspace(0.05, 0.95, 19)
+
+
+def _linear(y, mask, years, targets):
+    """국가별 선형 추세 예측. targets: (국가 수, H) 예측할 연도. (평균, 표준오차)를 반환합니다."""
+    t = years.astype(float)
+    n = mask.sum(axis=1)
+    st_ = mask @ t
+    sy = (mask * y).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_bar, y_bar = st_ / n, sy / n
+        sxx = mask @ (t * t) - n * t_bar ** 2
+        slope = ((mask * y) @ t - n * t_bar * y_bar) / sxx
+        intercept = y_bar - slope * t_bar
+        resid = mask * (y - intercept[:, None] - slope[:, None] * t)
+        sigma = np.sqrt((resid ** 2).sum(axis=1) / (n - 2))
+        mean = intercept[:, None] + slope[:, None] * targets
+        se = sigma[:, None] * np.sqrt(1 + 1 / n[:, None] + (targets - t_bar[:, None]) ** 2 / sxx[:, None])
+    return mean, se
+
+
+def _last_observed(y, mask, years):
+    """국가별 마지막 관측 연도와 값."""
+    last = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    return years[last], y[np.arange(len(y)), last]
+
+
+def _ar1(y, mask, years, targets):
+    """국가별 AR(1) 반복 예측. 예측 단계 수는 마지막 관측 연도부터 센 연도 차이입니다."""
+    pair = mask[:, 1:] * mask[:, :-1]
+    x_prev, x_next = y[:, :-1], y[:, 1:]
+    n = pair.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mx = (pair * x_prev).sum(axis=1) / n
+        my = (pair * x_next).sum(axis=1) / n
+        sxx = (pair * (x_prev - mx[:, None]) ** 2).sum(axis=1)
+        phi = np.clip((pair * (x_prev - mx[:, None]) * (x_next - my[:, None])).sum(axis=1) / sxx, -1.0, 1.0)
+        c = my - phi * mx
+        resid = pair * (x_next - c[:, None] - phi[:, None] * x_prev)
+        sigma2 = (resid ** 2).sum(axis=1) / (n - 2)
+    last_year, level = _last_observed(y, mask, years)
+    steps = (targets - last_year[:, None]).astype(int)
+    mean = np.full(targets.shape, np.nan)
+    var = np.full(targets.shape, np.nan)
+    value, spread, power = level.copy(), np.zeros(len(y)), np.ones(len(y))
+    for step in range(1, int(steps.max(initial=0)) + 1):
+        value = c + phi * value
+        spread = spread + power
+        power = power * phi * phi
+        hit = steps == step
+        mean[hit] = np.broadcast_to(value[:, None], targets.shape)[hit]
+        var[hit] = np.broadcast_to((sigma2 * spread)[:, None], targets.shape)[hit]
+    return mean, np.sqrt(var)
+
+
+def _ses(y, mask, years, targets):
+    """국가별 단순 지수평활 예측. 평활계수는 SES_ALPHAS 중 1단계 예측 오차가 가장 작은 값입니다."""
+    alphas = SES_ALPHAS[:, None]
+    level = np.full((len(SES_ALPHAS), len(y)), np.nan)
+    sse = np.zeros_like(level)
+    count = np.zeros(len(y))
+    for t in range(y.shape[1]):
+        observed = mask[:, t] > 0
+        started = np.isfinite(level)
+        error = np.where(observed & started, y[:, t] - level, 0.0)
+        sse += error ** 2
+        count += observed & started[0]
+        level = np.where(observed & ~started, y[:, t], level + alphas * error)
+    best = np.argmin(sse, axis=0)
+    columns = np.arange(len(y))
+    alpha = SES_ALPHAS[best]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma2 = sse[best, columns] / (count - 1)
+    last_year, _ = _last_observed(y, mask, years)
+    steps = targets - last_year[:, None]
+    mean = np.broadcast_to(level[best, columns][:, None], targets.shape).copy()
+    se = np.sqrt(sigma2[:, None] * (1 + (steps - 1) * alpha[:, None] ** 2))
+    return mean, se
+
+
+MODEL_FUNCTIONS = {'linear': _linear, 'ar1': _ar1, 'ses': _ses}
+
+
+class ForecastResult:
+    """mean, se는 (모형 수, 국가 수, H), holdout_error, holdout_se는 (모형 수, 국가 수) 배열입니다."""
+
+    def __init__(self, models, countries, years, mean, se, holdout_error, holdout_se):
+        self.models = list(models)
+        self.countries = np.asarray(countries)
+        self.years = np.asarray(years)
+        self.mean, self.se = mean, se
+        self.holdout_error, self.holdout_se = holdout_error, holdout_se
+        self._position = {country: i for i, country in enumerate(self.countries)}
+
+    def frame(self, model, countries, level=0.95):
+        """선택된 국가들의 예측 표 (Country, Year, Forecast, Lower, Upper). 예측할 수 없는 국가는 빠집니다."""
+        m = self.models.index(model)
+        z = norm.ppf(0.5 + level / 2)
+        rows = [self._position[c] for c in countries if c in self._position]
+        mean = np.asarray(self.mean[m])[rows]
+        se = np.asarray(self.se[m])[rows]
+        table = pd.DataFrame({
+            'Country': np.repeat(self.countries[rows], len(self.years)),
+            'Year': np.tile(self.years, len(rows)),
+            'Forecast': mean.ravel(), 'Lower': (mean - z * se).ravel(), 'Upper': (mean + z * se).ravel(),
+        })
+        return table.dropna(subset=['Forecast']).reset_index(drop=True)
+
+    def accuracy(self, level=0.95):
+        """모형별 홀드아웃(국가별 마지막 관측 연도) 정확도 표 (Model, n, MAE, RMSE, Coverage)."""
+        z = norm.ppf(0.5 + level / 2)
+        rows = []
+        for m, model in enumerate(self.models):
+            error = np.asarray(self.holdout_error[m])
+            valid = np.isfinite(error) & np.isfinite(self.holdout_se[m])
+            rows.append({'Model': model, 'n': int(valid.sum()),
+                         'MAE': np.abs(error[valid]).mean() if valid.any() else np.nan,
+                         'RMSE': np.sqrt((error[valid] ** 2).mean()) if valid.any() else np.nan,
+                         'Coverage': (np.abs(error[valid]) <= z * np.asarray(self.holdout_se[m])[valid]).mean()
+                         if valid.any() else np.nan})
+        return pd.DataFrame(rows)
+
+
+def forecast_panel(y, years, horizon=DEFAULT_HORIZON, models=FORECAST_MODELS):
+    """
+    (국가 수, 연도 수) 패널(NaN은 결측)에 대해 모든 모형의 예측과 홀드아웃 오차를 계산합니다.
+    반환값: (예측 연도, mean, se, holdout_error, holdout_se)
+    """
+    mask = np.isfinite(y).astype(float)
+    values = np.nan_to_num(y)
+    years = np.asarray(years, dtype=int)
+    enough = mask.sum(axis=1) >= MIN_HISTORY
+    target_years = years[-1] + np.arange(1, horizon + 1)
+    targets = np.broadcast_to(target_years, (len(y), horizon)).astype(float)
+
+    # 홀드아웃: 국가마다 마지막 관측값을 가리고 그 해를 예측합니다.
+    last = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    train = mask.copy()
+    train[np.arange(len(y)), last] = 0
+    holdout_targets = years[last][:, None].astype(float)
+    holdout_enough = enough & (train.sum(axis=1) >= MIN_HISTORY)
+    actual = values[np.arange(len(y)), last]
+
+    shape = (len(models), len(y))
+    mean = np.full(shape + (horizon,), np.nan)
+    se = np.full_like(mean, np.nan)
+    holdout_error = np.full(shape, np.nan)
+    holdout_se = np.full(shape, np.nan)
+    for m, model in enumerate(models):
+        fit = MODEL_FUNCTIONS[model]
+        model_mean, model_se = fit(values, mask, years, targets)
+        mean[m, enough], se[m, enough] = model_mean[enough], model_se[enough]
+        pred, pred_se = fit(values, train, years, holdout_targets)
+        holdout_error[m, holdout_enough] = (actual - pred[:, 0])[holdout_enough]
+        holdout_se[m, holdout_enough] = pred_se[holdout_enough, 0]
+    return target_years, mean, se, holdout_error, holdout_se
+
+
+def forecast_generosity(df, horizon=DEFAULT_HORIZON):
+    """화면 표시용 컬럼명을 가진 DataFrame으로 모든 국가의 관대함 지수를 예측합니다."""
+    countries, years, panel = dense_panel(df, ['Generosity'])
+    target_years, mean, se, holdout_error, holdout_se = forecast_panel(panel[0], years, horizon)
+    return ForecastResult(list(FORECAST_MODELS), countries, target_years, mean, se, holdout_error, holdout_se)
+
+
+FORECAST_ARRAYS = ['mean', 'se', 'holdout_error', 'holdout_se']
+
+
+def save_results(result, out_dir):
+    """모형별 예측·표준오차·홀드아웃 배열과 forecast.json(모형, 국가, 예측 연도)을 저장합니다 (whr.artifacts.save_arrays)."""
+    return save_arrays(out_dir, {name: getattr(result, name) for name in FORECAST_ARRAYS}, 'forecast.json', {
+        'models': result.models, 'countries': result.countries.tolist(), 'years': result.years.tolist(),
+    })
+
+
+def open_results(forecast_dir):
+    meta, arrays = open_arrays(forecast_dir, FORECAST_ARRAYS, 'forecast.json')
+    return ForecastResult(meta['models'], meta['countries'], meta['years'], *(arrays[name] for name in FORECAST_ARRAYS))
+
+
+def load_results(df):
+    """사전 계산된 forecast/ 예측, 없으면 df로 직접 계산한 예측."""
+    return load_or_build('forecast', 'forecast.json', open_results, lambda: forecast_generosity(df))
@@ -0,0 +1,132 @@
+"""
+국가-연도 결측 칸 채우기(gap-filling).
+
+(지표 수, 국가 수, 연도 수) 밀집 패널(whr/data.py의 dense_panel) 전체를 방법마다 한 번의 배열 연산으로 채웁니다.
+
+* 선형 보간 (interpolate): 앞뒤로 가장 가까운 관측값 사이를 연도에 비례해 잇습니다.
+* 직전 값 유지 (ffill): 가장 최근 관측값을 그대로 씁니다.
+* 패널 평균 모형 (panel_mean): y ≈ 국가 효과 + 연도 효과의 가법 모형을 관측 칸으로 적합한 값을 씁니다.
+
+모든 방법은 국가별 첫 관측 연도와 마지막 관측 연도 사이의 빈 칸만 채우며(외삽하지 않음),
+채운 칸은 observed 마스크로 구분합니다. 데이터셋 버전마다 사전 계산되어 ``impute/``에 저장됩니다.
+"""
+import numpy as np
+import pandas as pd
+
+from whr.artifacts import load_or_build, open_arrays, save_arrays
+from whr.data import METRIC_COLUMNS, dense_panel
+
+IMPUTE_METHODS = {'interpolate': '선형 보간', 'ffill': '직전 값 유지', 'panel_mean': '패널 평균 모형'}
+PANEL_MEAN_ITERATIONS = 50
+
+
+def _neighbours(observed):
+    """칸마다 직전/직후 관측 칸의 연도 인덱스. 없으면 -1 / 연도 수."""
+    n_years = observed.shape[-1]
+    index = np.arange(n_years)
+    prev = np.maximum.accumulate(np.where(observed, index, -1), axis=-1)
+    nxt = np.minimum.accumulate(np.where(observed, index, n_years)[..., ::-1], axis=-1)[..., ::-1]
+    return prev, nxt
+
+
+def interpolate(values, observed, years=None):
+    """관측 구간 안의 빈 칸을 연도에 비례해 선형 보간합니다. years를 주지 않으면 연도 간격을 1로 봅니다."""
+    n_years = values.shape[-1]
+    years = np.arange(n_years) if years is None else np.asarray(years, dtype=float)
+    prev, nxt = _neighbours(observed)
+    inside = (prev >= 0) & (nxt < n_years)
+    prev_safe, next_safe = np.clip(prev, 0, None), np.clip(nxt, None, n_years - 1)
+    prev_value = np.take_along_axis(values, prev_safe, axis=-1)
+    next_value = np.take_along_axis(values, next_safe, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(nxt > prev, (years - years[prev_safe]) / (years[next_safe] - years[prev_safe]), 0.0)
+    filled = prev_value + weight * (next_value - prev_value)
+    return np.where(observed, values, np.where(inside, filled, np.nan))
+
+
+def forward_fill(values, observed, years=None):
+    """관측 구간 안의 빈 칸을 직전 관측값으로 채웁니다."""
+    prev, nxt = _neighbours(observed)
+    inside = (prev >= 0) & (nxt < values.shape[-1])
+    filled = np.take_along_axis(values, np.clip(prev, 0, None), axis=-1)
+    return np.where(observed, values, np.where(inside, filled, np.nan))
+
+
+def panel_mean(values, observed, years=None):
+    """
+    관측 구간 안의 빈 칸을 지표마다 '국가 효과 + 연도 효과' 가법 모형의 적합값으로 채웁니다.
+    두 효과는 관측 칸에 대해 교대로 평균을 내어(교대 투영) 추정합니다.
+    """
+    mask = observed.astype(float)
+    y = np.nan_to_num(values)
+    country_n = mask.sum(axis=-1)
+    year_n = mask.sum(axis=-2)
+    country_effect = np.zeros(values.shape[:-1])
+    year_effect = np.zeros(values.shape[:-2] + values.shape[-1:])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(PANEL_MEAN_ITERATIONS):
+            country_effect = (mask * (y - year_effect[..., None, :])).sum(axis=-1) / country_n
+            country_effect = np.nan_to_num(country_effect)
+            year_effect = np.nan_to_num((mask * (y - country_effect[..., None])).sum(axis=-2) / year_n)
+    prev, nxt = _neighbours(observed)
+    inside = (prev >= 0) & (nxt < values.shape[-1])
+    fitted = country_effect[..., None] + year_effect[..., None, :]
+    return np.where(observed, values, np.where(inside, fitted, np.nan))
+
+
+METHOD_FUNCTIONS = {'interpolate': interpolate, 'ffill': forward_fill, 'panel_mean': panel_mean}
+
+
+class ImputedPanel:
+    """values[method]는 (지표 수, 국가 수, 연도 수) 배열, observed는 원래 관측된 칸의 마스크입니다."""
+
+    def __init__(self, metrics, countries, years, observed, values):
+        self.metrics = list(metrics)
+        self.countries = np.asarray(countries)
+        self.years = np.asarray(years)
+        self.observed = observed
+        self.values = values
+
+    def frame(self, method, metrics):
+        """
+        (Country, Year, 지표..., Imputed) 형식의 표. metrics가 모두 채워진 국가-연도만 포함하며,
+        Imputed는 그 행의 지표 중 하나라도 채운 값이면 True입니다.
+        """
+        index = [self.metrics.index(metric) for metric in metrics]
+        values = np.asarray(self.values[method])[index]
+        observed = np.asarray(self.observed)[index]
+        complete = np.isfinite(values).all(axis=0)
+        g, t = np.nonzero(complete)
+        table = pd.DataFrame({'Country': self.countries[g], 'Year': self.years[t]})
+        for i, metric in enumerate(metrics):
+            table[metric] = values[i, g, t]
+        table['Imputed'] = ~observed[:, g, t].all(axis=0)
+        return table
+
+
+def impute_panel(df, metrics=METRIC_COLUMNS):
+    """화면 표시용 컬럼명을 가진 DataFrame으로 모든 방법의 채운 패널을 계산합니다."""
+    metrics = [m for m in metrics if m in df.columns]
+    countries, years, values = dense_panel(df, metrics)
+    observed = np.isfinite(values)
+    filled = {method: fill(values, observed, years) for method, fill in METHOD_FUNCTIONS.items()}
+    return ImputedPanel(metrics, countries, years, observed, filled)
+
+
+def save_results(panel, out_dir):
+    """관측 마스크(observed)와 방법별 채운 패널, impute.json(지표, 국가, 연도)을 저장합니다 (whr.artifacts.save_arrays)."""
+    arrays = {'observed': panel.observed, **{method: panel.values[method] for method in METHOD_FUNCTIONS}}
+    return save_arrays(out_dir, arrays, 'impute.json', {
+        'metrics': panel.metrics, 'countries': panel.countries.tolist(), 'years': panel.years.tolist(),
+    })
+
+
+def open_results(impute_dir):
+    meta, arrays = open_arrays(impute_dir, ['observed'] + list(METHOD_FUNCTIONS), 'impute.json')
+    observed = arrays.pop('observed')
+    return ImputedPanel(meta['metrics'], meta['countries'], meta['years'], observed, arrays)
+
+
+def load_results(df):
+    """사전 계산된 impute/ 패널, 없으면 df로 직접 채운 패널."""
+    return load_or_build('impute', 'impute.json', open_results, lambda: impute_panel(df))
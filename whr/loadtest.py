@@ -0,0 +1,358 @@
+"""
+동시 세션 부하 테스트 CLI.
+
+로컬에서 ``streamlit run main.py`` 서버를 띄우고, 브라우저 대신 웹소켓(``/_stcore/stream``)으로
+Streamlit 프로토콜 메시지(BackMsg/ForwardMsg)를 주고받는 가짜 클라이언트 N개를 동시에 돌립니다.
+각 세션은 실제 사용 흐름을 흉내 낸 시나리오(SCRIPTS)를 반복 재생합니다.
+
+* overview: 메인 페이지를 열고 연도 슬라이더를 옮기고, 관대함 지수 범위 슬라이더를 끌고, 탭을 바꿉니다.
+* factors:  국가별차이설명 페이지(pages/00)를 열고 모든 요인을 선택합니다.
+* trend:    상관성 페이지(pages/01)를 열고 추이 비교 국가를 바꿉니다.
+
+탭 전환은 브라우저 안에서만 일어나고 서버 리런을 만들지 않으므로 think time으로만 반영합니다.
+동시 세션 수를 늘려 가며 단계마다 리런 처리량, 리런 지연 백분위수(p50/p90/p99), 서버 RSS 최댓값을 보고하고,
+--baseline으로 이전 보고서(JSON)와 p90 지연을 비교해 회귀를 잡습니다.
+
+사용법:
+    python -m whr.loadtest [--sessions 1,2,4,8] [--duration 20] [--think 0.5] [--scripts overview,factors,trend]
+                           [--port 8599] [--url ws://HOST:PORT] [--pid PID] [--json report.json]
+                           [--baseline report.json] [--tolerance 0.25]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.asyncio.client import connect
+
+DEFAULT_PORT = 8599
+DEFAULT_LEVELS = [1, 2, 4, 8]
+STARTUP_TIMEOUT = 60
+RERUN_TIMEOUT = 120
+RSS_INTERVAL = 0.5
+PERCENTILES = [50, 90, 99]
+# 리런 후 위젯 id를 찾을 때 보는 위젯 종류와 값 필드 (WidgetState의 oneof 이름)
+WIDGET_VALUE_FIELDS = {
+    'slider': 'double_array_value',
+    'multiselect': 'string_array_value',
+    'selectbox': 'string_value',
+    'radio': 'string_value',
+    'checkbox': 'bool_value',
+}
+
+YEAR_SLIDER = "분석할 연도를 선택하세요:"
+RANGE_SLIDER = "관대함 지수 범위:"
+FACTOR_SELECT = "관대함 지수와의 상관성을 분석할 요인을 선택하세요:"
+TREND_COUNTRY_SELECT = "추이를 비교할 국가를 선택하세요:"
+
+
+class RerunError(Exception):
+    """스크립트가 컴파일 오류나 예외로 끝났을 때 발생합니다."""
+
+
+class Session:
+    """
+    브라우저 탭 하나를 대신하는 클라이언트. 페이지별로 마지막 리런에서 받은 위젯(라벨 -> 요소 proto)과
+    지금까지 바꾼 위젯 상태(id -> WidgetState)를 기억하고, 리런마다 전체 상태를 다시 보냅니다.
+    """
+
+    def __init__(self, url, rng):
+        self.url = url
+        self.rng = rng
+        self.pages = {}
+        self.page = None
+        self.widgets = {}
+        self.states = {}
+        self.latencies = []
+        self.payload_bytes = 0
+        self._ws = None
+
+    async def __aenter__(self):
+        self._ws = await connect(f'{self.url}/_stcore/stream', subprotocols=['streamlit'], max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._ws.close()
+
+    async def rerun(self, page=None):
+        """현재 위젯 상태로 page(이름, None이면 현재 페이지)를 리런하고 지연(초)을 반환합니다."""
+        if page is not None and page != self.page:
+            self.page = page
+            self.widgets = {}
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        # 첫 리런 전에는 페이지 해시를 모르므로 URL 경로와 같은 페이지 이름으로 요청합니다.
+        message.rerun_script.page_script_hash = self.pages.get(self.page, '')
+        if self.page not in self.pages and self.page not in (None, 'main'):
+            message.rerun_script.page_name = self.page
+        message.rerun_script.widget_states.widgets.extend(self.states.get(self.page, {}).values())
+        started = time.perf_counter()
+        await self._ws.send(message.SerializeToString())
+        widgets, exceptions = {}, []
+        while True:
+            raw = await asyncio.wait_for(self._ws.recv(), RERUN_TIMEOUT)
+            self.payload_bytes += len(raw)
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof('type')
+            if kind == 'navigation':
+                self.pages = {p.page_name: p.page_script_hash for p in forward.navigation.app_pages}
+                if self.page is None and forward.navigation.app_pages:
+                    self.page = forward.navigation.app_pages[0].page_name
+            elif kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                widget_type = element.WhichOneof('type')
+                if widget_type in WIDGET_VALUE_FIELDS:
+                    proto = getattr(element, widget_type)
+                    widgets.setdefault(proto.label, (widget_type, proto))
+                elif widget_type == 'exception':
+                    exceptions.append(element.exception.message)
+            elif kind == 'script_finished':
+                latency = time.perf_counter() - started
+                if forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RerunError(f"{self.page} 스크립트 컴파일 오류")
+                self.widgets = widgets
+                self.latencies.append(latency)
+                if exceptions:
+                    raise RerunError(f"{self.page} 스크립트 예외: {exceptions[0]}")
+                return latency
+
+    async def set(self, label, value):
+        """라벨이 label인 위젯 값을 value로 바꾸고 리런합니다. 현재 페이지에 그 위젯이 없으면 리런하지 않습니다."""
+        if label not in self.widgets:
+            return None
+        widget_type, proto = self.widgets[label]
+        widget = WidgetState(id=proto.id)
+        field = WIDGET_VALUE_FIELDS[widget_type]
+        if field.endswith('_array_value'):
+            getattr(widget, field).data.extend(value)
+        else:
+            setattr(widget, field, value)
+        self.states.setdefault(self.page, {})[proto.id] = widget
+        return await self.rerun()
+
+    def options(self, label):
+        return list(self.widgets[label][1].options) if label in self.widgets else []
+
+    def random_slider_value(self, label, as_range=False):
+        """슬라이더 범위 안의 임의 값 (as_range면 (하한, 상한))."""
+        if label not in self.widgets:
+            return None
+        proto = self.widgets[label][1]
+        steps = max(int(round((proto.max - proto.min) / proto.step)), 1)
+        picks = sorted(self.rng.sample(range(steps + 1), 2) if as_range else [self.rng.randint(0, steps)])
+        return [proto.min + proto.step * i for i in picks]
+
+
+async def _think(session, think):
+    await asyncio.sleep(session.rng.uniform(0.5, 1.5) * think)
+
+
+async def overview_script(session, think):
+    await session.rerun('main')
+    for _ in range(3):
+        await _think(session, think)
+        await session.set(YEAR_SLIDER, session.random_slider_value(YEAR_SLIDER))
+    await _think(session, think)
+    await session.set(RANGE_SLIDER, session.random_slider_value(RANGE_SLIDER, as_range=True))
+    # 탭 전환 (브라우저 안에서만 일어나므로 리런 없음)
+    await _think(session, think)
+
+
+async def factors_script(session, think):
+    await session.rerun('국가별차이설명')
+    await _think(session, think)
+    await session.set(FACTOR_SELECT, session.options(FACTOR_SELECT))
+
+
+async def trend_script(session, think):
+    await session.rerun('상관성')
+    await _think(session, think)
+    countries = session.options(TREND_COUNTRY_SELECT)
+    if countries:
+        await session.set(TREND_COUNTRY_SELECT, session.rng.sample(countries, min(5, len(countries))))
+
+
+SCRIPTS = {'overview': overview_script, 'factors': factors_script, 'trend': trend_script}
+
+
+def server_rss_mb(pid):
+    """프로세스 RSS (MB). /proc을 못 읽으면 ps를 씁니다. 알 수 없으면 None."""
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        output = subprocess.run(['ps', '-o', 'rss=', '-p', str(pid)], capture_output=True, text=True, check=True)
+        return int(output.stdout.strip()) / 1024
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(port, app='main.py'):
+    """streamlit 서버를 띄우고 /_stcore/health가 응답할 때까지 기다립니다."""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app, '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit 서버가 종료되었습니다 (코드 {process.returncode}).")
+        try:
+            with urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"{STARTUP_TIMEOUT}초 안에 streamlit 서버가 응답하지 않았습니다.")
+
+
+async def _session_loop(url, script, think, deadline, seed, errors):
+    latencies = []
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        try:
+            async with Session(url, rng) as session:
+                await script(session, think)
+                latencies.extend(session.latencies)
+        except Exception as error:  # 리런 예외, 시간 초과, 웹소켓 연결 끊김 등
+            errors.append(f"{script.__name__}: {type(error).__name__}: {error}")
+            await asyncio.sleep(think)
+    return latencies
+
+
+async def warm_up(url, scripts):
+    """시나리오마다 한 번씩 돌려 첫 데이터 로드와 캐시 채우기를 측정에서 뺍니다."""
+    for name in scripts:
+        async with Session(url, random.Random(0)) as session:
+            await SCRIPTS[name](session, 0)
+
+
+async def _rss_sampler(pid, stop, samples):
+    while not stop.is_set():
+        rss = server_rss_mb(pid)
+        if rss is not None:
+            samples.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), RSS_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(url, sessions, scripts, duration, think, pid, seed=0):
+    """동시 세션 sessions개로 duration초 동안 시나리오를 돌리고 단계 결과(dict)를 반환합니다."""
+    started = time.monotonic()
+    deadline = started + duration
+    errors, rss = [], []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_rss_sampler(pid, stop, rss))
+    results = await asyncio.gather(*(
+        _session_loop(url, SCRIPTS[scripts[i % len(scripts)]], think, deadline, seed * 1000 + i, errors)
+        for i in range(sessions)))
+    elapsed = time.monotonic() - started
+    stop.set()
+    await sampler
+    latencies = np.asarray([latency for result in results for latency in result])
+    level = {
+        'sessions': sessions,
+        'reruns': int(latencies.size),
+        'throughput': latencies.size / elapsed,
+        'errors': len(errors),
+        'rss_mb': max(rss) if rss else None,
+    }
+    for p in PERCENTILES:
+        level[f'p{p}'] = float(np.percentile(latencies, p)) if latencies.size else None
+    if errors:
+        level['error_samples'] = errors[:5]
+    return level
+
+
+def _format(value, spec):
+    return '-' if value is None else format(value, spec)
+
+
+def compare(report, baseline, tolerance):
+    """동시 세션 수가 같은 단계끼리 p90 지연을 비교해 tolerance 비율 넘게 느려진 단계 목록을 반환합니다."""
+    previous = {level['sessions']: level for level in baseline['levels']}
+    regressions = []
+    for level in report['levels']:
+        before = previous.get(level['sessions'])
+        if before and before.get('p90') and level.get('p90') and level['p90'] > before['p90'] * (1 + tolerance):
+            regressions.append((level['sessions'], before['p90'], level['p90']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="동시 세션 수를 늘려 가며 Streamlit 앱의 리런 지연과 메모리를 측정합니다.")
+    parser.add_argument('--sessions', default=','.join(map(str, DEFAULT_LEVELS)),
+                        help="단계별 동시 세션 수 (쉼표 구분, 기본값: %(default)s)")
+    parser.add_argument('--duration', type=float, default=20, help="단계당 측정 시간(초) (기본값: %(default)s)")
+    parser.add_argument('--think', type=float, default=0.5, help="조작 사이 평균 대기 시간(초) (기본값: %(default)s)")
+    parser.add_argument('--scripts', default=','.join(SCRIPTS), help="세션에 돌아가며 배정할 시나리오 (기본값: %(default)s)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="로컬 서버 포트 (기본값: %(default)s)")
+    parser.add_argument('--url', default=None, help="이미 떠 있는 서버 주소 (예: ws://localhost:8501). 주면 서버를 띄우지 않습니다.")
+    parser.add_argument('--pid', type=int, default=None, help="--url 서버의 프로세스 id (RSS 측정용)")
+    parser.add_argument('--json', default=None, help="보고서를 JSON으로 저장할 경로")
+    parser.add_argument('--baseline', default=None, help="비교할 이전 보고서(JSON). p90 지연이 늘면 종료 코드 1")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="회귀로 볼 p90 증가 비율 (기본값: %(default)s)")
+    args = parser.parse_args(argv)
+
+    levels = [int(n) for n in args.sessions.split(',') if n.strip()]
+    scripts = [name.strip() for name in args.scripts.split(',') if name.strip()]
+    unknown = [name for name in scripts if name not in SCRIPTS]
+    if unknown:
+        parser.error(f"알 수 없는 시나리오: {', '.join(unknown)} (가능: {', '.join(SCRIPTS)})")
+
+    server = None
+    url, pid = args.url, args.pid
+    if url is None:
+        server = start_server(args.port)
+        url, pid = f'ws://localhost:{args.port}', server.pid
+    try:
+        asyncio.run(warm_up(url, scripts))
+        report = {'scripts': scripts, 'think': args.think, 'duration': args.duration, 'levels': []}
+        print(f"{'세션':>6}{'리런':>8}{'처리량(/s)':>12}{'p50(s)':>9}{'p90(s)':>9}{'p99(s)':>9}{'오류':>6}{'RSS(MB)':>10}")
+        for sessions in levels:
+            level = asyncio.run(run_level(url, sessions, scripts, args.duration, args.think, pid))
+            report['levels'].append(level)
+            print(f"{sessions:>6}{level['reruns']:>8}{level['throughput']:>12.2f}"
+                  f"{_format(level['p50'], '.3f'):>9}{_format(level['p90'], '.3f'):>9}{_format(level['p99'], '.3f'):>9}"
+                  f"{level['errors']:>6}{_format(level['rss_mb'], ',.0f'):>10}")
+            for sample in level.get('error_samples', []):
+                print(f"  오류: {sample}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    if args.baseline and os.path.isfile(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for sessions, before, after in regressions:
+            print(f"회귀: 동시 세션 {sessions}개 p90 {before:.3f}s -> {after:.3f}s")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
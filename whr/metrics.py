@@ -0,0 +1,234 @@
+"""
+운영 지표(metrics) 레지스트리와 노출 방법.
+
+앱 프로세스 하나에 레지스트리(REGISTRY) 하나가 있고, 계측 지점은 잠금 아래에서 카운터를 올리거나
+히스토그램 버킷에 더하기만 하므로 항상 켜 두어도 부담이 없습니다. 프로세스 RSS처럼 조회할 때만 필요한 값은
+수집 함수(register_collector)로 등록해 두고 스크레이프할 때 계산합니다.
+
+노출 방법 (환경 변수로 켬, 프로세스마다 한 번만 시작):
+
+* ``WHR_METRICS_PORT``: 데몬 스레드 HTTP 서버. ``/metrics``는 Prometheus 텍스트 형식(0.0.4),
+  ``/metrics.json``은 같은 내용의 JSON입니다.
+* ``WHR_METRICS_FILE``: ``WHR_METRICS_INTERVAL``초(기본 60초)마다 JSON 파일로 덤프합니다
+  (임시 파일에 쓴 뒤 교체하므로 읽는 쪽이 반쯤 쓰인 파일을 보지 않음).
+
+Streamlit 쪽 계측(리런 시간, 캐시 적중, 활성 세션 수)은 whr/ui.py에 있습니다.
+"""
+import bisect
+import json
+import os
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 리런 시간(초)과 그림 페이로드(바이트) 히스토그램의 버킷 상한
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+DEFAULT_DUMP_INTERVAL = 60
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Registry:
+    """이름 -> (종류, 설명, 레이블 키 -> 값)인 지표 저장소. 모든 갱신은 잠금 하나로 보호합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def _series(self, kind, name, help_text, labels):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = {'kind': kind, 'help': help_text, 'series': {}}
+        return metric['series'], _label_key(labels)
+
+    def inc(self, name, help_text='', amount=1, **labels):
+        """카운터를 amount만큼 올립니다."""
+        with self._lock:
+            series, key = self._series('counter', name, help_text, labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, help_text='', **labels):
+        """게이지 값을 바꿉니다."""
+        with self._lock:
+            series, key = self._series('gauge', name, help_text, labels)
+            series[key] = value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, help_text='', **labels):
+        """히스토그램에 관측값 하나를 더합니다 (버킷별 개수, 합, 개수)."""
+        with self._lock:
+            series, key = self._series('histogram', name, help_text, labels)
+            state = series.get(key)
+            if state is None:
+                state = series[key] = {'buckets': buckets, 'counts': [0] * (len(buckets) + 1), 'sum': 0.0}
+            state['counts'][bisect.bisect_left(state['buckets'], value)] += 1
+            state['sum'] += value
+
+    def register_collector(self, collect):
+        """스크레이프할 때마다 호출할 수집 함수 collect(registry)를 등록합니다 (게이지 갱신용)."""
+        with self._lock:
+            if collect not in self._collectors:
+                self._collectors.append(collect)
+
+    def collect(self):
+        """수집 함수를 돌린 뒤 지표 사본을 반환합니다. 실패한 수집 함수는 건너뜁니다."""
+        for collect in list(self._collectors):
+            try:
+                collect(self)
+            except Exception:  # 지표 수집 실패가 앱이나 스크레이프를 멈추게 하지 않도록 합니다.
+                self.inc('whr_metrics_collector_errors_total', '수집 함수 오류 수',
+                         collector=getattr(collect, '__name__', 'collector'))
+        with self._lock:
+            return {name: {'kind': metric['kind'], 'help': metric['help'],
+                           'series': {key: (dict(value, counts=list(value['counts']))
+                                            if isinstance(value, dict) else value)
+                                      for key, value in metric['series'].items()}}
+                    for name, metric in self._metrics.items()}
+
+    def prometheus_text(self):
+        """Prometheus 텍스트 노출 형식(0.0.4) 문자열."""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            if metric['help']:
+                lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            for key, value in sorted(metric['series'].items()):
+                if metric['kind'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(value['buckets']) + ['+Inf'], value['counts']):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+    def as_json(self):
+        """JSON으로 바꿀 수 있는 dict (시각, 지표 이름 -> 종류/설명/레이블별 값 목록)."""
+        metrics = {}
+        for name, metric in sorted(self.collect().items()):
+            samples = []
+            for key, value in sorted(metric['series'].items()):
+                sample = {'labels': dict(key)}
+                if metric['kind'] == 'histogram':
+                    sample.update(buckets=list(value['buckets']), counts=value['counts'], sum=value['sum'],
+                                  count=sum(value['counts']))
+                else:
+                    sample['value'] = value
+                samples.append(sample)
+            metrics[name] = {'kind': metric['kind'], 'help': metric['help'], 'samples': samples}
+        return {'timestamp': time.time(), 'pid': os.getpid(), 'metrics': metrics}
+
+
+REGISTRY = Registry()
+
+
+def process_rss_bytes():
+    """현재 프로세스 RSS (바이트). /proc을 못 읽으면 최대 RSS(getrusage)를 대신 씁니다."""
+    try:
+        with open('/proc/self/statm', encoding='utf-8') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def collect_process(registry):
+    registry.set('whr_process_resident_memory_bytes', process_rss_bytes(), '프로세스 RSS (바이트)')
+    registry.set('whr_process_threads', threading.active_count(), '파이썬 스레드 수')
+
+
+REGISTRY.register_collector(collect_process)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body = self.registry.prometheus_text().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path.split('?')[0] == '/metrics.json':
+            body = json.dumps(self.registry.as_json(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, registry=REGISTRY, host='0.0.0.0'):
+    """데몬 스레드에서 /metrics, /metrics.json HTTP 서버를 시작하고 서버 객체를 반환합니다."""
+    handler = type('MetricsHandler', (_Handler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='whr-metrics-http', daemon=True).start()
+    return server
+
+
+def dump_json(path, registry=REGISTRY):
+    """지표를 JSON 파일로 씁니다 (임시 파일 + os.replace)."""
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(registry.as_json(), f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _dump_loop(path, interval, registry):
+    while True:
+        time.sleep(interval)
+        try:
+            dump_json(path, registry)
+        except OSError:
+            registry.inc('whr_metrics_dump_errors_total', 'JSON 덤프 실패 수')
+
+
+_exporters_lock = threading.Lock()
+_exporters_started = False
+
+
+def start_exporters(registry=REGISTRY):
+    """
+    환경 변수(WHR_METRICS_PORT, WHR_METRICS_FILE, WHR_METRICS_INTERVAL)에 따라 노출 방법을 시작합니다.
+    프로세스마다 한 번만 시작하며, 둘 다 없으면 아무것도 하지 않습니다 (계측은 계속 누적됨).
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    port = os.environ.get('WHR_METRICS_PORT')
+    if port:
+        try:
+            serve(int(port), registry)
+        except OSError:
+            registry.inc('whr_metrics_http_errors_total', '지표 HTTP 서버 시작 실패 수')
+    path = os.environ.get('WHR_METRICS_FILE')
+    if path:
+        interval = float(os.environ.get('WHR_METRICS_INTERVAL', DEFAULT_DUMP_INTERVAL))
+        threading.Thread(target=_dump_loop, args=(path, interval, registry),
+                         name='whr-metrics-dump', daemon=True).start()
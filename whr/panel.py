@@ -0,0 +1,166 @@
+"""
+패널 회귀 엔진: Generosity ~ 요인들 을 국가/연도 고정효과 또는 국가 랜덤 절편(혼합 효과)으로 추정합니다.
+
+* 고정효과: 그룹 평균 차감(within 변환)을 np.bincount로 벡터화하여 계산합니다.
+  국가+연도 양방향 고정효과는 불균형 패널에서도 맞도록 교대 투영(alternating projections)으로 수렴시킵니다.
+* 랜덤 절편: Swamy-Arora 분산 성분 추정 후 준-평균 차감(quasi-demeaning) GLS로 추정합니다.
+  반복 최적화(statsmodels MixedLM의 REML)를 하지 않으므로 대화형 속도로 계산됩니다.
+* 표준오차는 모두 국가 단위 군집-강건(cluster-robust) 표준오차입니다.
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+EFFECTS = ['entity', 'time', 'two-way', 'random']
+
+
+class PanelResult:
+    """패널 회귀 추정 결과. table()로 계수 표를 얻습니다."""
+
+    def __init__(self, effects, names, params, cov, nobs, n_groups, r2_within, extra=None):
+        self.effects = effects
+        self.names = list(names)
+        self.params = params
+        self.cov = cov
+        self.nobs = nobs
+        self.n_groups = n_groups
+        self.r2_within = r2_within
+        self.extra = extra or {}
+
+    def table(self, alpha=0.05):
+        """계수, 표준오차, t 값, p 값, 신뢰구간 표. 군집 수 - 1을 자유도로 하는 t 분포를 사용합니다."""
+        se = np.sqrt(np.diag(self.cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tvalues = self.params / se
+        df_resid = max(self.n_groups - 1, 1)
+        pvalues = 2 * stats.t.sf(np.abs(tvalues), df_resid)
+        crit = stats.t.ppf(1 - alpha / 2, df_resid)
+        return pd.DataFrame({
+            'coef': self.params, 'std_err': se, 't': tvalues, 'p_value': pvalues,
+            'ci_low': self.params - crit * se, 'ci_high': self.params + crit * se,
+        }, index=pd.Index(self.names, name='Variable'))
+
+
+def _group_means(values, codes, n_groups):
+    """values(n, k)의 그룹별 평균을 (n_groups, k) 배열로 반환합니다."""
+    counts = np.bincount(codes, minlength=n_groups).astype(float)
+    sums = np.column_stack([np.bincount(codes, weights=values[:, j], minlength=n_groups)
+                            for j in range(values.shape[1])])
+    with np.errstate(invalid='ignore'):
+        return sums / counts[:, None]
+
+
+def within_transform(values, codes_list, tol=1e-10, max_iter=1000):
+    """
+    하나 이상의 그룹 코드에 대해 그룹 평균을 차감합니다.
+    그룹 코드가 둘 이상이면(양방향 고정효과) 값이 수렴할 때까지 교대로 차감합니다.
+    """
+    out = np.array(values, dtype=float, copy=True)
+    sizes = [int(codes.max()) + 1 for codes in codes_list]
+    for _ in range(max_iter if len(codes_list) > 1 else 1):
+        previous = out.copy()
+        for codes, n_groups in zip(codes_list, sizes):
+            out -= _group_means(out, codes, n_groups)[codes]
+        if len(codes_list) == 1 or np.max(np.abs(out - previous)) < tol:
+            break
+    return out
+
+
+def cluster_robust_cov(X, resid, clusters):
+    """
+    군집-강건 공분산 (X'X)^-1 (Σ_g X_g'u_g u_g'X_g) (X'X)^-1 에
+    소표본 보정 G/(G-1) · (N-1)/(N-K)를 곱한 값.
+    """
+    n, k = X.shape
+    n_clusters = int(clusters.max()) + 1
+    bread = np.linalg.pinv(X.T @ X)
+    scores = X * resid[:, None]
+    cluster_scores = np.column_stack([np.bincount(clusters, weights=scores[:, j], minlength=n_clusters)
+                                      for j in range(k)])
+    meat = cluster_scores.T @ cluster_scores
+    correction = n_clusters / max(n_clusters - 1, 1) * (n - 1) / max(n - k, 1)
+    return correction * bread @ meat @ bread
+
+
+def _prepare(df, factors):
+    data = df[['Country', 'Year', 'Generosity'] + list(factors)].copy()
+    for col in ['Generosity'] + list(factors):
+        data[col] = pd.to_numeric(data[col], errors='coerce')
+    data = data.dropna()
+    country_codes, _ = pd.factorize(data['Country'])
+    year_codes, _ = pd.factorize(data['Year'])
+    y = data['Generosity'].to_numpy(dtype=float)
+    X = data[list(factors)].to_numpy(dtype=float)
+    return y, X, country_codes.astype(np.intp), year_codes.astype(np.intp)
+
+
+def fit_fixed_effects(y, X, country_codes, year_codes, names, effects='entity'):
+    """국가(entity), 연도(time), 또는 양방향(two-way) 고정효과 within 추정."""
+    codes_list = {'entity': [country_codes], 'time': [year_codes],
+                  'two-way': [country_codes, year_codes]}[effects]
+    transformed = within_transform(np.column_stack([y, X]), codes_list)
+    y_w, X_w = transformed[:, 0], transformed[:, 1:]
+    params, *_ = np.linalg.lstsq(X_w, y_w, rcond=None)
+    resid = y_w - X_w @ params
+    tss = float(y_w @ y_w)
+    r2_within = 1 - float(resid @ resid) / tss if tss > 0 else np.nan
+    cov = cluster_robust_cov(X_w, resid, country_codes)
+    return PanelResult(effects, names, params, cov, len(y), int(country_codes.max()) + 1, r2_within)
+
+
+def fit_random_intercept(y, X, country_codes, names):
+    """
+    국가 랜덤 절편 모형 y_it = a + X_it b + u_i + e_it 의 GLS 추정 (Swamy-Arora 분산 성분).
+    extra에 sigma_u, sigma_e, icc(국가 간 분산 비율)를 담습니다.
+    """
+    n, k = X.shape
+    n_groups = int(country_codes.max()) + 1
+    counts = np.bincount(country_codes, minlength=n_groups).astype(float)
+    data = np.column_stack([y, X])
+    means = _group_means(data, country_codes, n_groups)
+
+    # 국가 내(within) 잔차로 개체 내 분산 추정
+    within = data - means[country_codes]
+    b_within, *_ = np.linalg.lstsq(within[:, 1:], within[:, 0], rcond=None)
+    resid_within = within[:, 0] - within[:, 1:] @ b_within
+    sigma_e2 = float(resid_within @ resid_within) / max(n - n_groups - k, 1)
+
+    # 국가 평균(between) 회귀로 개체 간 분산 추정
+    X_between = np.column_stack([np.ones(n_groups), means[:, 1:]])
+    b_between, *_ = np.linalg.lstsq(X_between, means[:, 0], rcond=None)
+    resid_between = means[:, 0] - X_between @ b_between
+    sigma_b2 = float(resid_between @ resid_between) / max(n_groups - k - 1, 1)
+    t_bar = n_groups / np.sum(1.0 / counts)
+    sigma_u2 = max(sigma_b2 - sigma_e2 / t_bar, 0.0)
+
+    theta = 1 - np.sqrt(sigma_e2 / (counts * sigma_u2 + sigma_e2))
+    theta_i = theta[country_codes]
+    y_star = y - theta_i * means[country_codes, 0]
+    X_star = np.column_stack([1 - theta_i, X - theta_i[:, None] * means[country_codes, 1:]])
+    params, *_ = np.linalg.lstsq(X_star, y_star, rcond=None)
+    resid = y_star - X_star @ params
+    cov = cluster_robust_cov(X_star, resid, country_codes)
+
+    resid_w = within[:, 0] - within[:, 1:] @ params[1:]
+    tss_w = float(within[:, 0] @ within[:, 0])
+    r2_within = 1 - float(resid_w @ resid_w) / tss_w if tss_w > 0 else np.nan
+    extra = {'sigma_u': np.sqrt(sigma_u2), 'sigma_e': np.sqrt(sigma_e2),
+             'icc': sigma_u2 / (sigma_u2 + sigma_e2) if sigma_u2 + sigma_e2 > 0 else np.nan}
+    return PanelResult('random', ['const'] + list(names), params, cov, n, n_groups, r2_within, extra)
+
+
+def fit_panel(df, factors, effects='entity'):
+    """
+    화면 표시용 컬럼명을 가진 DataFrame으로 Generosity ~ factors 패널 회귀를 추정합니다.
+    effects: 'entity'(국가 고정효과), 'time'(연도 고정효과), 'two-way'(국가+연도), 'random'(국가 랜덤 절편).
+    관측치나 국가 수가 부족하면 ValueError를 발생시킵니다.
+    """
+    if effects not in EFFECTS:
+        raise ValueError(f"알 수 없는 효과 유형입니다: {effects}")
+    factors = list(factors)
+    y, X, country_codes, year_codes = _prepare(df, factors)
+    if len(y) <= len(factors) + 1 or len(np.unique(country_codes)) < 2:
+        raise ValueError("패널 회귀를 추정하기에 관측치 또는 국가 수가 부족합니다.")
+    if effects == 'random':
+        return fit_random_intercept(y, X, country_codes, factors)
+    return fit_fixed_effects(y, X, country_codes, year_codes, factors, effects)
@@ -0,0 +1,146 @@
+"""
+Plotly 그림 페이로드(st.plotly_chart로 브라우저에 보내는 JSON) 줄이기와 차트별 바이트 예산.
+
+compact_figure는 그림의 모양은 그대로 두고 다음을 적용합니다.
+
+* 숫자 배열: 표시 정밀도(precision, 소수 자릿수)로 반올림한 뒤 float32(정수면 가장 작은 정수형)
+  타입 배열로 바꿉니다. Plotly는 이를 base64 타입 배열({"dtype", "bdata"})로 직렬화합니다.
+* 템플릿: 그림에 실제로 쓰인 트레이스 종류의 기본값만 남깁니다 (plotly_white 템플릿만 약 7KB).
+* hovertemplate에서 참조하지 않는 customdata는 뺍니다.
+* 모든 점이 같은 값인 배열(marker.color, marker.symbol, 국가별 트레이스의 hovertext 등)은 스칼라 하나로 합칩니다.
+* plotly.express의 OLS 추세선(직선)은 양 끝점만 남깁니다.
+
+payload_bytes/check_budget으로 차트별 예산(FIGURE_BUDGETS)을 넘는지 확인하며,
+사전 계산 CLI는 예산을 넘는 그림이 있으면 빌드를 중단합니다.
+compact_figure는 PAYLOAD_SAMPLE_EVERY번에 한 번 직렬화 크기를 재어 whr_figure_payload_bytes 지표(whr/metrics.py)에 더합니다.
+"""
+import base64
+import itertools
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from whr.metrics import BYTES_BUCKETS, REGISTRY
+
+# 차트 이름별 페이로드 예산 (바이트)
+FIGURE_BUDGETS = {
+    'hist': 5_000,
+    'map': 8_000,
+    'bar': 8_000,
+    # 상관성 페이지 '전체 데이터' 산점도 (요인 하나, 모든 국가-연도 점과 국가별 추세선)
+    'scatter': 80_000,
+    # pages/01 연도별 추이 (전체 평균과 5개국, 모든 지표)
+    'trend': 40_000,
+}
+DEFAULT_BUDGET = 100_000
+DEFAULT_PRECISION = 4
+# 이보다 짧은 숫자 배열은 JSON 그대로가 더 작으므로 바꾸지 않습니다.
+MIN_ARRAY_LENGTH = 8
+# 모든 값이 같으면 스칼라로 합치는 속성 (Plotly에서 배열과 스칼라를 모두 받는 속성만)
+CONSTANT_KEYS = {'color', 'symbol', 'size', 'opacity', 'width', 'dash', 'hovertext', 'text'}
+# 페이로드 크기 측정(직렬화 한 번)은 이 횟수마다 한 번만 합니다 (0이면 측정하지 않음).
+PAYLOAD_SAMPLE_EVERY = int(os.environ.get('WHR_PAYLOAD_SAMPLE_EVERY', 10))
+_compactions = itertools.count()
+
+
+def _compact_array(values, precision):
+    """숫자 배열이면 반올림·다운캐스트한 배열을, 아니면 None을 반환합니다."""
+    try:
+        array = np.asarray(values)
+    except ValueError:
+        return None
+    if array.ndim == 0 or array.size < MIN_ARRAY_LENGTH or array.dtype.kind not in 'iuf':
+        return None
+    if array.dtype.kind == 'f':
+        finite = np.isfinite(array)
+        if finite.all() and np.array_equal(array, np.round(array)):
+            array = array.astype(np.int64)
+        else:
+            return np.round(array, precision).astype(np.float32)
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if array.min() >= info.min and array.max() <= info.max:
+            return array.astype(dtype)
+    return array
+
+
+def _decode_typed_array(node):
+    """Plotly 타입 배열 표현({"dtype", "bdata", "shape"})을 numpy 배열로 되돌립니다."""
+    array = np.frombuffer(base64.b64decode(node['bdata']), dtype=node['dtype'])
+    if 'shape' in node:
+        shape = node['shape']
+        array = array.reshape([int(n) for n in shape.split(',')] if isinstance(shape, str) else shape)
+    return array
+
+
+def _compact_node(node, precision, key=None):
+    if isinstance(node, dict) and 'bdata' in node and 'dtype' in node:
+        node = _decode_typed_array(node)
+    if isinstance(node, dict):
+        return {k: _compact_node(v, precision, k) for k, v in node.items()}
+    if isinstance(node, (list, tuple, np.ndarray)):
+        compact = _compact_array(node, precision)
+        if compact is not None:
+            return compact
+        values = list(node)
+        if (key in CONSTANT_KEYS and len(values) > 1 and not isinstance(values[0], (list, dict))
+                and all(value == values[0] for value in values)):
+            return values[0]
+        return node
+    return node
+
+
+def _drop_unused_hover(trace):
+    hovertemplate = trace.get('hovertemplate') or ''
+    if 'customdata' in trace and 'customdata' not in hovertemplate:
+        del trace['customdata']
+    return trace
+
+
+def _thin_trendline(trace):
+    """px의 trendline='ols' 직선 트레이스는 x 정렬 순서의 양 끝점만 남깁니다."""
+    if trace.get('mode') != 'lines' or 'trendline' not in (trace.get('hovertemplate') or ''):
+        return trace
+    x, y = trace.get('x'), trace.get('y')
+    if isinstance(x, np.ndarray) and isinstance(y, np.ndarray) and len(x) > 2 and len(x) == len(y):
+        order = np.argsort(x, kind='stable')
+        ends = order[[0, -1]]
+        trace['x'], trace['y'] = x[ends], y[ends]
+    return trace
+
+
+def compact_figure(fig, precision=DEFAULT_PRECISION):
+    """그림 fig(go.Figure 또는 사양 dict)의 페이로드를 줄인 새 go.Figure를 반환합니다 (모양은 같음)."""
+    spec = fig.to_plotly_json() if isinstance(fig, go.Figure) else dict(fig)
+    data = [_thin_trendline(_drop_unused_hover(_compact_node(dict(trace), precision))) for trace in spec.get('data', [])]
+    layout = dict(spec.get('layout', {}))
+    template = layout.get('template')
+    if template is None:
+        template = pio.templates[pio.templates.default]
+    template = template.to_plotly_json() if hasattr(template, 'to_plotly_json') else dict(template)
+    used_types = {trace.get('type', 'scatter') for trace in data}
+    template['data'] = {kind: value for kind, value in template.get('data', {}).items() if kind in used_types}
+    layout['template'] = template
+    compact = go.Figure({'data': data, 'layout': layout, 'frames': spec.get('frames', [])}, skip_invalid=True)
+    if PAYLOAD_SAMPLE_EVERY and next(_compactions) % PAYLOAD_SAMPLE_EVERY == 0:
+        # 트레이스 종류(예: 'scatter', 'bar')를 차트 레이블로 씁니다 (제목은 값이 너무 다양함).
+        chart = '+'.join(sorted(used_types)) or 'empty'
+        REGISTRY.observe('whr_figure_payload_bytes', payload_bytes(compact), BYTES_BUCKETS,
+                         '그림 페이로드 크기 (바이트, 표본)', chart=chart)
+    return compact
+
+
+def payload_bytes(fig):
+    """st.plotly_chart가 보내는 것과 같은 방식으로 직렬화한 JSON의 바이트 수."""
+    return len(pio.to_json(fig, validate=False).encode('utf-8'))
+
+
+def check_budget(fig, name, budget=None):
+    """그림 페이로드가 예산을 넘으면 ValueError를 발생시키고, 넘지 않으면 바이트 수를 반환합니다."""
+    budget = FIGURE_BUDGETS.get(name, DEFAULT_BUDGET) if budget is None else budget
+    size = payload_bytes(fig)
+    if size > budget:
+        raise ValueError(f"'{name}' 그림 페이로드 {size:,}바이트가 예산 {budget:,}바이트를 넘습니다.")
+    return size
@@ -0,0 +1,161 @@
+"""
+요인별 상관계수에 대한 일괄 순열 검정(permutation test)과 다중검정 보정(FDR).
+
+* 국가별 검정: 각 국가 안에서 연도 간 관대함 지수를 무작위로 섞어, 모든 요인 × 모든 국가의
+  순열 상관계수를 (순열 수, 요인 수, 국가 수) 배열로 한 번에 계산합니다.
+  요인마다 요인과 관대함 지수가 모두 있는 칸끼리만 섞습니다 (상관계수에 쓰이는 표본과 같은 칸).
+* 전체(pooled) 검정: 국가 단위 블록 순열입니다. 국가마다 관대함 지수의 연도 계열 전체를 다른 국가에 통째로 옮기고
+  (연도는 그대로), 옮긴 계열과 요인이 모두 있는 칸으로 전체 상관계수를 다시 계산합니다.
+  국가-연도 행은 약 165개 국가에 묶여 있어 행 단위로 섞으면 서로 독립인 표본처럼 다루게 되어 p 값이 지나치게 작아집니다.
+  블록 순열은 국가 안의 연도 간 의존성과 연도별 공통 추세를 그대로 두고 국가 간 대응만 끊으므로,
+  영가설은 '국가의 관대함 지수 계열이 그 국가의 요인 계열과 무관하다(국가끼리 교환 가능)'입니다.
+  부트스트랩 신뢰구간(whr/bootstrap.py)과 같은 국가 단위 군집 구조를 가정합니다.
+* p 값은 (1 + |r_perm| >= |r_obs| 인 횟수) / (1 + 순열 수)이며,
+  요인마다 국가들에 대해(전체 검정은 요인들에 대해) Benjamini-Hochberg q 값을 계산합니다.
+"""
+import numpy as np
+import pandas as pd
+
+from whr.artifacts import load_or_build, open_arrays, save_arrays
+from whr.corr import corr_from_moments
+from whr.data import dense_panel
+
+DEFAULT_PERMUTATIONS = 999
+CHUNK_SIZE = 100
+
+
+class PermutationResult:
+    """r, p, q는 (요인 수, 국가 수) 배열, pooled_*는 (요인 수,) 배열입니다."""
+
+    def __init__(self, factors, countries, n, r, p, q, pooled_r, pooled_p, pooled_q, n_permutations):
+        self.factors = list(factors)
+        self.countries = np.asarray(countries)
+        self.n = n
+        self.r, self.p, self.q = r, p, q
+        self.pooled_r, self.pooled_p, self.pooled_q = pooled_r, pooled_p, pooled_q
+        self.n_permutations = n_permutations
+
+    def has(self, factor):
+        return factor in self.factors
+
+    def country_table(self, factor):
+        """요인 하나의 국가별 (관측치 수, 상관계수, p 값, q 값) 표. 상관계수를 계산할 수 없는 국가는 제외합니다."""
+        i = self.factors.index(factor)
+        table = pd.DataFrame({'Country': self.countries, 'n': self.n[i], 'Correlation': self.r[i],
+                              'p_value': self.p[i], 'q_value': self.q[i]})
+        return table.dropna(subset=['Correlation']).reset_index(drop=True)
+
+    def pooled(self, factor):
+        """요인 하나의 (전체 상관계수, p 값, q 값)."""
+        i = self.factors.index(factor)
+        return self.pooled_r[i], self.pooled_p[i], self.pooled_q[i]
+
+
+def bh_adjust(pvalues, axis=-1):
+    """Benjamini-Hochberg FDR 보정 q 값. NaN은 검정 개수에서 제외하고 NaN으로 둡니다."""
+    p = np.moveaxis(np.asarray(pvalues, dtype=float), axis, -1)
+    finite = np.isfinite(p)
+    m = finite.sum(axis=-1, keepdims=True)
+    order = np.argsort(np.where(finite, p, np.inf), axis=-1)
+    sorted_p = np.take_along_axis(p, order, axis=-1)
+    ranks = np.arange(1, p.shape[-1] + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = np.where(ranks <= m, sorted_p * m / ranks, np.nan)
+    # 뒤에서부터 누적 최솟값 (NaN은 무시)
+    scaled = np.fmin.accumulate(scaled[..., ::-1], axis=-1)[..., ::-1]
+    q = np.empty_like(scaled)
+    np.put_along_axis(q, order, np.minimum(scaled, 1.0), axis=-1)
+    q[~finite] = np.nan
+    return np.moveaxis(q, -1, axis)
+
+
+def _masked_moments(mask, x, y):
+    """
+    x: (요인 수, 국가 수, 연도 수), mask: x와 같은 모양이거나 앞에 순열 축이 붙은 모양,
+    y: (순열 수, 요인 수 또는 1, 국가 수, 연도 수)
+    -> (순열 수, 요인 수, 국가 수, 6) 충분통계량.
+    """
+    mx = mask * x
+    my = mask * y
+    shape = my.shape[:3]
+    ones = np.broadcast_to(mask.sum(axis=-1), shape)
+    sx = np.broadcast_to(mx.sum(axis=-1), shape)
+    sxx = np.broadcast_to((mx * x).sum(axis=-1), shape)
+    return np.stack([ones, sx, my.sum(axis=-1), sxx, (my * y).sum(axis=-1), (my * x).sum(axis=-1)], axis=-1)
+
+
+def _permute_within(y, valid, size, rng):
+    """
+    마지막 축(연도) 안에서 valid 칸끼리만 y 값을 섞은 (size,) + valid.shape 배열. 나머지 칸은 0입니다.
+    valid는 요인별 (x, y 모두 있는 칸) 마스크이므로, 요인이 없는 칸의 관대함 지수는 섞이지 않습니다.
+    """
+    keys = rng.random((size,) + valid.shape)
+    keys[:, ~valid] = np.inf
+    source = np.argsort(keys, axis=-1)
+    # 유효한 칸을 앞쪽(위치 순)으로 모은 목적지 인덱스
+    target = np.broadcast_to(np.argsort(~valid, axis=-1, kind='stable'), source.shape)
+    permuted = np.zeros_like(keys)
+    np.put_along_axis(permuted, target, np.take_along_axis(np.broadcast_to(y, keys.shape), source, axis=-1), axis=-1)
+    permuted[:, ~valid] = 0.0
+    return permuted
+
+
+def permutation_tests(df, factors, n_permutations=DEFAULT_PERMUTATIONS, seed=0):
+    """화면 표시용 컬럼명을 가진 DataFrame으로 모든 요인의 국가별/전체 순열 검정을 수행합니다."""
+    factors = [factor for factor in factors if factor in df.columns and factor != 'Generosity']
+    countries, _, panel = dense_panel(df, ['Generosity'] + factors)
+    y, x = panel[0], panel[1:]
+    valid = np.isfinite(x) & np.isfinite(y)
+    mask = valid.astype(float)
+    y0 = np.nan_to_num(y)
+    x0 = np.nan_to_num(x)
+    rng = np.random.default_rng(seed)
+
+    # 관측 상관계수
+    observed_moments = _masked_moments(mask, x0, y0[None, None])[0]
+    r_obs = corr_from_moments(observed_moments)
+    pooled_obs = corr_from_moments(observed_moments.sum(axis=1))
+
+    exceed = np.zeros_like(r_obs)
+    pooled_exceed = np.zeros_like(pooled_obs)
+    y_valid = np.isfinite(y)
+    x_valid = np.isfinite(x)
+    for start in range(0, n_permutations, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, n_permutations - start)
+        r_perm = corr_from_moments(_masked_moments(mask, x0, _permute_within(y0, valid, size, rng)))
+        with np.errstate(invalid='ignore'):
+            exceed += (np.abs(r_perm) >= np.abs(r_obs) - 1e-12).sum(axis=0)
+
+        # 국가 블록 순열: (순열 수, 국가 수) 순서로 관대함 지수 계열을 통째로 옮깁니다.
+        blocks = rng.permuted(np.broadcast_to(np.arange(len(countries)), (size, len(countries))), axis=1)
+        block_mask = (x_valid[None] & y_valid[blocks][:, None]).astype(float)
+        pooled_moments = _masked_moments(block_mask, x0, y0[blocks][:, None]).sum(axis=2)
+        with np.errstate(invalid='ignore'):
+            pooled_exceed += (np.abs(corr_from_moments(pooled_moments)) >= np.abs(pooled_obs) - 1e-12).sum(axis=0)
+
+    p = np.where(np.isfinite(r_obs), (1 + exceed) / (1 + n_permutations), np.nan)
+    pooled_p = np.where(np.isfinite(pooled_obs), (1 + pooled_exceed) / (1 + n_permutations), np.nan)
+    return PermutationResult(factors, countries, observed_moments[..., 0], r_obs, p, bh_adjust(p, axis=1),
+                             pooled_obs, pooled_p, bh_adjust(pooled_p), n_permutations)
+
+
+RESULT_ARRAYS = ['n', 'r', 'p', 'q', 'pooled_r', 'pooled_p', 'pooled_q']
+
+
+def save_results(result, out_dir):
+    """국가별/전체 검정 배열과 tests.json(요인, 국가, 순열 수)을 저장합니다 (whr.artifacts.save_arrays)."""
+    return save_arrays(out_dir, {name: getattr(result, name) for name in RESULT_ARRAYS}, 'tests.json', {
+        'factors': result.factors, 'countries': result.countries.tolist(),
+        'n_permutations': result.n_permutations,
+    })
+
+
+def open_results(tests_dir):
+    meta, arrays = open_arrays(tests_dir, RESULT_ARRAYS, 'tests.json')
+    return PermutationResult(meta['factors'], meta['countries'], *(arrays[name] for name in RESULT_ARRAYS),
+                             meta['n_permutations'])
+
+
+def load_results(df, factors):
+    """사전 계산된 permutation/ 결과, 없으면 df로 직접 수행한 검정 결과."""
+    return load_or_build('permutation', 'tests.json', open_results, lambda: permutation_tests(df, factors))
@@ -0,0 +1,219 @@
+"""
+사전 계산(precompute) CLI.
+
+processed_whr.csv로부터 분석 산출물 디렉터리(whr/artifacts.py 참고)를 빌드합니다.
+지표별 작업(순위표, 부트스트랩), 연도별 개요 탭 그림, 지역 집계 큐브, 순열 검정, 궤적 군집화, 국가별 예측, 빈 연도 채우기, 전년 대비 변화 표는 서로 독립적이므로
+프로세스 풀에 나누어 실행합니다. 워커는 스냅샷을 메모리 매핑으로 직접 열기 때문에
+DataFrame을 프로세스 간에 주고받지 않습니다. 작업이 하나라도 실패하면 임시 빌드 디렉터리를 지우고 오류를 그대로 냅니다.
+
+사용법:
+    python -m whr.precompute [--source processed_whr.csv] [--out artifacts] [--jobs N] [--force]
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from whr.artifacts import (ARTIFACT_ROOT, LATEST_FILE, MANIFEST_FILE, file_sha256, load_manifest,
+                           metric_slug, open_snapshot, write_json, write_snapshot)
+from whr.bootstrap import DEFAULT_RESAMPLES, bootstrap_correlations
+from whr.changes import build_changes
+from whr.changes import save_results as save_change_results
+from whr.clustering import cluster_trajectories
+from whr.clustering import save_results as save_cluster_results
+from whr.data import FACTOR_COLUMNS, METRIC_COLUMNS, SOURCE_CSV, read_source_csv, to_display
+from whr.forecast import forecast_generosity
+from whr.forecast import save_results as save_forecast_results
+from whr.impute import impute_panel
+from whr.impute import save_results as save_impute_results
+from whr.permutation import permutation_tests
+from whr.permutation import save_results as save_permutation_results
+from whr.ranks import RANK_SCOPES, column_ranks
+from whr.rollup import build_cube, save_cube
+
+
+def _open_display(version_dir):
+    return to_display(open_snapshot(version_dir))
+
+
+def _build_metric(version_dir, metric):
+    """지표 하나의 순위표(whr/ranks.py의 column_ranks)와 (요인이면) 부트스트랩 분포를 저장합니다."""
+    df = _open_display(version_dir)
+    slug = metric_slug(metric)
+    written = []
+
+    os.makedirs(os.path.join(version_dir, 'ranks'), exist_ok=True)
+    name = f'ranks/{slug}.npy'
+    np.save(os.path.join(version_dir, name), column_ranks(df, metric))
+    written.append(name)
+
+    if metric in FACTOR_COLUMNS:
+        # 요인별 작업이 이미 병렬로 돌고 있으므로 부트스트랩은 워커 안에서 단일 프로세스로 계산합니다.
+        os.makedirs(os.path.join(version_dir, 'bootstrap'), exist_ok=True)
+        name = f'bootstrap/{slug}.npy'
+        np.save(os.path.join(version_dir, name), bootstrap_correlations(df, metric, DEFAULT_RESAMPLES, n_jobs=1))
+        written.append(name)
+    return written
+
+
+def _build_year(version_dir, year):
+    """연도 하나의 개요 탭 그림을 저장합니다."""
+    from whr.aggregate import overview_aggregates
+    from whr.figures import overview_bar, overview_histogram, overview_map
+    from whr.payload import check_budget
+
+    df = _open_display(version_dir)
+    label = str(int(year))
+    df_year = df[df['Year'] == year]
+    written = []
+
+    fig_dir = os.path.join(version_dir, 'figures', label)
+    os.makedirs(fig_dir, exist_ok=True)
+    # main.py의 개요 탭과 같은 컬럼 구성으로 그립니다.
+    overview = overview_aggregates(df_year[['Country', 'Generosity', 'Year', 'iso_alpha']])
+    figures = {
+        'hist': overview_histogram(overview.bins),
+        'map': overview_map(overview.countries),
+        'bar': overview_bar(overview.countries, label),
+    }
+    for kind, fig in figures.items():
+        if fig is None:
+            continue
+        # 페이로드 예산을 넘는 그림이 있으면 빌드를 중단합니다.
+        check_budget(fig, kind)
+        name = f'figures/{label}/{kind}.json'
+        fig.write_json(os.path.join(version_dir, name))
+        written.append(name)
+    return written
+
+
+def _build_rollup(version_dir):
+    """지역 × 연도 × 지표 집계 큐브를 저장합니다."""
+    cube = build_cube(_open_display(version_dir))
+    return [f'rollup/{name}' for name in save_cube(cube, os.path.join(version_dir, 'rollup'))]
+
+
+def _build_permutation(version_dir):
+    """모든 요인의 국가별/전체 순열 검정 결과를 저장합니다."""
+    result = permutation_tests(_open_display(version_dir), FACTOR_COLUMNS)
+    return [f'permutation/{name}' for name in save_permutation_results(result, os.path.join(version_dir, 'permutation'))]
+
+
+def _build_clusters(version_dir):
+    """관대함 지수 궤적의 군집 수별 k-평균 군집화 결과를 저장합니다."""
+    result = cluster_trajectories(_open_display(version_dir))
+    return [f'clusters/{name}' for name in save_cluster_results(result, os.path.join(version_dir, 'clusters'))]
+
+
+def _build_forecast(version_dir):
+    """모든 국가의 관대함 지수 예측(모형별)과 홀드아웃 오차를 저장합니다."""
+    result = forecast_generosity(_open_display(version_dir))
+    return [f'forecast/{name}' for name in save_forecast_results(result, os.path.join(version_dir, 'forecast'))]
+
+
+def _build_impute(version_dir):
+    """모든 지표의 빈 국가-연도 칸을 방법별로 채운 패널을 저장합니다."""
+    panel = impute_panel(_open_display(version_dir))
+    return [f'impute/{name}' for name in save_impute_results(panel, os.path.join(version_dir, 'impute'))]
+
+
+def _build_changes(version_dir):
+    """모든 지표의 전년 대비 변화, 이동 평균, 자기 이력 대비 z-점수 표를 저장합니다."""
+    changes = build_changes(_open_display(version_dir))
+    return [f'changes/{name}' for name in save_change_results(changes, os.path.join(version_dir, 'changes'))]
+
+
+def _build_version(source, sha256, version_dir, jobs=None):
+    """version_dir에 스냅샷, manifest와 모든 산출물을 씁니다. 만든 파일 목록(version_dir 기준 상대 경로)을 반환합니다."""
+    df = read_source_csv(source)
+    stat = os.stat(source)
+    manifest = {
+        'version': sha256[:12],
+        'source': {'path': os.path.basename(source), 'sha256': sha256,
+                   'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns},
+        'rows': len(df),
+        'columns': write_snapshot(df, version_dir),
+    }
+    display = to_display(df)
+    years = sorted(int(y) for y in display['Year'].dropna().unique())
+    manifest.update({
+        'countries': sorted(display['Country'].dropna().unique().tolist()),
+        'years': years,
+        'metrics': {metric: metric_slug(metric) for metric in METRIC_COLUMNS},
+        'rank_scopes': RANK_SCOPES,
+        'bootstrap_resamples': DEFAULT_RESAMPLES,
+    })
+    # 워커가 스냅샷을 열 수 있도록 manifest를 먼저 기록합니다.
+    write_json(os.path.join(version_dir, MANIFEST_FILE), manifest)
+
+    files = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_build_metric, version_dir, metric) for metric in METRIC_COLUMNS]
+        futures += [pool.submit(_build_year, version_dir, year) for year in years]
+        futures.append(pool.submit(_build_rollup, version_dir))
+        futures.append(pool.submit(_build_permutation, version_dir))
+        futures.append(pool.submit(_build_clusters, version_dir))
+        futures.append(pool.submit(_build_forecast, version_dir))
+        futures.append(pool.submit(_build_impute, version_dir))
+        futures.append(pool.submit(_build_changes, version_dir))
+        try:
+            for future in as_completed(futures):
+                files.extend(future.result())
+        except BaseException:
+            # 아직 시작하지 않은 작업은 취소하고, 실행 중인 작업이 끝난 뒤 호출한 쪽에서 디렉터리를 지웁니다.
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    manifest['files'] = sorted(files)
+    write_json(os.path.join(version_dir, MANIFEST_FILE), manifest)
+    return files
+
+
+def build(source=SOURCE_CSV, out_root=ARTIFACT_ROOT, jobs=None, force=False, log=print):
+    """산출물 디렉터리를 빌드하고 ``LATEST``를 갱신합니다. 빌드된 버전 디렉터리 경로를 반환합니다."""
+    started = time.perf_counter()
+    sha256 = file_sha256(source)
+    version = sha256[:12]
+    version_dir = os.path.join(out_root, version)
+    os.makedirs(out_root, exist_ok=True)
+
+    if os.path.isfile(os.path.join(version_dir, MANIFEST_FILE)) and not force:
+        log(f"버전 {version} 산출물이 이미 있습니다. (--force로 다시 빌드)")
+    else:
+        tmp_dir = os.path.join(out_root, f'.{version}.tmp-{os.getpid()}')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            files = _build_version(source, sha256, tmp_dir, jobs)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.replace(tmp_dir, version_dir)
+        log(f"버전 {version} 산출물 {len(files)}개 파일 생성 ({time.perf_counter() - started:.1f}초)")
+
+    latest_tmp = os.path.join(out_root, f'.{LATEST_FILE}.tmp-{os.getpid()}')
+    with open(latest_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(out_root, LATEST_FILE))
+    return version_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="processed_whr.csv로부터 대시보드 분석 산출물을 미리 계산합니다.")
+    parser.add_argument('--source', default=SOURCE_CSV, help="원본 CSV 경로 (기본값: %(default)s)")
+    parser.add_argument('--out', default=ARTIFACT_ROOT, help="산출물 루트 디렉터리 (기본값: %(default)s)")
+    parser.add_argument('--jobs', type=int, default=None, help="프로세스 풀 워커 수 (기본값: CPU 코어 수)")
+    parser.add_argument('--force', action='store_true', help="같은 버전이 있어도 다시 빌드합니다.")
+    args = parser.parse_args(argv)
+    version_dir = build(args.source, args.out, args.jobs, args.force)
+    manifest = load_manifest(version_dir)
+    print(f"{version_dir}: {manifest['rows']}행, {len(manifest['countries'])}개국, {len(manifest['years'])}개 연도")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
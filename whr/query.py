@@ -0,0 +1,456 @@
+"""
+메모리보다 큰 데이터셋(지역 단위, 응답자 단위 추출본 등)용 청크 단위 쿼리 백엔드.
+
+데이터셋 디렉터리 구조 (``write_dataset``/``convert_csv``로 생성):
+
+* ``dataset.json``          - 행 수, 컬럼 스펙(숫자/범주, 범주 목록), 파트 목록과 파트별 존 맵(컬럼별 최솟값/최댓값)
+* ``part-<번호>/<i>.npy``    - 파트(행 묶음)별 컬럼 배열. 문자열 컬럼은 정수 코드(int32, 결측 -1)로 저장합니다.
+
+쿼리는 파트를 하나씩 메모리 매핑으로 열어 처리합니다.
+
+* 조건(predicate) 푸시다운: 존 맵으로 조건을 만족할 수 없는 파트는 열지 않고 건너뛰며,
+  조건 컬럼을 먼저 읽어 마스크를 만든 뒤 필요한 컬럼만 그 행들로 읽습니다.
+* 집계는 파트마다 충분통계량(개수, 합, 제곱합, 교차곱)만 누적하므로 메모리 사용량은 파트 크기와 그룹 수에만 비례합니다.
+
+``FrameSource``는 같은 인터페이스로 메모리의 DataFrame을 감싸므로, 같은 쿼리 함수를
+작은 CSV(pandas 경로)와 큰 데이터셋(청크 경로)에 모두 쓸 수 있습니다. 벤치마크는 whr/querybench.py를 참고하세요.
+
+앱은 ``app_source``로 소스를 엽니다. ``WHR_SOURCE`` 환경 변수에 데이터셋 디렉터리나 사전 계산 산출물 디렉터리를 주면
+개요 탭 집계(``overview``)와 상관성 페이지의 피어슨 상관계수(``pair_moments``)를 그 데이터셋에서 청크 단위로 계산하고,
+없으면 앱이 읽은 DataFrame을 ``FrameSource``로 감싸 씁니다.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from whr.aggregate import DEFAULT_BINS, HistogramBins, OverviewAggregates, nice_bin_width
+from whr.artifacts import read_json, write_json
+from whr.corr import group_moments
+from whr.data import RAW_TO_DISPLAY
+
+DATASET_FILE = 'dataset.json'
+SOURCE_ENV = 'WHR_SOURCE'
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+class Predicate:
+    """
+    컬럼 하나에 대한 조건. low/high는 양 끝을 포함하는 범위, values는 허용 값 목록입니다.
+    범주 컬럼의 values는 문자열로 주면 소스가 코드로 바꿉니다.
+    """
+
+    def __init__(self, column, low=None, high=None, values=None):
+        self.column = column
+        self.low = low
+        self.high = high
+        self.values = values
+
+    def mask(self, array):
+        keep = np.ones(len(array), dtype=bool)
+        if self.low is not None:
+            keep &= array >= self.low
+        if self.high is not None:
+            keep &= array <= self.high
+        if self.values is not None:
+            keep &= np.isin(array, self.values)
+        return keep
+
+    def may_match(self, zone):
+        """존 맵 (최솟값, 최댓값)으로 보아 이 범위에 조건을 만족하는 행이 있을 수 있으면 True."""
+        if zone is None:
+            return True
+        lo, hi = zone
+        if lo is None:
+            return False
+        if self.low is not None and hi < self.low:
+            return False
+        if self.high is not None and lo > self.high:
+            return False
+        if self.values is not None:
+            values = np.asarray(self.values)
+            return bool(((values >= lo) & (values <= hi)).any())
+        return True
+
+
+def eq(column, value):
+    return Predicate(column, values=[value])
+
+
+def between(column, low=None, high=None):
+    return Predicate(column, low=low, high=high)
+
+
+def isin(column, values):
+    return Predicate(column, values=list(values))
+
+
+def _zone(array, category=False):
+    """배열의 (최솟값, 최댓값). 범주 코드는 결측(-1)을, 실수는 NaN을 뺍니다. 유효한 값이 없으면 (None, None)."""
+    if category:
+        finite = array[array >= 0]
+    elif array.dtype.kind == 'f':
+        finite = array[np.isfinite(array)]
+    elif array.dtype.kind in 'iub':
+        finite = array
+    else:
+        return (None, None)
+    if finite.size == 0:
+        return (None, None)
+    lo, hi = finite.min(), finite.max()
+    return (lo.item(), hi.item())
+
+
+class _Part:
+    """파트 하나: 컬럼 이름 -> 배열을 돌려주는 load, 행 수, 컬럼별 존 맵."""
+
+    def __init__(self, load, rows, zones):
+        self.load = load
+        self.rows = rows
+        self.zones = zones
+
+
+class _Source:
+    """ColumnStore/FrameSource 공통 부분. 하위 클래스는 self.columns(컬럼 스펙), self.parts(_Part 목록)를 채웁니다."""
+
+    skipped_parts = 0
+
+    @property
+    def rows(self):
+        return sum(part.rows for part in self.parts)
+
+    def is_category(self, column):
+        return self.columns[column]['kind'] == 'category'
+
+    def categories(self, column):
+        return np.asarray(self.columns[column]['categories'] + [None], dtype=object)
+
+    def decode(self, column, codes):
+        """범주 컬럼의 코드 배열을 문자열 배열로 되돌립니다 (-1은 None)."""
+        return self.categories(column)[np.asarray(codes)]
+
+    def rename(self, mapping):
+        """컬럼 이름을 mapping(원래 이름 -> 새 이름)대로 바꾸고 이 소스를 반환합니다 (배열은 그대로, 없는 이름은 유지)."""
+        original = {mapping.get(column, column): column for column in self.columns}
+        self.columns = {mapping.get(column, column): spec for column, spec in self.columns.items()}
+        self.parts = [_Part(lambda column, load=part.load: load(original[column]), part.rows,
+                            {mapping.get(column, column): zone for column, zone in part.zones.items()})
+                      for part in self.parts]
+        return self
+
+    def _resolve(self, predicate):
+        if predicate.values is None or not self.is_category(predicate.column):
+            return predicate
+        lookup = {name: code for code, name in enumerate(self.columns[predicate.column]['categories'])}
+        codes = [lookup[value] if isinstance(value, str) else value for value in predicate.values
+                 if not isinstance(value, str) or value in lookup]
+        return Predicate(predicate.column, predicate.low, predicate.high, codes)
+
+    def chunks(self, columns, where=(), chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        조건 where를 만족하는 행의 columns 배열을 {컬럼: 배열} 청크로 차례대로 반환합니다.
+        범주 컬럼은 코드 배열입니다. 존 맵으로 걸러진 파트 수는 skipped_parts에 누적됩니다.
+        """
+        where = [self._resolve(predicate) for predicate in where]
+        for part in self.parts:
+            if not all(predicate.may_match(part.zones.get(predicate.column)) for predicate in where):
+                self.skipped_parts += 1
+                continue
+            arrays = {}
+            for start in range(0, part.rows, chunk_rows):
+                stop = min(start + chunk_rows, part.rows)
+                keep = None
+                for predicate in where:
+                    if predicate.column not in arrays:
+                        arrays[predicate.column] = part.load(predicate.column)
+                    mask = predicate.mask(np.asarray(arrays[predicate.column][start:stop]))
+                    keep = mask if keep is None else keep & mask
+                if keep is not None and not keep.any():
+                    continue
+                chunk = {}
+                for column in columns:
+                    if column not in arrays:
+                        arrays[column] = part.load(column)
+                    values = np.asarray(arrays[column][start:stop])
+                    chunk[column] = values if keep is None else values[keep]
+                yield chunk
+
+
+class ColumnStore(_Source):
+    """dataset.json이 있는 데이터셋 디렉터리(또는 사전 계산 산출물의 스냅샷)를 메모리 매핑으로 엽니다."""
+
+    def __init__(self, dataset_dir):
+        self.dataset_dir = dataset_dir
+        meta = read_json(os.path.join(dataset_dir, DATASET_FILE))
+        self.columns = meta['columns']
+        self.parts = [self._part(os.path.join(dataset_dir, part['name']), part['rows'],
+                                 {column: tuple(zone) for column, zone in part['zones'].items()})
+                      for part in meta['parts']]
+
+    def _part(self, part_dir, rows, zones):
+        files = {column: spec['file'] for column, spec in self.columns.items()}
+
+        def load(column):
+            return np.load(os.path.join(part_dir, files[column]), mmap_mode='r')
+        return _Part(load, rows, zones)
+
+    @classmethod
+    def from_snapshot(cls, version_dir, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        사전 계산 산출물(whr/artifacts.py)의 snapshot/을 데이터셋으로 엽니다.
+        스냅샷은 파트가 하나이므로 chunk_rows 행마다 가상 파트로 나누고 존 맵은 열 때 계산합니다.
+        """
+        manifest = read_json(os.path.join(version_dir, 'manifest.json'))
+        store = cls.__new__(cls)
+        store.dataset_dir = version_dir
+        store.columns = manifest['columns']
+        snapshot_dir = os.path.join(version_dir, 'snapshot')
+        arrays = {column: np.load(os.path.join(snapshot_dir, spec['file']), mmap_mode='r')
+                  for column, spec in store.columns.items()}
+        rows = len(next(iter(arrays.values()))) if arrays else 0
+        store.parts = []
+        for start in range(0, rows, chunk_rows):
+            stop = min(start + chunk_rows, rows)
+            zones = {column: _zone(np.asarray(array[start:stop]), store.is_category(column))
+                     for column, array in arrays.items()}
+            store.parts.append(_Part(lambda column, a=start, b=stop: arrays[column][a:b], stop - start, zones))
+        return store
+
+
+class FrameSource(_Source):
+    """메모리의 DataFrame을 ColumnStore와 같은 인터페이스로 감쌉니다 (파트 하나, 문자열 컬럼은 코드로 변환)."""
+
+    def __init__(self, df):
+        self.columns = {}
+        arrays = {}
+        for column in df.columns:
+            values = df[column]
+            if pd.api.types.is_numeric_dtype(values):
+                arrays[column] = values.to_numpy()
+                self.columns[column] = {'kind': 'numeric', 'dtype': str(arrays[column].dtype)}
+            else:
+                codes, categories = pd.factorize(values, sort=True)
+                arrays[column] = codes.astype(np.int32)
+                self.columns[column] = {'kind': 'category', 'categories': [str(c) for c in categories]}
+        zones = {column: _zone(array, self.is_category(column)) for column, array in arrays.items()}
+        self.parts = [_Part(arrays.__getitem__, len(df), zones)]
+
+
+def write_dataset(frames, out_dir):
+    """
+    DataFrame 청크들(이터러블)을 데이터셋 디렉터리로 저장합니다. 청크 하나가 파트 하나가 됩니다.
+    문자열 컬럼의 코드는 모든 파트에서 같도록 처음 나온 순서로 부여합니다. dataset.json 경로를 반환합니다.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    columns, lookups, parts = {}, {}, []
+    for index, frame in enumerate(frames):
+        part_name = f'part-{index:05d}'
+        part_dir = os.path.join(out_dir, part_name)
+        os.makedirs(part_dir, exist_ok=True)
+        zones = {}
+        for i, column in enumerate(frame.columns):
+            values = frame[column]
+            if column not in columns:
+                kind = 'numeric' if pd.api.types.is_numeric_dtype(values) else 'category'
+                columns[column] = {'file': f'{i:02d}.npy', 'kind': kind}
+                if kind == 'category':
+                    lookups[column] = {}
+            if columns[column]['kind'] == 'category':
+                lookup = lookups[column]
+                local, uniques = pd.factorize(values)
+                global_codes = np.asarray([lookup.setdefault(str(value), len(lookup)) for value in uniques] + [-1],
+                                          dtype=np.int32)
+                array = global_codes[local]
+            else:
+                array = values.to_numpy()
+                columns[column]['dtype'] = str(array.dtype)
+            np.save(os.path.join(part_dir, columns[column]['file']), array)
+            zones[column] = _zone(array, columns[column]['kind'] == 'category')
+        parts.append({'name': part_name, 'rows': len(frame), 'zones': zones})
+    for column, lookup in lookups.items():
+        columns[column]['categories'] = list(lookup)
+    path = os.path.join(out_dir, DATASET_FILE)
+    write_json(path, {'rows': sum(part['rows'] for part in parts), 'columns': columns, 'parts': parts})
+    return path
+
+
+def convert_csv(csv_path, out_dir, chunk_rows=DEFAULT_CHUNK_ROWS, **read_csv_kwargs):
+    """CSV를 chunk_rows 행씩 읽어 데이터셋 디렉터리로 변환합니다 (CSV 전체를 메모리에 올리지 않음)."""
+    return write_dataset(pd.read_csv(csv_path, chunksize=chunk_rows, **read_csv_kwargs), out_dir)
+
+
+def open_source(source):
+    """DataFrame, 데이터셋 디렉터리(dataset.json), 사전 계산 산출물 디렉터리(manifest.json) 중 하나를 소스로 엽니다."""
+    if isinstance(source, pd.DataFrame):
+        return FrameSource(source)
+    if os.path.isfile(os.path.join(source, DATASET_FILE)):
+        return ColumnStore(source)
+    if os.path.isfile(os.path.join(source, 'manifest.json')):
+        return ColumnStore.from_snapshot(source)
+    raise FileNotFoundError(f"데이터셋을 찾을 수 없습니다: {source}")
+
+
+def app_source(df, source=None):
+    """
+    앱의 쿼리 소스. source(기본값: WHR_SOURCE 환경 변수)가 있으면 open_source로 열어 원본 컬럼명을 화면 표시용
+    컬럼명(whr.data.RAW_TO_DISPLAY)으로 바꾸고, 없으면 화면 표시용 컬럼명을 가진 df를 FrameSource로 감쌉니다.
+    """
+    source = os.environ.get(SOURCE_ENV) if source is None else source
+    if not source:
+        return FrameSource(df)
+    return open_source(source).rename(RAW_TO_DISPLAY)
+
+
+# --------------------
+# 쿼리 (파트별 충분통계량 누적)
+# --------------------
+def count(source, where=()):
+    """조건을 만족하는 행 수."""
+    first = where[0].column if where else next(iter(source.columns))
+    return sum(len(chunk[first]) for chunk in source.chunks([first], where))
+
+
+def _group_sums(source, by, columns, where=()):
+    """by 컬럼별 columns의 (합, 유효 관측 수) DataFrame 두 개. 인덱스는 by 값(범주면 코드)이며, 행이 없으면 (None, None)."""
+    sums, counts = None, None
+    for chunk in source.chunks([by] + columns, where):
+        keys = chunk[by]
+        valid = keys >= 0 if source.is_category(by) else np.isfinite(keys.astype(float))
+        codes, uniques = pd.factorize(keys[valid])
+        part_sums, part_counts = {}, {}
+        for column in columns:
+            values = chunk[column][valid].astype(float)
+            finite = np.isfinite(values)
+            part_sums[column] = np.bincount(codes[finite], weights=values[finite], minlength=len(uniques))
+            part_counts[column] = np.bincount(codes[finite], minlength=len(uniques)).astype(float)
+        part_sums = pd.DataFrame(part_sums, index=uniques)
+        part_counts = pd.DataFrame(part_counts, index=uniques)
+        sums = part_sums if sums is None else sums.add(part_sums, fill_value=0)
+        counts = part_counts if counts is None else counts.add(part_counts, fill_value=0)
+    return sums, counts
+
+
+def _decoded(source, by, frame):
+    if source.is_category(by):
+        frame.index = source.decode(by, frame.index.to_numpy())
+    frame.index.name = by
+    return frame.sort_index()
+
+
+def group_mean(source, by, columns, where=()):
+    """
+    by 컬럼별 columns 평균 (pandas ``df[where].groupby(by)[columns].mean()``과 같음, NaN은 건너뜀).
+    반환값은 by 값(범주면 문자열)으로 정렬된 인덱스를 가진 DataFrame입니다.
+    """
+    columns = list(columns)
+    sums, counts = _group_sums(source, by, columns, where)
+    if sums is None:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name=by))
+    return _decoded(source, by, sums / counts.where(counts > 0))
+
+
+def overview(source, year=None, value_range=None, value='Generosity', by='Country', nbins=DEFAULT_BINS):
+    """
+    whr/aggregate.py의 overview_aggregates와 같은 개요 탭 집계 (국가별 평균 표 Country, value, Count와 히스토그램, 전체 평균).
+    year가 있으면 Year가 year인 행만, value_range=(하한, 상한)이면 그 범위(양 끝 포함)의 값만 씁니다.
+    국가별 합계와 히스토그램 구간만 누적하므로 원본 행 수와 무관한 메모리로 계산합니다. iso_alpha 컬럼은 붙이지 않습니다.
+    """
+    where = [] if year is None else [eq('Year', year)]
+    if value_range is not None:
+        where.append(between(value, *value_range))
+    sums, counts = _group_sums(source, by, [value], where)
+    if sums is None:
+        return OverviewAggregates(pd.DataFrame({by: [], value: [], 'Count': []}), histogram(source, value, nbins, where),
+                                  float('nan'))
+    table = _decoded(source, by, pd.DataFrame({value: sums[value], 'Count': counts[value]}))
+    table = table[table['Count'] > 0]
+    total = table['Count'].sum()
+    mean = float(table[value].sum() / total) if total else float('nan')
+    table[value] = table[value] / table['Count']
+    table['Count'] = table['Count'].astype(np.int64)
+    return OverviewAggregates(table.reset_index(), histogram(source, value, nbins, where), mean)
+
+
+def histogram(source, column, nbins=DEFAULT_BINS, where=()):
+    """
+    column의 히스토그램 (whr/aggregate.py의 histogram_bins와 같은 구간).
+    조건이 없으면 범위를 존 맵에서 바로 얻고, 있으면 범위를 구하는 패스를 한 번 더 돕니다.
+    """
+    if not where:
+        zones = [part.zones.get(column) for part in source.parts]
+        zones = [zone for zone in zones if zone and zone[0] is not None]
+        lo, hi = (min(z[0] for z in zones), max(z[1] for z in zones)) if zones else (None, None)
+    else:
+        lo, hi = None, None
+        for chunk in source.chunks([column], where):
+            values = chunk[column].astype(float)
+            values = values[np.isfinite(values)]
+            if values.size:
+                lo = values.min() if lo is None else min(lo, values.min())
+                hi = values.max() if hi is None else max(hi, values.max())
+    if lo is None:
+        return HistogramBins([0.0, 1.0], [0])
+    width = nice_bin_width(lo, hi, nbins)
+    start = np.floor(lo / width) * width
+    n_bins = int(np.floor((hi - start) / width)) + 1
+    counts = np.zeros(n_bins, dtype=np.int64)
+    for chunk in source.chunks([column], where):
+        values = chunk[column].astype(float)
+        values = values[np.isfinite(values)]
+        index = np.clip(np.floor((values - start) / width).astype(np.int64), 0, n_bins - 1)
+        counts += np.bincount(index, minlength=n_bins)
+    return HistogramBins(start + width * np.arange(n_bins + 1), counts)
+
+
+def corr_matrix(source, columns, where=()):
+    """
+    columns 간 피어슨 상관행렬 (pandas ``DataFrame.corr()``처럼 쌍마다 둘 다 관측된 행만 사용).
+    파트마다 관측 마스크 M과 0으로 채운 값 X로 MᵀM, XᵀM, (X²)ᵀM, XᵀX만 누적합니다.
+    """
+    columns = list(columns)
+    p = len(columns)
+    n = np.zeros((p, p))
+    sx = np.zeros((p, p))
+    sxx = np.zeros((p, p))
+    sxy = np.zeros((p, p))
+    for chunk in source.chunks(columns, where):
+        x = np.column_stack([chunk[column].astype(float) for column in columns])
+        mask = np.isfinite(x).astype(float)
+        x = np.nan_to_num(x, nan=0.0, posinf=0.0, neginf=0.0)
+        n += mask.T @ mask
+        sx += x.T @ mask
+        sxx += (x * x).T @ mask
+        sxy += x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var_x = sxx - sx * sx / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+    corr[n < 2] = np.nan
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def pair_moments(source, x, y='Generosity', by='Country', where=()):
+    """
+    by 그룹별 (x, y) 충분통계량 (whr/corr.py의 country_moments와 같은 형식: (그룹명 배열, (그룹 수, 6) 배열)).
+    전체(pooled) 상관계수는 corr_from_moments(moments.sum(axis=0)), 국가 내 상관계수는 corr_from_moments(moments)입니다.
+    """
+    codes_seen = None
+    moments = None
+    for chunk in source.chunks([by, x, y], where):
+        xs, ys, keys = chunk[x].astype(float), chunk[y].astype(float), chunk[by]
+        valid = np.isfinite(xs) & np.isfinite(ys)
+        if source.is_category(by):
+            valid &= keys >= 0
+            n_groups = len(source.columns[by]['categories'])
+            part = group_moments(xs[valid], ys[valid], keys[valid], n_groups)
+            moments = part if moments is None else moments + part
+            codes_seen = np.bincount(keys[valid], minlength=n_groups) if codes_seen is None else \
+                codes_seen + np.bincount(keys[valid], minlength=n_groups)
+        else:
+            raise ValueError(f"pair_moments의 by는 범주 컬럼이어야 합니다: {by}")
+    if moments is None:
+        return np.asarray([], dtype=object), np.zeros((0, 6))
+    present = np.flatnonzero(codes_seen)
+    names = source.decode(by, present)
+    order = np.argsort(names.astype(str), kind='stable')
+    return names[order], moments[present][order]
@@ -0,0 +1,143 @@
+"""
+쿼리 백엔드(whr/query.py) 벤치마크 CLI.
+
+응답자 단위 합성 데이터(국가 × 연도 × 응답자, 연도 순으로 정렬된 파트)를 데이터셋 디렉터리로 쓴 뒤,
+앱에서 쓰는 것과 같은 쿼리를 청크 경로(메모리 매핑 + 존 맵 푸시다운)와 pandas 경로(전체 DataFrame을 메모리에 올림)로
+각각 실행해 시간, 결과 차이, 최대 RSS를 비교합니다.
+
+* 연도 필터 + 국가별 평균 (대시보드 개요 탭)
+* 연도별 평균 (추이 그래프의 '전체 평균')
+* 연도 하나의 지표 간 상관행렬
+* 국가별 (요인, 관대함 지수) 충분통계량 -> 전체/국가 내 상관계수 (상관성 페이지)
+* 연도 하나의 관대함 지수 히스토그램
+
+사용법:
+    python -m whr.querybench [--rows 10000000] [--chunk-rows 1000000] [--out DIR] [--keep]
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from whr.aggregate import histogram_bins
+from whr.corr import corr_from_moments, country_moments
+from whr.query import (DEFAULT_CHUNK_ROWS, ColumnStore, corr_matrix, eq, group_mean, histogram, pair_moments,
+                       write_dataset)
+
+BENCH_METRICS = ['Generosity', 'Log GDP per capita', 'Social Support', 'Life Ladder']
+BENCH_YEARS = list(range(2005, 2024))
+BENCH_COUNTRIES = 165
+
+
+def synthetic_chunks(rows, chunk_rows, seed=0):
+    """연도 순으로 정렬된 응답자 단위 합성 데이터를 chunk_rows 행씩 만듭니다 (전체를 메모리에 올리지 않음)."""
+    rng = np.random.default_rng(seed)
+    countries = np.asarray([f'Country {i:03d}' for i in range(BENCH_COUNTRIES)], dtype=object)
+    country_gdp = rng.normal(9.5, 1.0, BENCH_COUNTRIES)
+    boundaries = np.linspace(0, rows, len(BENCH_YEARS) + 1).astype(np.int64)
+    for start in range(0, rows, chunk_rows):
+        stop = min(start + chunk_rows, rows)
+        n = stop - start
+        year = np.asarray(BENCH_YEARS)[np.searchsorted(boundaries, np.arange(start, stop), side='right') - 1]
+        country = rng.integers(0, BENCH_COUNTRIES, n)
+        gdp = country_gdp[country] + 0.02 * (year - BENCH_YEARS[0]) + rng.normal(0, 0.3, n)
+        support = 0.5 + 0.04 * gdp + rng.normal(0, 0.1, n)
+        ladder = 0.6 * gdp + rng.normal(0, 1.0, n)
+        generosity = 0.05 * (ladder - 5.5) + rng.normal(0, 0.15, n)
+        # 일부 응답은 결측 처리합니다.
+        generosity[rng.random(n) < 0.05] = np.nan
+        yield pd.DataFrame({'Country': countries[country], 'Year': year, 'Generosity': generosity,
+                            'Log GDP per capita': gdp, 'Social Support': support, 'Life Ladder': ladder})
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def _difference(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    if a.shape != b.shape:
+        return float('inf')
+    both = np.isfinite(a) & np.isfinite(b)
+    if (np.isfinite(a) != np.isfinite(b)).any():
+        return float('inf')
+    return float(np.abs(a[both] - b[both]).max()) if both.any() else 0.0
+
+
+def run(rows, chunk_rows, out_dir, log=print):
+    """벤치마크를 실행하고 (쿼리 이름, 청크 경로 초, pandas 경로 초, 최대 차이) 목록을 반환합니다."""
+    year = BENCH_YEARS[len(BENCH_YEARS) // 2]
+    factor = 'Log GDP per capita'
+
+    _, seconds = _timed(lambda: write_dataset(synthetic_chunks(rows, chunk_rows), out_dir))
+    size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(out_dir) for name in names)
+    log(f"데이터셋 작성: {rows:,}행, 파트 {-(-rows // chunk_rows)}개, {size / 2**20:,.0f}MB ({seconds:.1f}초)")
+
+    store = ColumnStore(out_dir)
+    chunked = {
+        '연도 필터 + 국가별 평균': lambda: group_mean(store, 'Country', ['Generosity'], [eq('Year', year)])['Generosity'],
+        '연도별 평균': lambda: group_mean(store, 'Year', BENCH_METRICS),
+        '연도 상관행렬': lambda: corr_matrix(store, BENCH_METRICS, [eq('Year', year)]),
+        '전체/국가 내 상관계수': lambda: (lambda m: np.append(corr_from_moments(m.sum(axis=0)),
+                                                          corr_from_moments(m)))(pair_moments(store, factor)[1]),
+        '연도 히스토그램': lambda: histogram(store, 'Generosity', where=[eq('Year', year)]).counts,
+    }
+    results = {}
+    for name, query in chunked.items():
+        results[name] = _timed(query)
+    chunked_rss = _max_rss_mb()
+    log(f"청크 경로 최대 RSS: {chunked_rss:,.0f}MB (존 맵으로 건너뛴 파트 {store.skipped_parts}개)")
+
+    df, load_seconds = _timed(lambda: pd.concat(synthetic_chunks(rows, chunk_rows), ignore_index=True))
+    log(f"pandas 경로 DataFrame 적재: {df.memory_usage(deep=True).sum() / 2**20:,.0f}MB ({load_seconds:.1f}초)")
+    in_memory = {
+        '연도 필터 + 국가별 평균': lambda: df[df['Year'] == year].groupby('Country')['Generosity'].mean(),
+        '연도별 평균': lambda: df.groupby('Year')[BENCH_METRICS].mean(),
+        '연도 상관행렬': lambda: df[df['Year'] == year][BENCH_METRICS].corr(),
+        '전체/국가 내 상관계수': lambda: (lambda m: np.append(corr_from_moments(m.sum(axis=0)),
+                                                          corr_from_moments(m)))(country_moments(df, factor)[1]),
+        '연도 히스토그램': lambda: histogram_bins(df.loc[df['Year'] == year, 'Generosity']).counts,
+    }
+    rows_out = []
+    for name, query in in_memory.items():
+        expected, pandas_seconds = _timed(query)
+        actual, chunk_seconds = results[name]
+        rows_out.append((name, chunk_seconds, pandas_seconds, _difference(actual, expected)))
+    log(f"pandas 경로 최대 RSS: {_max_rss_mb():,.0f}MB")
+
+    log(f"{'쿼리':<20}{'청크(초)':>10}{'pandas(초)':>12}{'최대 차이':>12}")
+    for name, chunk_seconds, pandas_seconds, diff in rows_out:
+        log(f"{name:<20}{chunk_seconds:>10.3f}{pandas_seconds:>12.3f}{diff:>12.2e}")
+    return rows_out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="청크 쿼리 백엔드와 pandas 경로의 쿼리 시간을 비교합니다.")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="합성 데이터 행 수 (기본값: %(default)s)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="파트당 행 수 (기본값: %(default)s)")
+    parser.add_argument('--out', default=None, help="데이터셋 디렉터리 (기본값: 임시 디렉터리)")
+    parser.add_argument('--keep', action='store_true', help="끝난 뒤 데이터셋 디렉터리를 지우지 않습니다.")
+    args = parser.parse_args(argv)
+    out_dir = args.out or tempfile.mkdtemp(prefix='whr-querybench-')
+    try:
+        run(args.rows, args.chunk_rows, out_dir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(out_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+순위 기반 상관계수(스피어만, 켄달)와 국가 내 상관계수 일괄 계산.
+
+* 순위표(rank_table)는 지표마다 국가 내(연도 간) 순위와 전체 순위를 한 번에 계산해 둡니다
+  (국가 내 스피어만 상관계수와 전체 스피어만 상관계수에 쓰는 두 범위).
+  데이터셋 버전마다 한 번만 만들면 되므로 페이지에서는 캐시해서 씁니다.
+* 스피어만 상관계수 = 순위에 대한 피어슨 상관계수이므로, 피어슨과 같은 충분통계량 경로(whr/corr.py)를 씁니다.
+* 켄달 타우-b는 Knight(1966)의 O(n log n) 알고리즘(정렬 + 역순 쌍 계수)으로 계산합니다.
+
+순위는 지표마다 그 지표와 관대함 지수가 모두 있는 행들 사이에서 (범위별로) 매기며, 동순위는 평균 순위를 씁니다.
+그래서 순위를 매긴 표본과 상관계수를 계산하는 표본이 항상 같습니다.
+사전 계산 CLI(whr/precompute.py)는 지표별 순위 배열(column_ranks)을 ``ranks/<지표>.npy``로 저장하고,
+load_rank_table은 최신 산출물이 있으면 그 배열을 메모리 매핑으로 씁니다.
+"""
+import numpy as np
+import pandas as pd
+
+from whr.artifacts import load_array, metric_slug
+from whr.corr import corr_from_moments, group_moments
+
+CORRELATION_METHODS = {'pearson': '피어슨', 'spearman': '스피어만', 'kendall': '켄달'}
+RANK_SCOPES = ['country', 'pooled']
+
+
+def column_ranks(df, column, y='Generosity'):
+    """
+    지표 하나의 범위별 순위 (len(RANK_SCOPES), 행 수, 2) 배열. [..., 0]은 지표의 순위, [..., 1]은 같은 행들 사이의 관대함 지수 순위입니다.
+    지표나 관대함 지수 중 하나라도 결측인 행은 순위를 매기지 않습니다 (NaN). 행 순서는 df와 같습니다.
+    """
+    x_values = pd.to_numeric(df[column], errors='coerce')
+    y_values = pd.to_numeric(df[y], errors='coerce')
+    complete = x_values.notna() & y_values.notna()
+    pair = pd.DataFrame({'x': x_values.where(complete), 'y': y_values.where(complete)})
+    return np.stack([pair.groupby(df['Country']).rank(method='average').to_numpy(dtype=float),
+                     pair.rank(method='average').to_numpy(dtype=float)])
+
+
+def _table(df, arrays):
+    return {scope: {column: pd.DataFrame(np.asarray(values[i]), index=df.index, columns=['x', 'y'])
+                    for column, values in arrays.items()}
+            for i, scope in enumerate(RANK_SCOPES)}
+
+
+def rank_table(df, columns, y='Generosity'):
+    """
+    {'country': 국가 내 순위, 'pooled': 전체 순위} 딕셔너리를 반환합니다.
+    각 값은 {지표: x, y 컬럼을 가진 DataFrame} 딕셔너리이며 (column_ranks 참고), 인덱스는 df와 같습니다.
+    """
+    return _table(df, {column: column_ranks(df, column, y) for column in columns})
+
+
+def load_rank_table(df, columns, y='Generosity'):
+    """
+    rank_table과 같은 순위표. 최신 사전 계산 산출물에 행 수가 같은 ranks/<지표>.npy가 있으면 그 배열을 쓰고,
+    없는 지표만 직접 계산합니다. df는 산출물 스냅샷과 행 순서가 같아야 합니다 (whr.artifacts.read_source로 읽은 데이터).
+    """
+    arrays = {}
+    for column in columns:
+        values = load_array(f'ranks/{metric_slug(column)}.npy')
+        if values is None or values.shape != (len(RANK_SCOPES), len(df), 2):
+            values = column_ranks(df, column, y)
+        arrays[column] = values
+    return _table(df, arrays)
+
+
+def count_inversions(values):
+    """
+    i < j 이면서 values[i] > values[j]인 쌍의 수 (동률은 제외).
+    상향식 병합 정렬로 단계마다 인접한 두 블록의 교차 역순 쌍을 searchsorted로 한꺼번에 셉니다.
+    """
+    a = np.unique(np.asarray(values), return_inverse=True)[1].astype(np.int64)
+    n = len(a)
+    span = n + 1
+    index = np.arange(n)
+    inversions = 0
+    width = 1
+    while width < n:
+        block = index // width
+        pair = block // 2
+        is_right = (block % 2).astype(bool)
+        # 블록 내부는 이전 단계에서 정렬되어 있으므로 (pair, 값) 키로 보면 왼쪽 블록들은 전체가 정렬된 상태입니다.
+        key = pair * span + a
+        left_keys = key[~is_right]
+        right_keys = key[is_right]
+        right_pair = pair[is_right]
+        left_end = np.searchsorted(left_keys, (right_pair + 1) * span, side='left')
+        not_greater = np.searchsorted(left_keys, right_keys, side='right')
+        inversions += int((left_end - not_greater).sum())
+        a = a[np.argsort(key, kind='stable')]
+        width *= 2
+    return inversions
+
+
+def _tied_pairs(sorted_values):
+    """정렬된 배열에서 값이 같은 쌍의 수 Σ t(t-1)/2."""
+    if len(sorted_values) == 0:
+        return 0
+    boundaries = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1], True])
+    runs = np.diff(boundaries)
+    return int((runs * (runs - 1) // 2).sum())
+
+
+def kendall_tau_b(x, y):
+    """Knight 알고리즘으로 켄달 타우-b를 계산합니다. 결측은 쌍 단위로 제외합니다."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.isfinite(x) & np.isfinite(y)
+    x, y = x[keep], y[keep]
+    n = len(x)
+    if n < 2:
+        return np.nan
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+    n0 = n * (n - 1) // 2
+    x_ties = _tied_pairs(x)
+    y_ties = _tied_pairs(np.sort(y))
+    # x로 정렬된 상태에서 (x, y) 모두 같은 쌍
+    same_xy = np.r_[False, (x[1:] == x[:-1]) & (y[1:] == y[:-1])]
+    run_id = np.cumsum(~same_xy)
+    joint_ties = _tied_pairs(run_id)
+    # x가 같은 구간은 y 오름차순이므로 역순 쌍은 모두 x가 다른 불일치 쌍입니다.
+    discordant = count_inversions(y)
+    denominator = np.sqrt(float(n0 - x_ties) * float(n0 - y_ties))
+    if denominator == 0:
+        return np.nan
+    return (n0 - x_ties - y_ties + joint_ties - 2 * discordant) / denominator
+
+
+def _pair_frame(df, factor, ranks=None, scope=None):
+    """상관계수 계산에 쓸 (Country, x, y) 표. scope를 주면 해당 범위의 순위를 값으로 씁니다."""
+    if scope is None:
+        x = pd.to_numeric(df[factor], errors='coerce')
+        y = pd.to_numeric(df['Generosity'], errors='coerce')
+    else:
+        x = ranks[scope][factor]['x']
+        y = ranks[scope][factor]['y']
+    valid = pd.to_numeric(df[factor], errors='coerce').notna() & pd.to_numeric(df['Generosity'], errors='coerce').notna()
+    return pd.DataFrame({'Country': df['Country'], 'x': x, 'y': y})[valid]
+
+
+def pooled_correlation(df, factor, method='pearson', ranks=None):
+    """전체 데이터의 Generosity-factor 상관계수 (method: pearson, spearman, kendall)."""
+    if method == 'kendall':
+        data = _pair_frame(df, factor)
+        return kendall_tau_b(data['x'].to_numpy(), data['y'].to_numpy())
+    data = _pair_frame(df, factor, ranks, 'pooled' if method == 'spearman' else None)
+    x, y = data['x'].to_numpy(dtype=float), data['y'].to_numpy(dtype=float)
+    return float(corr_from_moments(group_moments(x, y, np.zeros(len(x), dtype=np.intp), 1))[0])
+
+
+def within_country_correlations(df, factor, method='pearson', ranks=None):
+    """
+    국가별 Generosity-factor 상관계수 표 (Country, Correlation).
+    관측치가 2개 미만이거나 어느 한 쪽 값이 변하지 않는 국가는 제외합니다.
+    """
+    if method == 'kendall':
+        data = _pair_frame(df, factor)
+        # 분산이 0인 국가는 피어슨/스피어만과 같은 기준으로 제외합니다.
+        valid = data.groupby('Country')[['x', 'y']].std()
+        valid = valid[(valid['x'] > 1e-9) & (valid['y'] > 1e-9)].index
+        rows = [(country, kendall_tau_b(group['x'].to_numpy(), group['y'].to_numpy()))
+                for country, group in data[data['Country'].isin(valid)].groupby('Country', sort=True)]
+        table = pd.DataFrame(rows, columns=['Country', 'Correlation'])
+    else:
+        data = _pair_frame(df, factor, ranks, 'country' if method == 'spearman' else None)
+        codes, countries = pd.factorize(data['Country'], sort=True)
+        moments = group_moments(data['x'].to_numpy(dtype=float), data['y'].to_numpy(dtype=float), codes, len(countries))
+        table = pd.DataFrame({'Country': np.asarray(countries), 'Correlation': corr_from_moments(moments)})
+    return table.dropna(subset=['Correlation']).reset_index(drop=True)
@@ -0,0 +1,113 @@
+"""
+지역(regional_indicator) × 연도 × 지표 집계 큐브.
+
+각 셀에 평균(mean), 중앙값(median), 관측 수(count), 분산(var, ddof=1)을 미리 계산해 두므로
+지역 평균 추이나 지역별 통계 표를 그릴 때 원본 행을 다시 훑지 않습니다.
+마지막 지역 행(ALL_REGIONS)은 모든 지역을 합친 연도별 집계입니다.
+"""
+import numpy as np
+import pandas as pd
+
+from whr.artifacts import load_or_build, open_arrays, save_arrays
+from whr.data import METRIC_COLUMNS
+
+ALL_REGIONS = '전체'
+CUBE_STATS = ['mean', 'median', 'count', 'var']
+
+
+class RollupCube:
+    """
+    stats[stat]은 (지역 수 + 1, 연도 수, 지표 수) 배열입니다.
+    관측치가 없는 셀은 count가 0이고 나머지 통계는 NaN입니다.
+    region_countries는 지역 -> 소속 국가 목록(드릴다운용)입니다.
+    """
+
+    def __init__(self, regions, years, metrics, stats, region_countries):
+        self.regions = list(regions)
+        self.years = list(years)
+        self.metrics = list(metrics)
+        self.stats = stats
+        self.region_countries = region_countries
+        self._region_index = {region: i for i, region in enumerate(self.regions)}
+        self._metric_index = {metric: i for i, metric in enumerate(self.metrics)}
+
+    def series(self, region, metric, stat='mean'):
+        """지역 하나, 지표 하나의 연도별 값 (연도 순서는 self.years)."""
+        return self.stats[stat][self._region_index[region], :, self._metric_index[metric]]
+
+    def frame(self, metric, stat='mean'):
+        """지표 하나의 지역 × 연도 표."""
+        return pd.DataFrame(self.stats[stat][:, :, self._metric_index[metric]],
+                            index=pd.Index(self.regions, name='Region'),
+                            columns=pd.Index(self.years, name='Year'))
+
+    def year_table(self, region, year):
+        """지역 하나, 연도 하나의 지표 × 통계 표."""
+        y = self.years.index(year)
+        r = self._region_index[region]
+        return pd.DataFrame({stat: self.stats[stat][r, y, :] for stat in CUBE_STATS},
+                            index=pd.Index(self.metrics, name='Metric'))
+
+    def trend_frame(self, regions, metrics, stat='mean', label='{region} (지역 평균)'):
+        """
+        선택된 지역들의 연도별 값을 추이 그래프용 long-wide 형식(Year, Country, 지표...)으로 반환합니다.
+        'Country' 컬럼에는 label 형식의 지역 이름이 들어갑니다.
+        """
+        frames = []
+        for region in regions:
+            r = self._region_index[region]
+            part = pd.DataFrame({metric: self.stats[stat][r, :, self._metric_index[metric]] for metric in metrics})
+            part.insert(0, 'Country', label.format(region=region))
+            part.insert(0, 'Year', self.years)
+            frames.append(part.dropna(subset=metrics, how='all'))
+        if not frames:
+            return pd.DataFrame(columns=['Year', 'Country'] + list(metrics))
+        return pd.concat(frames, ignore_index=True)
+
+
+def build_cube(df, metrics=METRIC_COLUMNS):
+    """
+    화면 표시용 컬럼명(Region, Year, 지표...)을 가진 DataFrame으로부터 큐브를 만듭니다.
+    그룹별 집계는 pandas groupby 한 번(지역 × 연도)과 한 번(연도 전체)으로 끝납니다.
+    """
+    metrics = [m for m in metrics if m in df.columns]
+    data = df.dropna(subset=['Region', 'Year'])
+    regions = sorted(data['Region'].unique().tolist())
+    years = sorted(int(y) for y in data['Year'].unique())
+
+    by_region = data.groupby(['Region', 'Year'])[metrics].agg(CUBE_STATS)
+    overall = data.groupby('Year')[metrics].agg(CUBE_STATS)
+    overall.index = pd.MultiIndex.from_product([[ALL_REGIONS], overall.index], names=['Region', 'Year'])
+    full_index = pd.MultiIndex.from_product([regions + [ALL_REGIONS], years], names=['Region', 'Year'])
+    table = pd.concat([by_region, overall]).reindex(full_index)
+
+    shape = (len(regions) + 1, len(years), len(metrics))
+    stats = {}
+    for stat in CUBE_STATS:
+        values = table.xs(stat, axis=1, level=1)[metrics].to_numpy(dtype=float)
+        if stat == 'count':
+            values = np.nan_to_num(values, nan=0.0)
+        stats[stat] = values.reshape(shape)
+
+    region_countries = {region: sorted(group['Country'].unique().tolist())
+                        for region, group in data.groupby('Region')}
+    region_countries[ALL_REGIONS] = sorted(data['Country'].unique().tolist())
+    return RollupCube(regions + [ALL_REGIONS], years, metrics, stats, region_countries)
+
+
+def save_cube(cube, out_dir):
+    """통계량별 큐브 배열과 cube.json(지역, 연도, 지표, 지역별 국가)을 out_dir에 저장합니다 (whr.artifacts.save_arrays)."""
+    return save_arrays(out_dir, {stat: cube.stats[stat] for stat in CUBE_STATS}, 'cube.json', {
+        'regions': cube.regions, 'years': cube.years, 'metrics': cube.metrics,
+        'region_countries': cube.region_countries,
+    })
+
+
+def open_cube(cube_dir):
+    meta, stats = open_arrays(cube_dir, CUBE_STATS, 'cube.json')
+    return RollupCube(meta['regions'], meta['years'], meta['metrics'], stats, meta['region_countries'])
+
+
+def load_cube(df):
+    """사전 계산된 rollup/ 큐브, 없으면 df로 직접 만든 큐브."""
+    return load_or_build('rollup', 'cube.json', open_cube, lambda: build_cube(df))
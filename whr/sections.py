@@ -0,0 +1,54 @@
+"""
+상관성 페이지(pages/00, pages/01)의 요인별 '전체 데이터' 산점도 섹션.
+
+산점도는 whr/figures.py의 factor_scatter로 그립니다. 점은 트레이스 하나, 국가별 OLS 추세선은 충분통계량으로 구한
+선분들을 담은 트레이스 하나라서 요인 하나에 수십 밀리초면 그려집니다 (plotly.express의 trendline='ols'로
+국가마다 트레이스와 statsmodels 적합을 만들던 때는 약 2초). 그래서 요인을 여러 개 골라도 페이지에서 차례로 그립니다.
+이 모듈은 Streamlit에 의존하지 않습니다.
+"""
+from whr.figures import factor_scatter
+
+# 산점도 상태 -> 추세선 없이 그릴 때의 제목 꼬리표
+FALLBACK_SUFFIXES = {
+    'flat': '추세선 없음 - 데이터 부족',
+    'error': '추세선 없음 - 오류 발생',
+}
+
+
+class ScatterSection:
+    """
+    요인 하나의 '전체 데이터' 산점도와 그리기 결과.
+    status: 'ok'(추세선 포함), 'flat'(값 변화·데이터 부족), 'error' (message에 오류 내용)
+    figure: 그릴 데이터가 없으면 None
+    """
+
+    def __init__(self, factor, status, figure, message=None):
+        self.factor = factor
+        self.status = status
+        self.figure = figure
+        self.message = message
+
+
+def has_variation(data, factor):
+    """요인과 관대함 지수 모두 값이 변하고 관측이 2개 이상이어야 상관계수와 추세선을 구할 수 있습니다."""
+    return (len(data) >= 2 and data[factor].std() > 1e-9 and data['Generosity'].std() > 1e-9)
+
+
+def scatter_section(data, factor):
+    """
+    numeric_frame(df, ['Generosity', factor]) 결과로 산점도 섹션을 만듭니다.
+    추세선을 그릴 수 없으면 같은 산점도를 추세선 없이 그리고, 그 이유를 status에 남깁니다.
+    """
+    if has_variation(data, factor):
+        try:
+            return ScatterSection(factor, 'ok', factor_scatter(data, factor))
+        except Exception as e:
+            status, message = 'error', str(e)
+    else:
+        status, message = 'flat', None
+    figure = None
+    if len(data) > 0:
+        figure = factor_scatter(data, factor, trendline=False,
+                                title=f'전체 데이터: {factor} vs. 관대함 지수 ({FALLBACK_SUFFIXES[status]})')
+    return ScatterSection(factor, status, figure, message)
+
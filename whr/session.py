@@ -0,0 +1,84 @@
+"""
+세션 단위 결과 저장소 (페이지 간 공유).
+
+main.py와 상관성 페이지(pages/00, pages/01)는 같은 세션 안에서 오가지만, 페이지를 옮길 때마다 각자 데이터를 다시 읽고
+같은 숫자 변환과 연도별 평균을 다시 계산했습니다. ResultStore는 세션 상태(st.session_state)의 항목 하나에
+(결과 이름, 선택 파라미터) -> 결과를 담아 두고, 어느 페이지에서든 같은 이름과 파라미터로 물으면 그대로 돌려줍니다.
+st.cache_data와 달리 꺼낼 때 복사(역직렬화)하지 않으므로, 받은 결과는 읽기 전용으로 다뤄야 합니다.
+
+국가·연도·요인 같은 선택값도 같은 항목에 보관합니다. Streamlit은 페이지를 옮기면 이전 페이지 위젯의 상태를 지우므로
+위젯 key와 별도로 두었다가 다음 페이지 위젯의 초깃값으로 씁니다.
+
+저장된 결과는 데이터셋 버전(원본 CSV 내용 해시)에 묶여 있어, 버전이 바뀌면 한꺼번에 버려집니다 (선택값은 유지).
+이 모듈은 Streamlit에 의존하지 않습니다 (세션 상태 대신 아무 MutableMapping이나 받음).
+"""
+from collections import OrderedDict
+
+from whr.metrics import REGISTRY
+
+STATE_KEY = '_whr_results'
+MAX_SESSION_RESULTS = 64
+
+
+class ResultStore:
+    """세션 하나의 (이름, 파라미터) -> 결과 LRU와 페이지 간 공유 선택값."""
+
+    def __init__(self, state, version, max_entries=MAX_SESSION_RESULTS):
+        slot = state.get(STATE_KEY)
+        if slot is None or slot['version'] != version:
+            selections = slot['selections'] if slot is not None else {}
+            slot = {'version': version, 'results': OrderedDict(), 'selections': selections}
+            state[STATE_KEY] = slot
+        self.version = version
+        self.max_entries = max_entries
+        self._results = slot['results']
+        self._selections = slot['selections']
+
+    def __len__(self):
+        return len(self._results)
+
+    def has(self, name, params):
+        """(name, params) 결과가 이 세션에 저장되어 있는지 (적중/미스는 세지 않음)."""
+        return (name, params) in self._results
+
+    def get(self, name, params, compute):
+        """
+        (name, params) 결과. 이 세션에서 처음 묻는 조합이면 compute()로 계산해 저장합니다.
+        params는 해시 가능한 작은 값(튜플)이어야 합니다. 예외가 나면 저장하지 않습니다.
+        """
+        key = (name, params)
+        if key in self._results:
+            self._results.move_to_end(key)
+            REGISTRY.inc('whr_cache_requests_total', '캐시된 함수 호출 수 (result=hit/miss)',
+                         cache='session', function=name, result='hit')
+            return self._results[key]
+        return self.put(name, params, compute())
+
+    def put(self, name, params, value):
+        """다른 곳에서 계산한 (name, params) 결과를 저장하고 그대로 반환합니다. 미스로 셉니다."""
+        self._results[(name, params)] = value
+        REGISTRY.inc('whr_cache_requests_total', '캐시된 함수 호출 수 (result=hit/miss)',
+                     cache='session', function=name, result='miss')
+        if len(self._results) > self.max_entries:
+            (evicted, _), _ = self._results.popitem(last=False)
+            REGISTRY.inc('whr_cache_evictions_total', '캐시 항목 제거(clear) 수', cache='session', function=evicted)
+        return value
+
+    def selection(self, name, default=None, options=None):
+        """
+        공유 선택값. options를 주면 그 안에 있는 값만 남기고(목록은 원소별), 남는 것이 없으면 default를 반환합니다.
+        """
+        value = self._selections.get(name)
+        if value is None:
+            return default
+        if options is None:
+            return value
+        allowed = set(options)
+        if isinstance(value, list):
+            value = [item for item in value if item in allowed]
+            return value or default
+        return value if value in allowed else default
+
+    def remember(self, name, value):
+        """공유 선택값을 바꿉니다. 목록/튜플은 목록으로 복사해 둡니다."""
+        self._selections[name] = list(value) if isinstance(value, (list, tuple)) else value
@@ -0,0 +1,97 @@
+"""
+'비슷한 국가' 최근접 이웃 인덱스.
+
+* 프로필 모드: 특정 연도의 지표(관대함 + 요인)를 연도 내에서 표준화한 벡터로 KD-트리(scipy cKDTree)를 만듭니다.
+* 궤적 모드: 지표별로 전체 기간 표준화한 연도별 값을 이어 붙인 궤적을 비교합니다. 국가마다 관측 연도가
+  달라 KD-트리를 쓸 수 없으므로, 함께 관측된 칸만으로 계산한 RMS 거리 행렬을 행렬곱으로 한 번에 만들고
+  행마다 이웃 순서를 미리 정렬해 둡니다.
+
+두 인덱스 모두 neighbors(country, k)로 조회하며, 빌드 후 조회는 정렬된 배열을 앞에서부터 읽는 수준입니다.
+"""
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from whr.data import METRIC_COLUMNS, standardized_trajectories
+
+# 궤적 모드에서 거리 계산에 필요한 최소 공통 관측 칸 수
+MIN_OVERLAP = 3
+
+
+class SimilarityIndex:
+    """국가 목록과 이웃 조회 방법(KD-트리 또는 정렬된 거리 행렬)을 담은 인덱스."""
+
+    def __init__(self, countries, tree=None, points=None, order=None, distances=None):
+        self.countries = np.asarray(countries)
+        self._position = {country: i for i, country in enumerate(self.countries)}
+        self._tree = tree
+        self._points = points
+        self._order = order
+        self._distances = distances
+
+    def __contains__(self, country):
+        return country in self._position
+
+    def _candidates(self, i, count):
+        if self._tree is not None:
+            count = min(count + 1, len(self.countries))
+            dist, idx = self._tree.query(self._points[i], k=count)
+            return np.atleast_1d(idx), np.atleast_1d(dist)
+        idx = self._order[i, :count + 1]
+        return idx, self._distances[i, idx]
+
+    def neighbors(self, country, k=5, allowed=None):
+        """
+        country와 가장 가까운 k개 국가 표 (Country, Distance). 자기 자신은 제외합니다.
+        allowed를 주면 그 안의 국가만 고릅니다. 인덱스에 없는 국가면 빈 표를 반환합니다.
+        """
+        if country not in self._position:
+            return pd.DataFrame(columns=['Country', 'Distance'])
+        i = self._position[country]
+        allowed = None if allowed is None else set(allowed)
+        count = k
+        while True:
+            idx, dist = self._candidates(i, count)
+            keep = (idx != i) & np.isfinite(dist) & (idx < len(self.countries))
+            rows = [(self.countries[j], d) for j, d in zip(idx[keep], dist[keep])
+                    if allowed is None or self.countries[j] in allowed]
+            if len(rows) >= k or count + 1 >= len(self.countries):
+                return pd.DataFrame(rows[:k], columns=['Country', 'Distance'])
+            count *= 2
+
+
+def _zscore(values):
+    """열(지표)마다 z-점수로 표준화합니다. 분산이 0인 열은 0으로 둡니다."""
+    mean = values.mean(axis=0, keepdims=True)
+    std = values.std(axis=0, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(std > 0, (values - mean) / std, 0.0)
+
+
+def build_profile_index(df, year, metrics=METRIC_COLUMNS):
+    """year 한 해의 표준화된 지표 프로필로 KD-트리 인덱스를 만듭니다. 지표가 하나라도 빠진 국가는 제외합니다."""
+    metrics = [m for m in metrics if m in df.columns]
+    data = df[df['Year'] == year].dropna(subset=metrics).drop_duplicates('Country').sort_values('Country')
+    points = _zscore(data[metrics].to_numpy(dtype=float))
+    return SimilarityIndex(data['Country'].to_numpy(), tree=cKDTree(points), points=points)
+
+
+def build_trajectory_index(df, metrics=('Generosity',), min_overlap=MIN_OVERLAP):
+    """
+    지표별 연도 궤적의 RMS 거리로 인덱스를 만듭니다.
+    거리 = sqrt(공통 관측 칸에서의 (a_i - a_j)² 평균). 공통 칸이 min_overlap 미만이면 무한대입니다.
+    """
+    metrics = [m for m in metrics if m in df.columns]
+    countries, _, flat = standardized_trajectories(df, metrics)
+    mask = np.isfinite(flat).astype(float)
+    values = np.nan_to_num(flat)
+    sq = mask * values * values
+    cross = (mask * values) @ (mask * values).T
+    sums = sq @ mask.T + mask @ sq.T - 2 * cross
+    overlap = mask @ mask.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distances = np.sqrt(np.clip(sums, 0, None) / overlap)
+    distances[(overlap < min_overlap) | ~np.isfinite(distances)] = np.inf
+    np.fill_diagonal(distances, np.inf)
+    order = np.argsort(distances, axis=1, kind='stable')
+    return SimilarityIndex(countries, order=order, distances=distances)
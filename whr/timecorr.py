@@ -0,0 +1,148 @@
+"""
+요인과 관대함 지수의 상관계수가 시간에 따라 어떻게 변하는지 계산합니다 (연도별, N년 이동 구간).
+
+요인마다 (국가, 연도) 칸의 충분통계량(whr/corr.py의 MOMENT_FIELDS)을 연도 축으로 누적해 두면,
+연도 구간 [start, end]의 통계량은 누적값 두 개의 차이입니다. 그래서 구간 하나의 전체 상관계수는 원본 행 수와 무관하게
+O(1)에, 국가 내 상관계수 평균은 국가 수에 비례하는 시간에 구하고, 모든 이동 구간도 배열 연산 한 번으로 계산합니다.
+누적 배열은 모든 요인에 대해 원본 데이터를 한 번 훑어 만듭니다.
+
+누적 원점 합의 차이로 편차제곱합을 구하면 소거 오차가 커서, 값이 변하지 않는 구간도 0이 아닌 분산을 갖게 됩니다.
+그래서 값을 평균에 대해 중심화한 뒤 누적합니다 (국가 내 통계량은 국가별 평균, 전체 통계량은 요인별 전체 평균).
+상관계수는 중심화와 무관하며, 값이 변하지 않는 구간은 whr/corr.py의 has_spread가 구간 자체의 통계량으로 걸러냅니다.
+
+* 연도별: 그 해 국가 간(횡단면) 상관계수. 한 해에 국가별 관측은 하나뿐이므로 국가 내 상관계수는 없습니다.
+* 이동 구간: 구간 안 모든 국가-연도 행의 전체(pooled) 상관계수와, 구간 안 관측이 min_obs개 이상인 국가들의
+  국가 내 상관계수 평균. 표에서는 구간의 끝 연도(Year)와 시작 연도(Start)로 나타냅니다.
+
+상관계수는 모두 피어슨 상관계수입니다. 연도는 데이터의 첫 해부터 마지막 해까지 빠짐없이 두므로,
+관측이 없는 해가 있어도 구간 길이는 달력 연도 기준입니다.
+"""
+import numpy as np
+import pandas as pd
+
+from whr.corr import corr_from_moments
+from whr.data import FACTOR_COLUMNS, dense_panel
+
+DEFAULT_WINDOW = 5
+MIN_WINDOW_OBS = 3
+
+
+def within_mean(moments, min_obs=MIN_WINDOW_OBS):
+    """
+    국가별 충분통계량 (..., 국가 수, 6)에서 관측이 min_obs개 이상이고 상관계수가 정의되는 국가들의 상관계수 평균과 국가 수.
+    평균할 국가가 없으면 NaN입니다.
+    """
+    correlations = corr_from_moments(moments)
+    valid = (moments[..., 0] >= min_obs) & np.isfinite(correlations)
+    counts = valid.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(valid, correlations, 0.0).sum(axis=-1) / counts
+    return np.where(counts > 0, means, np.nan), counts
+
+
+class CorrelationTimeline:
+    """
+    요인별 연도 누적 충분통계량.
+    cumulative: 국가별 평균으로 중심화한 값의 (요인 수, 국가 수, 연도 수 + 1, 6) 누적 배열.
+        [:, :, t]는 첫 해부터 t번째 해 직전까지의 합이며 [:, :, 0]은 0입니다.
+    pooled_cumulative: 요인별 전체 평균으로 중심화한 값을 국가에 대해 합친 (요인 수, 연도 수 + 1, 6) 누적 배열
+    """
+
+    def __init__(self, factors, countries, years, cumulative, pooled_cumulative):
+        self.factors = list(factors)
+        self.countries = countries
+        self.years = years
+        self.cumulative = cumulative
+        self.pooled_cumulative = pooled_cumulative
+
+    def has(self, factor):
+        return factor in self.factors
+
+    def _span(self, start, end):
+        """[start, end] 연도 구간의 누적 배열 인덱스 (lo, hi). 구간 통계량은 cumulative[..., hi, :] - cumulative[..., lo, :]."""
+        return np.searchsorted(self.years, start, 'left'), np.searchsorted(self.years, end, 'right')
+
+    def window_moments(self, factor, start, end):
+        """[start, end] 연도 구간의 국가별 충분통계량 (국가 수, 6)."""
+        lo, hi = self._span(start, end)
+        cumulative = self.cumulative[self.factors.index(factor)]
+        return cumulative[:, hi] - cumulative[:, lo]
+
+    def pooled(self, factor, start, end):
+        """[start, end] 연도 구간 전체 행의 상관계수."""
+        lo, hi = self._span(start, end)
+        cumulative = self.pooled_cumulative[self.factors.index(factor)]
+        return float(corr_from_moments(cumulative[hi] - cumulative[lo]))
+
+    def within(self, factor, start, end, min_obs=MIN_WINDOW_OBS):
+        """[start, end] 연도 구간의 (국가 내 상관계수 평균, 평균에 들어간 국가 수)."""
+        mean, count = within_mean(self.window_moments(factor, start, end), min_obs)
+        return float(mean), int(count)
+
+    def _select(self, factors):
+        factors = self.factors if factors is None else [factor for factor in factors if factor in self.factors]
+        return factors, [self.factors.index(factor) for factor in factors]
+
+    def yearly(self, factors=None):
+        """연도별 국가 간 상관계수 표 (Year, Factor, Correlation, Observations)."""
+        factors, index = self._select(factors)
+        moments = np.diff(self.pooled_cumulative[index], axis=1)
+        return pd.DataFrame({
+            'Year': np.tile(self.years, len(factors)),
+            'Factor': np.repeat(factors, len(self.years)),
+            'Correlation': corr_from_moments(moments).ravel(),
+            'Observations': moments[..., 0].ravel().astype(int),
+        })
+
+    def rolling(self, width=DEFAULT_WINDOW, factors=None, min_obs=MIN_WINDOW_OBS):
+        """
+        모든 width년 이동 구간의 상관계수 표 (Year: 끝 연도, Start, Factor, Pooled, Within, Countries, Observations).
+        Countries는 국가 내 평균에 들어간 국가 수입니다. 데이터 기간이 width년보다 짧으면 빈 표를 반환합니다.
+        """
+        factors, index = self._select(factors)
+        n_windows = max(len(self.years) - width + 1, 0)
+        cumulative = self.cumulative[index]
+        country_moments = cumulative[:, :, width:] - cumulative[:, :, :n_windows]
+        pooled_cumulative = self.pooled_cumulative[index]
+        pooled_moments = pooled_cumulative[:, width:] - pooled_cumulative[:, :n_windows]
+        within, countries = within_mean(np.moveaxis(country_moments, 1, 2), min_obs)
+        return pd.DataFrame({
+            'Year': np.tile(self.years[width - 1:], len(factors)),
+            'Start': np.tile(self.years[:n_windows], len(factors)),
+            'Factor': np.repeat(factors, n_windows),
+            'Pooled': corr_from_moments(pooled_moments).ravel(),
+            'Within': within.ravel(),
+            'Countries': countries.ravel(),
+            'Observations': pooled_moments[..., 0].ravel().astype(int),
+        })
+
+
+def _cumulative_moments(x, y, valid, center_axes):
+    """
+    x, y, valid: (요인 수, 국가 수, 연도 수). center_axes 축에 대한 (유효한 칸의) 평균을 빼고 연도 축으로 누적한
+    (요인 수, 국가 수, 연도 수 + 1, 6) 배열.
+    """
+    count = valid.sum(axis=center_axes, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(valid, x, 0.0).sum(axis=center_axes, keepdims=True) / count
+        y_mean = np.where(valid, y, 0.0).sum(axis=center_axes, keepdims=True) / count
+    x = np.where(valid, x - x_mean, 0.0)
+    y = np.where(valid, y - y_mean, 0.0)
+    cells = np.stack([valid.astype(float), x, y, x * x, y * y, x * y], axis=-1)
+    return np.concatenate([np.zeros_like(cells[:, :, :1]), np.cumsum(cells, axis=2)], axis=2)
+
+
+def build_timeline(df, factors=None, y='Generosity'):
+    """
+    화면 표시용 컬럼명 DataFrame에서 요인별 연도 누적 충분통계량을 만듭니다 (factors 기본값: 데이터에 있는 FACTOR_COLUMNS).
+    요인과 y가 모두 있는 (국가, 연도) 칸만 셉니다.
+    """
+    factors = [factor for factor in (FACTOR_COLUMNS if factors is None else factors) if factor in df.columns and factor != y]
+    observed = pd.to_numeric(df['Year'], errors='coerce').dropna()
+    years = np.arange(int(observed.min()), int(observed.max()) + 1) if len(observed) else np.array([], dtype=int)
+    countries, years, panel = dense_panel(df, [y] + factors, years=years)
+    x, y_values = panel[1:], np.broadcast_to(panel[:1], panel[1:].shape)
+    valid = np.isfinite(x) & np.isfinite(y_values)
+    cumulative = _cumulative_moments(x, y_values, valid, center_axes=2)
+    pooled_cumulative = _cumulative_moments(x, y_values, valid, center_axes=(1, 2)).sum(axis=1)
+    return CorrelationTimeline(factors, countries, years, cumulative, pooled_cumulative)
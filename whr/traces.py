@@ -0,0 +1,89 @@
+"""
+추이 그래프(pages/01 이중 축 차트)용 (국가, 지표) 트레이스 묶음 생성기.
+
+* DataFrame을 국가(처음 나온 순서) 기준으로 한 번만 안정 정렬하고 국가별 경계를 구한 뒤,
+  각 (국가, 지표) 트레이스는 연속된 배열 구간을 잘라 만듭니다. 국가마다 불리언 마스크로 다시 거르지 않습니다.
+* 트레이스는 go.Scatter 대신 Plotly 사양 dict로 만들고, (국가, 지표, 데이터, 스타일)이 같으면
+  이전 리런에서 만든 dict를 재사용합니다. 그림 검증은 st.plotly_chart 단계에서 한 번만 일어납니다.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from whr.metrics import REGISTRY
+
+MAX_CACHED_TRACES = 4096
+
+
+class TraceBuilder:
+    """(국가, 지표) 트레이스 캐시. 여러 세션이 공유해도 되도록 잠금으로 보호합니다."""
+
+    def __init__(self, max_entries=MAX_CACHED_TRACES):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _trace(self, key, make):
+        with self._lock:
+            trace = self._cache.get(key)
+            if trace is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                REGISTRY.inc('whr_cache_requests_total', '캐시된 함수 호출 수 (result=hit/miss)',
+                             cache='traces', function='trend_traces', result='hit')
+                return trace
+        trace = make()
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = trace
+            evicted = len(self._cache) > self.max_entries
+            if evicted:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        REGISTRY.inc('whr_cache_requests_total', '캐시된 함수 호출 수 (result=hit/miss)',
+                     cache='traces', function='trend_traces', result='miss')
+        if evicted:
+            REGISTRY.inc('whr_cache_evictions_total', '캐시 항목 제거(clear) 수', cache='traces', function='trend_traces')
+        return trace
+
+    def build(self, frame, primary, secondary, colors, dashes, x='Year', group='Country'):
+        """
+        primary 지표는 왼쪽 축, secondary 지표는 오른쪽 축(y2)에 그리는 트레이스 dict 목록을 반환합니다.
+        순서는 축별로 (국가 순서 × 지표 순서)이며, frame에 Imputed 컬럼이 있으면 채운 값은 속이 빈 마커로 표시합니다.
+        colors: 지표 -> 선 색, dashes: 국가 -> 선 스타일
+        """
+        names = frame[group].astype(str).to_numpy()
+        codes, groups = pd.factorize(names)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(groups) + 1))
+        xs = frame[x].to_numpy()[order]
+        imputed = frame['Imputed'].eq(True).to_numpy()[order] if 'Imputed' in frame.columns else None
+        metric_values = {metric: pd.to_numeric(frame[metric], errors='coerce').to_numpy(dtype=float)[order]
+                         for metric in list(primary) + list(secondary) if metric in frame.columns}
+
+        traces = []
+        for metrics, axis in ((primary, 'y'), (secondary, 'y2')):
+            for g, country in enumerate(groups):
+                start, end = bounds[g], bounds[g + 1]
+                x_slice = xs[start:end]
+                symbols = ('circle',) if imputed is None or not imputed[start:end].any() else \
+                    tuple(np.where(imputed[start:end], 'circle-open', 'circle'))
+                for metric in metrics:
+                    if metric not in metric_values:
+                        continue
+                    y_slice = metric_values[metric][start:end]
+                    color = colors.get(metric, 'black')
+                    dash = dashes.get(country, 'solid')
+                    key = (country, metric, axis, color, dash, symbols, x_slice.tobytes(), y_slice.tobytes())
+                    traces.append(self._trace(key, lambda: {
+                        'type': 'scatter', 'x': x_slice.copy(), 'y': y_slice.copy(), 'mode': 'lines+markers',
+                        'marker': {'symbol': symbols[0] if len(symbols) == 1 else list(symbols)},
+                        'name': f"{country} ({metric})", 'legendgroup': metric, 'showlegend': True,
+                        'line': {'color': color, 'dash': dash}, 'xaxis': 'x', 'yaxis': axis,
+                    }))
+        return traces
@@ -0,0 +1,444 @@
+"""
+상관성 페이지(pages/00, pages/01)가 공유하는 Streamlit 섹션과 캐시 래퍼입니다.
+
+DataFrame을 받는 캐시 함수는 DataFrame을 _df 인자로 받아 해시하지 않고, 데이터셋 버전 ID(dataset_version)와
+작은 파라미터만 캐시 키로 씁니다. 원본 CSV가 바뀌면 버전이 바뀌어 모든 캐시가 함께 무효화됩니다.
+
+페이지 간에 공유하는 세션 결과 저장소(whr/session.py)와 선택값 위젯 도우미, 요인별 산점도 섹션(whr/sections.py),
+운영 지표 계측(whr/metrics.py)도 여기에 있습니다.
+앱의 캐시 함수는 st.cache_data/st.cache_resource 대신 이 모듈의 cache_data/cache_resource로 감싸 적중/미스를 세고,
+각 페이지는 start_rerun/finish_rerun으로 리런 시간을 잽니다.
+"""
+import functools
+import inspect
+import threading
+import time
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from whr.artifacts import load_array, metric_slug, source_version
+from whr.bootstrap import bootstrap_correlations, percentile_interval
+from whr.clustering import load_results as load_clusters
+from whr.corr import corr_from_moments
+from whr.data import FACTOR_COLUMNS, METRIC_COLUMNS
+from whr.figures import correlation_timeline_figure
+from whr.metrics import REGISTRY, start_exporters
+from whr.panel import fit_panel
+from whr.permutation import load_results
+from whr.query import app_source, pair_moments
+from whr.ranks import CORRELATION_METHODS, load_rank_table, pooled_correlation, within_country_correlations
+from whr.sections import scatter_section
+from whr.session import ResultStore
+from whr.timecorr import DEFAULT_WINDOW, MIN_WINDOW_OBS, build_timeline
+
+PANEL_EFFECT_LABELS = {
+    'entity': '국가 고정효과',
+    'time': '연도 고정효과',
+    'two-way': '국가 + 연도 고정효과',
+    'random': '국가 랜덤 절편 (혼합 효과)',
+}
+
+TIMELINE_VIEWS = {
+    'yearly': '연도별 (그 해 국가 간)',
+    'pooled': '이동 구간 전체 상관계수',
+    'within': '이동 구간 국가 내 상관계수 평균',
+}
+
+# --------------------
+# 운영 지표 계측
+# --------------------
+_cache_calls = threading.local()
+# version(데이터셋 버전) 인자를 받는 캐시 함수의 clear (정의한 파일, 함수 이름) -> clear. 버전이 바뀌면 이것만 비웁니다.
+_version_caches = {}
+
+
+def _missed():
+    """이 스레드에서 이번 호출 중 실제 계산이 일어난 캐시 함수 이름 집합."""
+    if not hasattr(_cache_calls, 'missed'):
+        _cache_calls.missed = set()
+    return _cache_calls.missed
+
+
+def _counted_cache(decorator, kind):
+    """
+    st.cache_data/st.cache_resource와 같은 방식(@cache_data, @cache_data(ttl=...))으로 쓰는 데코레이터.
+    호출마다 실제 계산이 일어났는지(미스) 아닌지(적중)를 whr_cache_requests_total에 셉니다.
+    캐시 계산은 호출한 스레드에서 일어나므로 스레드 로컬 표시로 판별합니다.
+    앱의 캐시는 max_entries/ttl을 쓰지 않으므로 항목이 빠지는 경우는 clear() 호출뿐이고, 이를 whr_cache_evictions_total에 셉니다.
+    version 인자를 받는 함수는 dataset_version이 버전이 바뀔 때 비우도록 _version_caches에 등록합니다
+    (페이지 스크립트는 리런마다 함수를 다시 정의하므로 정의한 파일과 이름으로 덮어씁니다).
+    """
+    def cache(func=None, **options):
+        if func is None:
+            return lambda f: cache(f, **options)
+        name = func.__name__
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            _missed().add(name)
+            return func(*args, **kwargs)
+
+        cached = decorator(**options)(compute) if options else decorator(compute)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            missed = _missed()
+            missed.discard(name)
+            try:
+                return cached(*args, **kwargs)
+            finally:
+                result = 'miss' if name in missed else 'hit'
+                missed.discard(name)
+                REGISTRY.inc('whr_cache_requests_total', '캐시된 함수 호출 수 (result=hit/miss)',
+                             cache=kind, function=name, result=result)
+
+        def clear(*args, **kwargs):
+            REGISTRY.inc('whr_cache_evictions_total', '캐시 항목 제거(clear) 수', cache=kind, function=name)
+            return cached.clear(*args, **kwargs)
+
+        call.clear = clear
+        if 'version' in inspect.signature(func).parameters:
+            _version_caches[(func.__code__.co_filename, func.__qualname__)] = clear
+        return call
+    return cache
+
+
+cache_data = _counted_cache(st.cache_data, 'data')
+cache_resource = _counted_cache(st.cache_resource, 'resource')
+
+
+_memory_functions = set()
+
+
+def _collect_streamlit(registry):
+    """
+    활성 세션 수와 st.cache_data 함수별 메모리 사용량 (스크레이프할 때만 계산).
+    Streamlit은 캐시 항목마다 크기를 하나씩 주므로 함수 이름(모듈.함수, Streamlit의 cache_name)별로 합칩니다.
+    페이지 스크립트의 모듈은 모두 __main__이라 여러 페이지의 같은 이름 함수(load_data 등)는 한 값으로 합쳐집니다.
+    캐시가 비워져 항목이 없어진 함수는 0으로 둡니다.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching import get_data_cache_stats_provider
+
+    if Runtime.exists():
+        # 세션 수를 알려 주는 공개 API가 없어 세션 관리자에 직접 묻습니다.
+        session_mgr = getattr(Runtime.instance(), '_session_mgr', None)
+        if session_mgr is not None:
+            registry.set('whr_active_sessions', session_mgr.num_active_sessions(), '활성 세션 수')
+    totals = dict.fromkeys(_memory_functions, 0)
+    for stats in get_data_cache_stats_provider().get_stats().values():
+        for stat in stats:
+            totals[stat.cache_name] = totals.get(stat.cache_name, 0) + stat.byte_length
+    for function, byte_length in totals.items():
+        registry.set('whr_cache_memory_bytes', byte_length, 'st.cache_data 함수별 메모리 (바이트)',
+                     cache='data', function=function)
+    _memory_functions.update(totals)
+
+
+REGISTRY.register_collector(_collect_streamlit)
+
+
+def start_rerun(page):
+    """페이지 스크립트 맨 앞에서 호출합니다. 지표 노출 방법을 (처음 한 번) 시작하고 리런 시작 시각을 반환합니다."""
+    start_exporters()
+    REGISTRY.inc('whr_reruns_started_total', '시작된 리런 수 (st.stop/예외로 끝난 리런 포함)', page=page)
+    return page, time.perf_counter()
+
+
+def finish_rerun(token):
+    """페이지 스크립트 맨 끝에서 호출합니다. 끝까지 실행된 리런의 시간을 히스토그램에 더합니다."""
+    page, started = token
+    REGISTRY.observe('whr_rerun_duration_seconds', time.perf_counter() - started,
+                     help_text='끝까지 실행된 리런 시간 (초)', page=page)
+
+
+# --------------------
+# 데이터셋 버전
+# --------------------
+_version_lock = threading.Lock()
+_seen_version = None
+
+
+def dataset_version():
+    """
+    현재 원본 CSV의 데이터셋 버전 ID (내용 해시 앞 12자리, 사전 계산 산출물의 버전 이름과 같음). 파일이 없으면 None.
+    해시는 파일 내용이 바뀔 때만 다시 계산하므로 리런마다 불러도 됩니다 (whr.artifacts.source_version).
+    프로세스 안에서 버전이 바뀌면 version을 캐시 키로 쓰는 함수들의 캐시만 비웁니다 (이전 버전 항목 정리).
+    버전과 무관한 st.cache_resource 자원(예: 데이터 내용까지 키로 쓰는 추이 트레이스 캐시)은 그대로 둡니다.
+    """
+    global _seen_version
+    try:
+        version = source_version()
+    except FileNotFoundError:
+        version = None
+    with _version_lock:
+        changed = _seen_version is not None and version != _seen_version
+        _seen_version = version
+    if changed:
+        for clear in list(_version_caches.values()):
+            clear()
+        REGISTRY.inc('whr_dataset_version_changes_total', '원본 CSV가 바뀌어 캐시를 비운 횟수')
+    return version
+
+
+# --------------------
+# 페이지 간 공유 (세션 결과 저장소)
+# --------------------
+def session_results(version=None):
+    """이 세션의 결과 저장소. 데이터셋 버전이 바뀌면 이전 결과는 버려집니다."""
+    return ResultStore(st.session_state, dataset_version() if version is None else version)
+
+
+def stored_frame(results, name, load):
+    """
+    세션 저장소에 name으로 둔 페이지 데이터. load()는 (DataFrame, 메시지 목록)을 반환하는 캐시된 load_data 호출입니다.
+    메시지((종류, 내용), 종류는 'warning'/'error')는 DataFrame과 함께 저장해 리런마다 다시 보여 줍니다.
+    읽기에 실패한 빈 DataFrame은 저장하지 않으므로 다음 리런에서 다시 읽습니다.
+    """
+    if results.has(name, ()):
+        df, messages = results.get(name, (), None)
+    else:
+        df, messages = load()
+        if not df.empty:
+            results.put(name, (), (df, messages))
+    for level, message in messages:
+        getattr(st, level)(message)
+    return df
+
+
+def _remember_selection(key, name):
+    session_results().remember(name, st.session_state[key])
+
+
+def shared_selection(key, name, default, options=None, override=None):
+    """
+    페이지 간에 공유하는 선택값(name)으로 위젯 상태(key)를 미리 채우고, 위젯에 넘길 인자(key, on_change, args)를 반환합니다.
+    위젯에는 default/value/index 인자를 따로 넘기지 않습니다. 사용자가 값을 바꾸면 공유 선택값도 바뀝니다.
+    override: 값이 새로 바뀌었을 때만 위젯 값을 덮어쓰는 제안값 (예: '비슷한 국가' 목록). None이면 쓰지 않습니다.
+    """
+    results = session_results()
+    override_key = f'{key}_override'
+    if override is None:
+        st.session_state.pop(override_key, None)
+    elif st.session_state.get(override_key) != override:
+        st.session_state[override_key] = override
+        st.session_state[key] = override
+        results.remember(name, override)
+    if key not in st.session_state:
+        st.session_state[key] = results.selection(name, default, options)
+    return dict(key=key, on_change=_remember_selection, args=(key, name))
+
+
+# --------------------
+# 요인별 산점도
+# --------------------
+def factor_sections(results, frames):
+    """
+    frames(요인 -> 숫자 변환 데이터)의 산점도 섹션(whr.sections.ScatterSection)을 요인 순서대로 내놓습니다.
+    이 세션에서 이미 그린 요인은 세션 저장소에서 바로 꺼냅니다.
+    """
+    for factor, data in frames.items():
+        yield results.get('factor_scatter', (factor,), lambda factor=factor, data=data: scatter_section(data, factor))
+
+
+@cache_data
+def metric_ranks(_df, version):
+    """지표별 국가 내/전체 순위표 (사전 계산 산출물이 있으면 그대로 사용). 데이터셋 버전마다 한 번만 만듭니다."""
+    return load_rank_table(_df, [col for col in METRIC_COLUMNS if col in _df.columns])
+
+
+@cache_resource
+def query_source(_df, version):
+    """
+    쿼리 백엔드 소스 (whr.query.app_source: WHR_SOURCE 데이터셋이 있으면 청크 경로, 없으면 _df를 감싼 FrameSource).
+    데이터셋 버전마다 한 번 열어 모든 세션이 함께 씁니다.
+    """
+    return app_source(_df)
+
+
+@cache_data
+def method_pooled_correlation(_df, version, factor, method):
+    """선택된 방법(피어슨/스피어만/켄달)의 전체 상관계수. 피어슨은 쿼리 소스의 국가별 충분통계량을 합쳐 구합니다."""
+    if method == 'pearson':
+        _, moments = pair_moments(query_source(_df, version), factor)
+        return float(corr_from_moments(moments.sum(axis=0)))
+    return pooled_correlation(_df, factor, method, metric_ranks(_df, version))
+
+
+@cache_data
+def method_country_correlations(_df, version, factor, method):
+    """
+    선택된 방법(피어슨/스피어만/켄달)의 국가별 상관계수 표 (Country, Correlation).
+    피어슨은 쿼리 소스의 국가별 충분통계량으로 구합니다 (값이 변하지 않는 국가는 제외).
+    """
+    if method == 'pearson':
+        countries, moments = pair_moments(query_source(_df, version), factor)
+        table = pd.DataFrame({'Country': countries, 'Correlation': corr_from_moments(moments)})
+        return table.dropna(subset=['Correlation']).reset_index(drop=True)
+    return within_country_correlations(_df, factor, method, metric_ranks(_df, version))
+
+
+@cache_data
+def bootstrap_interval(_df, version, factor, level=0.95):
+    """
+    전체 상관계수(행 0)와 국가 내 상관계수 평균(행 1)의 부트스트랩 신뢰구간과 재표본 수.
+    사전 계산된 분포가 있으면 그대로 쓰고, 없으면 계산한 뒤 요인별로 캐시합니다.
+    """
+    distribution = load_array(f'bootstrap/{metric_slug(factor)}.npy')
+    if distribution is None:
+        distribution = bootstrap_correlations(_df, factor)
+    return percentile_interval(distribution, level), len(distribution)
+
+
+@cache_data
+def permutation_results(_df, version):
+    """모든 요인의 국가별/전체 순열 검정 결과 (사전 계산 산출물이 있으면 그대로 사용)."""
+    return load_results(_df, FACTOR_COLUMNS)
+
+
+@cache_data
+def trajectory_clusters(_df, version, metrics):
+    """군집 기준 지표 조합(metrics 튜플)별 궤적 군집화 결과 (관대함만 쓰면 사전 계산 산출물 사용)."""
+    return load_clusters(_df, list(metrics))
+
+
+def pooled_test_caption(df, version, factor):
+    """전체 상관계수의 순열 검정 p 값과 FDR q 값 캡션. 검정 결과가 없는 지표는 아무것도 그리지 않습니다."""
+    tests = permutation_results(df, version)
+    if not tests.has(factor):
+        return
+    _, p_value, q_value = tests.pooled(factor)
+    st.caption(f"국가 단위 순열 검정 p = {p_value:.3f}, FDR 보정 q = {q_value:.3f} ({tests.n_permutations:,}회 순열)")
+
+
+def render_pooled_section(df, version, factor, method, scatter):
+    """
+    '전체 데이터 상관계수' 소단원: 선택된 방법의 전체 상관계수(피어슨이면 신뢰구간과 순열 검정 포함)와 산점도를 그립니다.
+    scatter: 산점도 섹션 (factor_sections)
+    """
+    st.markdown("#### 🌍 전체 데이터 상관계수 (Pooled Correlation)")
+    if scatter.status == 'flat':
+        st.info(f"전체 데이터에서 '{factor}' 또는 '관대함 지수' 데이터에 충분한 변화가 없거나 데이터 포인트가 부족하여 산점도 및 상관관계를 그릴 수 없습니다. (OLS 추세선 제외)")
+    else:
+        pooled = method_pooled_correlation(df, version, factor, method)
+        st.metric(label=f"전체 데이터 '{factor}'와 관대함 지수 간 {CORRELATION_METHODS[method]} 상관계수", value=f"{pooled:.3f}")
+        # 신뢰구간과 순열 검정은 피어슨 상관계수 기준입니다.
+        if method == 'pearson':
+            bootstrap_ci, n_bootstrap = bootstrap_interval(df, version, factor)
+            st.caption(f"95% 신뢰구간: [{bootstrap_ci[0, 0]:.3f}, {bootstrap_ci[0, 1]:.3f}] (국가 단위 군집 부트스트랩 {n_bootstrap:,}회)")
+            pooled_test_caption(df, version, factor)
+        if scatter.status == 'error':
+            st.error(f"산점도 생성 중 알 수 없는 오류가 발생했습니다: {scatter.message}. 추세선 없이 산점도를 표시합니다.")
+    if scatter.figure is not None:
+        # 선형 회귀 추세선 포함 (정적 스냅샷 내보내기와 같은 함수)
+        st.plotly_chart(scatter.figure, use_container_width=True)
+
+
+def render_country_tests(df, version, factor, alpha=0.05):
+    """
+    국가별 순열 검정 결과 표와 '유의한 국가만 보기' 필터를 그립니다.
+    필터를 통과한 국가 목록을 반환하며, 필터가 꺼져 있거나 검정 결과가 없으면 None을 반환합니다.
+    """
+    tests = permutation_results(df, version)
+    if not tests.has(factor):
+        return None
+    significant_only = st.checkbox(f"유의한 국가만 보기 (FDR q < {alpha})", key=f"significant_only_{factor}")
+    table = tests.country_table(factor)
+    if significant_only:
+        table = table[table['q_value'] < alpha]
+    with st.expander(f"국가별 순열 검정 결과 ({len(table)}개국, {tests.n_permutations:,}회 순열)"):
+        st.dataframe(table.sort_values('p_value').reset_index(drop=True).round(4), use_container_width=True)
+    return table['Country'].tolist() if significant_only else None
+
+
+@cache_data
+def correlation_timeline(_df, version):
+    """모든 요인의 연도 누적 충분통계량 (whr/timecorr.py). 데이터셋 버전마다 한 번만 만들고, 구간별 상관계수는 여기서 바로 구합니다."""
+    return build_timeline(_df)
+
+
+def render_timeline_section(df, version, factors):
+    """선택된 요인과 관대함 지수의 상관계수가 연도에 따라 어떻게 변하는지 (연도별 / 이동 구간) 그립니다."""
+    st.markdown("### ⏳ 상관계수의 시간에 따른 변화")
+    st.markdown("""
+    * **연도별:** 그 해 국가들 사이의 상관계수입니다. 한 해에는 국가마다 관측이 하나뿐이라 국가 내 상관계수는 없습니다.
+    * **이동 구간:** 끝 연도까지 N년 동안의 모든 국가-연도 행으로 구한 전체 상관계수, 또는 그 기간 관측이
+      {min_obs}개 이상인 국가들의 국가 내 상관계수 평균입니다.
+    * 위에서 고른 계산 방법과 관계없이 피어슨 상관계수입니다.
+    """.format(min_obs=MIN_WINDOW_OBS))
+    timeline = correlation_timeline(df, version)
+    factors = [factor for factor in factors if timeline.has(factor)]
+    if not factors or len(timeline.years) < 2:
+        st.info("연도에 따른 상관계수를 계산할 요인이나 연도가 부족합니다.")
+        return
+
+    view = st.radio("추이 보기:", options=list(TIMELINE_VIEWS), format_func=lambda key: TIMELINE_VIEWS[key],
+                    horizontal=True)
+    if view == 'yearly':
+        table = timeline.yearly(factors)
+        column, title = 'Correlation', '연도별 국가 간 상관계수 (관대함 지수)'
+    else:
+        max_width = len(timeline.years)
+        width = st.slider("이동 구간 길이 (년)", min_value=min(MIN_WINDOW_OBS, max_width), max_value=max_width,
+                          value=min(DEFAULT_WINDOW, max_width))
+        table = timeline.rolling(width, factors)
+        column = 'Pooled' if view == 'pooled' else 'Within'
+        title = f"{width}년 이동 구간 {TIMELINE_VIEWS[view].removeprefix('이동 구간 ')} (관대함 지수)"
+    st.plotly_chart(correlation_timeline_figure(table, column, title), use_container_width=True)
+    with st.expander("상관계수 추이 표"):
+        st.dataframe(table.round(4), use_container_width=True)
+
+
+@cache_data
+def cached_panel_fit(_df, version, factors, effects):
+    """요인 조합(factors 튜플)과 효과 유형별로 패널 회귀 결과를 캐시합니다."""
+    return fit_panel(_df, list(factors), effects)
+
+
+def render_panel_section(df, version, factors):
+    """선택된 요인으로 패널 회귀(고정효과/랜덤 절편) 결과를 그립니다."""
+    st.header("🧮 패널 회귀 분석 (고정 효과 / 혼합 효과)")
+    st.markdown("""
+    선택된 요인으로 관대함 지수를 설명하는 패널 회귀를 추정합니다.
+    * **고정 효과:** 국가(또는 연도)마다 다른 절편을 허용하여, 국가 간 고정된 차이를 제거한 **국가 내 변화**만으로 관계를 추정합니다.
+    * **혼합 효과 (랜덤 절편):** 국가별 절편이 정규분포를 따른다고 가정하여 국가 간·국가 내 변동을 함께 사용합니다.
+    * 표준오차는 국가 단위 군집-강건(cluster-robust) 표준오차입니다.
+    """)
+    factors = [factor for factor in factors if factor != 'Generosity']
+    if not factors:
+        st.info("패널 회귀에 사용할 요인을 하나 이상 선택해주세요.")
+        return
+
+    effects = st.radio("모형을 선택하세요:", options=list(PANEL_EFFECT_LABELS),
+                       format_func=lambda key: PANEL_EFFECT_LABELS[key], horizontal=True)
+    try:
+        result = cached_panel_fit(df, version, tuple(factors), effects)
+    except ValueError as e:
+        st.info(str(e))
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("관측치 수", f"{result.nobs:,}")
+    col2.metric("국가 수", f"{result.n_groups:,}")
+    col3.metric("국가 내 R² (within)", f"{result.r2_within:.3f}")
+    if result.extra:
+        col4, col5, col6 = st.columns(3)
+        col4.metric("국가 간 표준편차 (σ_u)", f"{result.extra['sigma_u']:.3f}")
+        col5.metric("국가 내 표준편차 (σ_e)", f"{result.extra['sigma_e']:.3f}")
+        col6.metric("급내 상관 (ICC)", f"{result.extra['icc']:.3f}")
+
+    table = result.table()
+    st.dataframe(table.round(4), use_container_width=True)
+
+    plot_table = table.drop(index='const', errors='ignore').reset_index()
+    fig_coef = px.scatter(plot_table, x='coef', y='Variable',
+                          error_x=plot_table['ci_high'] - plot_table['coef'],
+                          title=f"{PANEL_EFFECT_LABELS[effects]}: 요인별 계수 (95% 신뢰구간)",
+                          labels={'coef': '계수', 'Variable': '요인'},
+                          color_discrete_sequence=px.colors.qualitative.Bold)
+    fig_coef.add_vline(x=0, line_dash='dash', line_color='gray')
+    fig_coef.update_layout(template="plotly_white", title_x=0.5,
+                           margin=dict(t=50, b=50, l=50, r=50))
+    st.plotly_chart(fig_coef, use_container_width=True)